@@ -8,152 +8,3551 @@
  * To get debug output on stderr, run with '-v'.
  */
 
+// For struct ucred and SCM_CREDENTIALS.
+#define _GNU_SOURCE
+
+#include <arpa/inet.h>
 #include <assert.h>
+#include <dirent.h>
+#include <stddef.h>
 #include <errno.h>
+#include <fcntl.h>
 #include <getopt.h>
+#include <glob.h>
+#include <limits.h>
+#include <linux/cn_proc.h>
+#include <linux/connector.h>
+#include <linux/netlink.h>
+#include <netinet/in.h>
+#include <poll.h>
 #include <signal.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
 #include <sys/ioctl.h>
+#include <sys/mman.h>
+#include <sys/resource.h>
+#include <sys/signalfd.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/syscall.h>
 #include <sys/types.h>
+#include <sys/uio.h>
+#include <sys/un.h>
 #include <sys/wait.h>
+#include <time.h>
 #include <unistd.h>
 #include "VERSION.h"
 
-#define PRINTERR(...) do { \
-    fprintf(stderr, "[dumb-init] " __VA_ARGS__); \
-} while (0)
+#define PRINTERR(...) do { \
+    fprintf(stderr, "[dumb-init] " __VA_ARGS__); \
+} while (0)
+
+#define DEBUG(...) do { \
+    if (debug) { \
+        PRINTERR(__VA_ARGS__); \
+    } \
+} while (0)
+
+/*
+ * Optional profiling, enabled by building with -DDUMB_INIT_PROFILE (see
+ * `make build-profile`). It times the startup phases, counts the system
+ * calls made while handling each signal, and prints a summary on exit.
+ * Without it, the PROFILE_* macros compile to nothing.
+ *
+ * System calls are counted like `strace -c` does: once dumb-init has started
+ * the child, a tracer process stops it at the entry of every system call
+ * (including the ones libc makes internally) and counts it in shared memory.
+ * The startup phases aren't traced, so their timings aren't skewed by it.
+ */
+#ifdef DUMB_INIT_PROFILE
+#include <sys/prctl.h>
+#include <sys/ptrace.h>
+
+enum profile_phase {
+    PROFILE_PARSE,
+    PROFILE_TTY_DETACH,
+    PROFILE_BEFORE_FORK,
+    PROFILE_FORK,
+    PROFILE_TTY_ATTACH,
+    PROFILE_BEFORE_EXEC,
+    PROFILE_PHASES,
+};
+
+const char *profile_phase_names[PROFILE_PHASES] = {
+    "parse_command",
+    "tty_detach",
+    "before_fork",
+    "fork",
+    "child_tty_attach",
+    "child_before_exec",
+};
+
+// Shared with the child until it execs, and with the tracer.
+struct profile_shared {
+    long long phase_ns[PROFILE_PHASES];
+    long long syscalls;
+};
+
+struct profile_mark {
+    long long ns;
+    long long cpu_ns;
+    long long syscalls;
+};
+
+struct profile_signals {
+    long long count;
+    double syscalls;
+    double max_syscalls;
+    long long cpu_ns;
+};
+
+struct profile_shared *profile_shared = NULL;
+char profile_tracing = 0;
+long long profile_traced_from = 0;
+struct profile_signals profile_forwarded = {0, 0, 0, 0};
+struct profile_signals profile_sigchld = {0, 0, 0, 0};
+// Taken before the event loop waits, so that the wait is part of the cost.
+struct profile_mark profile_wait = {0, 0, 0};
+pid_t profile_owner = 0;
+
+long long profile_clock(clockid_t clock) {
+    struct timespec ts;
+    clock_gettime(clock, &ts);
+    return (long long) ts.tv_sec * 1000000000 + ts.tv_nsec;
+}
+
+struct profile_mark profile_mark(void) {
+    struct profile_mark mark;
+    mark.ns = profile_clock(CLOCK_MONOTONIC);
+    mark.cpu_ns = profile_clock(CLOCK_THREAD_CPUTIME_ID);
+    mark.syscalls = profile_shared != NULL ? profile_shared->syscalls : 0;
+    return mark;
+}
+
+// Only the first occurrence of a phase is kept (e.g. the first child's fork).
+void profile_phase(enum profile_phase phase, struct profile_mark *start) {
+    if (profile_shared != NULL && profile_shared->phase_ns[phase] == 0) {
+        profile_shared->phase_ns[phase] = profile_clock(CLOCK_MONOTONIC) - start->ns;
+    }
+}
+
+/*
+ * Account for handling one of the batch signals read from the signalfd at
+ * once; the wait for them (poll) and the read are shared among them.
+ */
+void profile_signal(int signum, struct profile_mark *start, int batch) {
+    struct profile_signals *stats = signum == SIGCHLD ? &profile_sigchld : &profile_forwarded;
+    double syscalls = 0;
+    if (profile_shared != NULL) {
+        syscalls = profile_shared->syscalls - start->syscalls +
+            (double) (start->syscalls - profile_wait.syscalls) / batch;
+    }
+    stats->count++;
+    stats->syscalls += syscalls;
+    if (syscalls > stats->max_syscalls) {
+        stats->max_syscalls = syscalls;
+    }
+    stats->cpu_ns += profile_clock(CLOCK_THREAD_CPUTIME_ID) - start->cpu_ns;
+}
+
+void profile_print_signals(const char *name, struct profile_signals *stats) {
+    fprintf(stderr, "[dumb-init] profile: %s %lld\n", name, stats->count);
+    if (stats->count > 0) {
+        if (profile_tracing) {
+            fprintf(
+                stderr, "[dumb-init] profile: %s_syscalls %.2f avg %.2f max\n",
+                name, stats->syscalls / stats->count, stats->max_syscalls
+            );
+        } else {
+            fprintf(stderr, "[dumb-init] profile: %s_syscalls unavailable\n", name);
+        }
+        fprintf(stderr, "[dumb-init] profile: %s_cpu %.3f us\n", name, stats->cpu_ns / 1000.0 / stats->count);
+    }
+}
+
+void profile_print(void) {
+    int i;
+    // Processes forked by dumb-init inherit this atexit handler.
+    if (getpid() != profile_owner) {
+        return;
+    }
+    for (i = 0; i < PROFILE_PHASES; i++) {
+        fprintf(stderr, "[dumb-init] profile: %s %.3f ms\n", profile_phase_names[i], profile_shared->phase_ns[i] / 1e6);
+    }
+    profile_print_signals("forwarded_signals", &profile_forwarded);
+    profile_print_signals("sigchld", &profile_sigchld);
+    if (profile_tracing) {
+        fprintf(stderr, "[dumb-init] profile: syscalls %lld\n", profile_shared->syscalls - profile_traced_from);
+    } else {
+        fprintf(stderr, "[dumb-init] profile: syscalls unavailable\n");
+    }
+}
+
+void profile_init(void) {
+    profile_shared = mmap(
+        NULL, sizeof(*profile_shared), PROT_READ | PROT_WRITE, MAP_SHARED | MAP_ANONYMOUS, -1, 0
+    );
+    if (profile_shared == MAP_FAILED) {
+        profile_shared = NULL;
+        return;
+    }
+    profile_owner = getpid();
+    atexit(profile_print);
+}
+
+// Runs in the tracer process, until the tracee exits.
+void profile_tracer(pid_t tracee, int ready_fd) {
+    struct __ptrace_syscall_info info;
+    int status, entering = 1;
+
+    if (ptrace(PTRACE_SEIZE, tracee, 0, PTRACE_O_TRACESYSGOOD) == -1 ||
+            ptrace(PTRACE_INTERRUPT, tracee, 0, 0) == -1) {
+        _exit(1);
+    }
+    for (;;) {
+        int sig = 0;
+        if (waitpid(tracee, &status, __WALL) == -1 || !WIFSTOPPED(status)) {
+            _exit(0);
+        }
+        if (WSTOPSIG(status) == (SIGTRAP | 0x80)) {
+            int own = 0;
+            if (ptrace(PTRACE_GET_SYSCALL_INFO, tracee, sizeof(info), &info) > 0) {
+                entering = info.op == PTRACE_SYSCALL_INFO_ENTRY;
+                // Only the profiler reads the CPU clock, so don't count that.
+                own = entering && info.entry.nr == SYS_clock_gettime &&
+                    info.entry.args[0] == CLOCK_THREAD_CPUTIME_ID;
+            }
+            if (entering && !own) {
+                profile_shared->syscalls++;
+            }
+            entering = !entering;
+        } else if (status >> 16 == PTRACE_EVENT_STOP) {
+            if (WSTOPSIG(status) == SIGTRAP) {
+                // Our PTRACE_INTERRUPT: the tracee is stopped, so it's traced from now on.
+                if (ready_fd != -1) {
+                    write(ready_fd, "", 1);
+                    close(ready_fd);
+                    ready_fd = -1;
+                }
+            } else {
+                // A group stop (e.g. after a TTY signal): stay stopped until SIGCONT.
+                ptrace(PTRACE_LISTEN, tracee, 0, 0);
+                continue;
+            }
+        } else {
+            sig = WSTOPSIG(status);
+        }
+        ptrace(PTRACE_SYSCALL, tracee, 0, sig);
+    }
+}
+
+void profile_trace_syscalls(void) {
+    int pipefd[2];
+    char go = 0;
+    pid_t tracer;
+
+    if (profile_shared == NULL || pipe2(pipefd, O_CLOEXEC) == -1) {
+        return;
+    }
+    tracer = fork();
+    if (tracer == 0) {
+        close(pipefd[0]);
+        profile_tracer(profile_owner, pipefd[1]);
+    }
+    close(pipefd[1]);
+    if (tracer > 0) {
+        // Needed with the Yama LSM, where tracers must otherwise be ancestors.
+        prctl(PR_SET_PTRACER, tracer, 0, 0, 0);
+        // The tracer writes to the pipe once it traces us, or exits.
+        if (read(pipefd[0], &go, 1) == 1) {
+            profile_tracing = 1;
+            profile_traced_from = profile_shared->syscalls;
+        }
+    }
+    close(pipefd[0]);
+}
+
+#define PROFILE_INIT() profile_init()
+#define PROFILE_START(mark) struct profile_mark mark = profile_mark()
+#define PROFILE_PHASE(phase, mark) profile_phase(phase, &mark)
+#define PROFILE_SIGNAL(signum, mark, batch) profile_signal(signum, &mark, batch)
+#define PROFILE_TRACE_SYSCALLS() profile_trace_syscalls()
+#define PROFILE_WAIT() profile_wait = profile_mark()
+#else
+#define PROFILE_INIT() do {} while (0)
+#define PROFILE_START(mark) do {} while (0)
+#define PROFILE_PHASE(phase, mark) do {} while (0)
+#define PROFILE_SIGNAL(signum, mark, batch) do {} while (0)
+#define PROFILE_TRACE_SYSCALLS() do {} while (0)
+#define PROFILE_WAIT() do {} while (0)
+#endif
+
+// Signals we care about are numbered from 1 to 31, inclusive.
+// (32 and above are real-time signals.)
+// TODO: this is likely not portable outside of Linux, or on strange architectures
+#define MAXSIG 31
+
+// Indices are one-indexed (signal 1 is at index 1). Index zero is unused.
+// User-specified signal rewriting.
+int signal_rewrite[MAXSIG + 1] = {[0 ... MAXSIG] = -1};
+// User-specified signal routing (one of the ROUTE_* values below).
+char signal_route[MAXSIG + 1] = {[0 ... MAXSIG] = 0};
+// One-time ignores due to TTY quirks. 0 = no skip, 1 = skip the next-received signal.
+char signal_temporary_ignores[MAXSIG + 1] = {[0 ... MAXSIG] = 0};
+
+// File descriptors (other than stdin/stdout/stderr) to leave open in the
+// child when closing inherited descriptors.
+#define MAXKEEPFDS 64
+
+// Resource limits to apply in the child before exec.
+#define MAXRLIMITS 16
+
+struct rlimit_setting {
+    int resource;
+    struct rlimit limit;
+};
+
+// Listening sockets bound by dumb-init and passed to the child.
+#define MAXLISTENERS 16
+
+struct listener {
+    char *address;
+    int fd;
+};
+
+struct rlimit_name {
+    const char *name;
+    int resource;
+};
+
+const struct rlimit_name rlimit_names[] = {
+    {"as",      RLIMIT_AS},
+    {"core",    RLIMIT_CORE},
+    {"cpu",     RLIMIT_CPU},
+    {"data",    RLIMIT_DATA},
+    {"fsize",   RLIMIT_FSIZE},
+    {"memlock", RLIMIT_MEMLOCK},
+    {"nofile",  RLIMIT_NOFILE},
+    {"nproc",   RLIMIT_NPROC},
+    {"stack",   RLIMIT_STACK},
+    {NULL,      0},
+};
+
+// Where a signal for a child is delivered. By default this is the child's
+// process group in setsid mode, and the child alone otherwise.
+enum {
+    ROUTE_DEFAULT = 0,
+    ROUTE_CHILD,
+    ROUTE_GROUP,
+    ROUTE_TREE,
+};
+
+pid_t child_pid = -1;
+char debug = 0;
+char use_setsid = 1;
+char close_fds = 0;
+int keep_fds[MAXKEEPFDS + MAXLISTENERS];
+int keep_fds_len = 0;
+struct rlimit_setting rlimits[MAXRLIMITS];
+int rlimits_len = 0;
+struct listener listeners[MAXLISTENERS];
+int listeners_len = 0;
+int listen_backlog = SOMAXCONN;
+char lazy_spawn = 0;
+char waiting_for_connection = 0;
+
+// Directory of the cgroup (v2) dumb-init runs in. Empty until resolved.
+char cgroup_dir[PATH_MAX] = "";
+
+// Freezing of idle children. Disabled unless a timeout is given.
+long freeze_after_ms = 0;
+
+void note_activity(void);
+void thaw_children(void);
+void join_freezer_cgroup(void);
+
+// Pre-start hooks, run in parallel (subject to their dependencies) before
+// the main command is started.
+#define MAXHOOKS 32
+
+enum hook_state {
+    HOOK_PENDING,
+    HOOK_RUNNING,
+    HOOK_DONE,
+};
+
+struct hook {
+    char *name;
+    char *command;
+    char *deps;
+    int dep_indices[MAXHOOKS];
+    int deps_len;
+    long timeout_ms;
+    enum hook_state state;
+    pid_t pid;
+    long long started;
+};
+
+struct hook hooks[MAXHOOKS];
+int hooks_len = 0;
+char hooks_done = 0;
+long long start_time = 0;
+
+void pre_start_hook_exited(pid_t pid, int exit_status);
+void signal_pre_start_hooks(int signum);
+
+/*
+ * Child generations. child_pid is always the current generation; during a
+ * reload the new generation is started as pending_pid, and once it is ready
+ * the previous one is moved to retiring_pids and stopped.
+ */
+#define MAXRETIRING 16
+
+char **child_command = NULL;
+int generation = 1;
+pid_t pending_pid = -1;
+pid_t retiring_pids[MAXRETIRING];
+int retiring_len = 0;
+int reload_signal = 0;
+int reload_stop_signal = SIGTERM;
+char *reload_ready_file = NULL;
+long reload_timeout_ms = 60000;
+// The directory children and the ready command are started in (dumb-init
+// itself moves to /).
+char *child_cwd = NULL;
+
+// sd_notify(3) support.
+char *notify_socket_path = NULL;
+int notify_fd = -1;
+char *ready_file = NULL;
+char *ready_command = NULL;
+char child_ready = 0;
+long watchdog_ms = 0;
+int watchdog_signal = SIGABRT;
+
+void start_reload(void);
+void finish_reload(void);
+int generation_exited(pid_t pid, int exit_status);
+
+// Process lifecycle tracing. Disabled unless a trace file is given.
+char *trace_path = NULL;
+
+void trace_spawned(pid_t pid, const char *name);
+void trace_reaped(pid_t pid, int exit_status);
+
+// Relaying of the children's stdout and stderr. Disabled unless requested.
+#define MAXLOGSOURCES (2 * (MAXWORKERS + MAXRETIRING + 2))
+
+enum log_overflow_policy {
+    LOG_BLOCK,
+    LOG_DROP,
+    LOG_BUFFER,
+};
+
+char log_relay = 0;
+char *log_prefix = "";
+char log_timestamps = 0;
+enum log_overflow_policy log_overflow = LOG_BLOCK;
+size_t log_buffer_max = 64 * 1024;
+
+/*
+ * Worker pool mode: keep workers_target copies of the command running,
+ * scaling between workers_min and workers_max. Disabled if workers_min is 0.
+ */
+#define MAXWORKERS 256
+
+struct worker {
+    pid_t pid;
+    long long started;
+    long long restart_at;
+};
+
+struct worker workers[MAXWORKERS];
+int workers_min = 0;
+int workers_max = 0;
+int workers_target = 0;
+char workers_stopping = 0;
+double scale_cpu_high = 0;
+double scale_cpu_low = 0;
+long scale_interval_ms = 10000;
+
+int worker_exited(pid_t pid, int exit_status);
+
+// Page cache prewarming before the child is started.
+#define MAXPREWARM 64
+
+char *prewarm_patterns[MAXPREWARM];
+int prewarm_patterns_len = 0;
+long prewarm_budget_ms = 0;
+int prewarm_jobs = 4;
+char prewarm_async = 0;
+
+// Memory pressure monitoring. Disabled unless a signal is configured.
+int memory_pressure_signal = 0;
+char memory_pressure_kind[5] = "some";
+long memory_pressure_stall_ms = 200;
+long memory_pressure_window_ms = 2000;
+long memory_pressure_interval_ms = 10000;
+
+int translate_signal(int signum) {
+    if (signum <= 0 || signum > MAXSIG) {
+        return signum;
+    } else {
+        int translated = signal_rewrite[signum];
+        if (translated == -1) {
+            return signum;
+        } else {
+            DEBUG("Translating signal %d to %d.\n", signum, translated);
+            return translated;
+        }
+    }
+}
+
+/*
+ * Signal every descendant of pid (and pid itself), including processes which
+ * have moved to another process group or session. The process tree is read
+ * from /proc.
+ *
+ * The whole tree is read before any process is signalled, and the root is
+ * signalled last: if the signal killed the root first, its children would be
+ * reparented before they were found. Stopping the tree while reading it would
+ * close the remaining race with processes forked meanwhile, but handlers
+ * would then see an extra SIGCONT.
+ */
+#define MAXTREE 4096
+
+// Read the pid and parent pid of every process, returning how many were read.
+int read_process_table(pid_t *pids, pid_t *ppids) {
+    int len = 0;
+    struct dirent *entry;
+    DIR *dir = opendir("/proc");
+
+    if (dir == NULL) {
+        return 0;
+    }
+    while ((entry = readdir(dir)) != NULL) {
+        char path[64], stat[512], *paren;
+        FILE *f;
+        pid_t pid = atoi(entry->d_name);
+        if (pid <= 0) {
+            continue;
+        }
+        if (len == MAXTREE) {
+            PRINTERR("More than %d processes, not all descendants may be signalled.\n", MAXTREE);
+            break;
+        }
+        snprintf(path, sizeof(path), "/proc/%d/stat", pid);
+        f = fopen(path, "r");
+        if (f == NULL) {
+            continue;
+        }
+        // The command name may contain spaces and parens, so skip to the last ')'.
+        if (fgets(stat, sizeof(stat), f) != NULL && (paren = strrchr(stat, ')')) != NULL) {
+            pids[len] = pid;
+            if (sscanf(paren + 1, " %*c %d", &ppids[len]) == 1) {
+                len++;
+            }
+        }
+        fclose(f);
+    }
+    closedir(dir);
+    return len;
+}
+
+void signal_tree(pid_t root, int signum) {
+    static pid_t pids[MAXTREE], ppids[MAXTREE], tree[MAXTREE];
+    static char marked[MAXTREE];
+    int i, j, len, tree_len = 1, progress;
+
+    tree[0] = root;
+    len = read_process_table(pids, ppids);
+    for (i = 0; i < len; i++) {
+        marked[i] = pids[i] == root;
+    }
+    // Mark descendants until nothing changes; the tree is usually shallow.
+    do {
+        progress = 0;
+        for (i = 0; i < len; i++) {
+            if (marked[i]) {
+                continue;
+            }
+            for (j = 0; j < len; j++) {
+                if (marked[j] && pids[j] == ppids[i]) {
+                    marked[i] = 1;
+                    progress = 1;
+                    tree[tree_len++] = pids[i];
+                    break;
+                }
+            }
+        }
+    } while (progress);
+
+    // Descendants were found parents first, so signal them in reverse.
+    for (i = tree_len - 1; i >= 0; i--) {
+        kill(tree[i], signum);
+    }
+}
+
+void signal_pid(pid_t pid, int signum) {
+    int route = signum > 0 && signum <= MAXSIG ? signal_route[signum] : ROUTE_DEFAULT;
+    if (route == ROUTE_DEFAULT) {
+        route = use_setsid ? ROUTE_GROUP : ROUTE_CHILD;
+    }
+    if (route == ROUTE_GROUP) {
+        kill(-pid, signum);
+    } else if (route == ROUTE_TREE) {
+        signal_tree(pid, signum);
+    } else {
+        kill(pid, signum);
+    }
+}
+
+void signal_children(int signum) {
+    int i;
+    if (child_pid > 0) {
+        signal_pid(child_pid, signum);
+    }
+    for (i = 0; i < workers_max; i++) {
+        if (workers[i].pid > 0) {
+            signal_pid(workers[i].pid, signum);
+        }
+    }
+    if (pending_pid > 0) {
+        signal_pid(pending_pid, signum);
+    }
+    for (i = 0; i < retiring_len; i++) {
+        signal_pid(retiring_pids[i], signum);
+    }
+    signal_pre_start_hooks(signum);
+}
+
+void forward_signal(int signum) {
+    // Frozen processes can't act on signals, so thaw them first.
+    thaw_children();
+    signum = translate_signal(signum);
+    if (signum != 0) {
+        signal_children(signum);
+        DEBUG("Forwarded signal %d to children.\n", signum);
+        if (workers_min && (signum == SIGTERM || signum == SIGINT || signum == SIGQUIT)) {
+            DEBUG("Not replacing workers anymore.\n");
+            workers_stopping = 1;
+        }
+    } else {
+        DEBUG("Not forwarding signal %d to children (ignored).\n", signum);
+    }
+}
+
+/*
+ * The dumb-init signal handler.
+ *
+ * The main job of this signal handler is to forward signals along to our child
+ * process(es). In setsid mode, this means signaling the entire process group
+ * rooted at our child. In non-setsid mode, this is just signaling the primary
+ * child.
+ *
+ * In most cases, simply proxying the received signal is sufficient. If we
+ * receive a job control signal, however, we should not only forward it, but
+ * also sleep dumb-init itself.
+ *
+ * This allows users to run foreground processes using dumb-init and to
+ * control them using normal shell job control features (e.g. Ctrl-Z to
+ * generate a SIGTSTP and suspend the process).
+ *
+ * The libc manual is useful:
+ * https://www.gnu.org/software/libc/manual/html_node/Job-Control-Signals.html
+ *
+*/
+void handle_signal(int signum) {
+    DEBUG("Received signal %d.\n", signum);
+    if (signum != SIGCHLD) {
+        note_activity();
+    }
+
+    if (signal_temporary_ignores[signum] == 1) {
+        DEBUG("Ignoring tty hand-off signal %d.\n", signum);
+        signal_temporary_ignores[signum] = 0;
+    } else if (signum == SIGCHLD) {
+        int status, exit_status;
+        pid_t killed_pid;
+        while ((killed_pid = waitpid(-1, &status, WNOHANG)) > 0) {
+            if (WIFEXITED(status)) {
+                exit_status = WEXITSTATUS(status);
+                DEBUG("A child with PID %d exited with exit status %d.\n", killed_pid, exit_status);
+            } else {
+                assert(WIFSIGNALED(status));
+                exit_status = 128 + WTERMSIG(status);
+                DEBUG("A child with PID %d was terminated by signal %d.\n", killed_pid, exit_status - 128);
+            }
+            trace_reaped(killed_pid, exit_status);
+
+            pre_start_hook_exited(killed_pid, exit_status);
+            if (generation_exited(killed_pid, exit_status) || worker_exited(killed_pid, exit_status)) {
+                continue;
+            }
+
+            if (killed_pid == child_pid) {
+                forward_signal(SIGTERM);  // send SIGTERM to any remaining children
+                DEBUG("Child exited with status %d. Goodbye.\n", exit_status);
+                exit(exit_status);
+            }
+        }
+    } else if (signum == reload_signal && child_pid > 0) {
+        start_reload();
+    } else if (waiting_for_connection) {
+        int translated = translate_signal(signum);
+        if (translated == SIGTERM || translated == SIGINT || translated == SIGQUIT || translated == SIGHUP) {
+            DEBUG("Received signal %d before the child was started. Goodbye.\n", translated);
+            exit(128 + translated);
+        }
+    } else {
+        forward_signal(signum);
+        if (signum == SIGTSTP || signum == SIGTTOU || signum == SIGTTIN) {
+            DEBUG("Suspending self due to TTY signal.\n");
+            kill(getpid(), SIGSTOP);
+        }
+    }
+}
+
+int compare_ints(const void *a, const void *b) {
+    return *(const int *)a - *(const int *)b;
+}
+
+int is_kept_fd(int fd) {
+    int i;
+    for (i = 0; i < keep_fds_len; i++) {
+        if (keep_fds[i] == fd) {
+            return 1;
+        }
+    }
+    return 0;
+}
+
+/*
+ * Close every descriptor in [first, last], preferring close_range(2) which
+ * does the whole range in a single syscall. Returns -1 if close_range is
+ * unavailable so the caller can fall back.
+ */
+int close_fd_range(unsigned int first, unsigned int last) {
+    if (first > last) {
+        return 0;
+    }
+#ifdef SYS_close_range
+    if (syscall(SYS_close_range, first, last, 0) == 0) {
+        return 0;
+    }
+#endif
+    return -1;
+}
+
+/*
+ * Close inherited file descriptors in the child, except stdin/stdout/stderr
+ * and anything on the allowlist.
+ *
+ * The fast path closes the gaps between kept descriptors with close_range(2).
+ * On older kernels we fall back to closing only the descriptors listed in
+ * /proc/self/fd, and only as a last resort loop over every possible fd.
+ */
+void close_inherited_fds(void) {
+    int i;
+    unsigned int first = 3;
+
+    qsort(keep_fds, keep_fds_len, sizeof(int), compare_ints);
+    for (i = 0; i <= keep_fds_len; i++) {
+        unsigned int last = i < keep_fds_len ? (unsigned int) keep_fds[i] - 1 : ~0U;
+        if (i < keep_fds_len && keep_fds[i] < 3) {
+            continue;
+        }
+        if (close_fd_range(first, last) == -1) {
+            goto fallback;
+        }
+        if (i < keep_fds_len) {
+            first = keep_fds[i] + 1;
+        }
+    }
+    DEBUG("Closed inherited file descriptors with close_range.\n");
+    return;
+
+fallback:
+    {
+        DIR *dir = opendir("/proc/self/fd");
+        if (dir != NULL) {
+            int fds[1024];
+            int fds_len;
+            struct dirent *entry;
+            do {
+                // Closing descriptors while iterating the directory is not
+                // safe, so collect a batch first.
+                fds_len = 0;
+                rewinddir(dir);
+                while ((entry = readdir(dir)) != NULL && fds_len < 1024) {
+                    int fd = atoi(entry->d_name);
+                    if (fd >= 3 && fd != dirfd(dir) && !is_kept_fd(fd)) {
+                        fds[fds_len++] = fd;
+                    }
+                }
+                for (i = 0; i < fds_len; i++) {
+                    close(fds[i]);
+                }
+            } while (fds_len == 1024);
+            closedir(dir);
+            DEBUG("Closed inherited file descriptors listed in /proc/self/fd.\n");
+        } else {
+            int fd;
+            long max_fd = sysconf(_SC_OPEN_MAX);
+            for (fd = 3; fd < max_fd; fd++) {
+                if (!is_kept_fd(fd)) {
+                    close(fd);
+                }
+            }
+            DEBUG("Closed inherited file descriptors up to %ld.\n", max_fd);
+        }
+    }
+}
+
+void apply_rlimits(void) {
+    int i;
+    for (i = 0; i < rlimits_len; i++) {
+        if (setrlimit(rlimits[i].resource, &rlimits[i].limit) == -1) {
+            PRINTERR(
+                "Unable to set resource limit %d (errno=%d %s). Exiting.\n",
+                rlimits[i].resource,
+                errno,
+                strerror(errno)
+            );
+            exit(1);
+        }
+    }
+}
+
+long long now_ms(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (long long) ts.tv_sec * 1000 + ts.tv_nsec / 1000000;
+}
+
+/*
+ * The event loop.
+ *
+ * Signals are read from a signalfd so they can be waited on together with
+ * any other file descriptors a feature needs to watch (cgroup event files,
+ * sockets, pipes). Features register a handler per file descriptor, and can
+ * arm one timer per handler function.
+ */
+#define MAXWATCHES (64 + MAXLOGSOURCES)
+#define MAXTIMERS 16
+
+typedef void (*watch_handler)(int fd, short revents);
+typedef void (*timer_handler)(void);
+
+struct watch {
+    int fd;
+    short events;
+    watch_handler handler;
+};
+
+struct timer {
+    long long deadline;
+    timer_handler handler;
+};
+
+struct watch watches[MAXWATCHES];
+int watches_len = 0;
+struct timer timers[MAXTIMERS];
+int timers_len = 0;
+
+void add_watch(int fd, short events, watch_handler handler) {
+    assert(watches_len < MAXWATCHES);
+    watches[watches_len].fd = fd;
+    watches[watches_len].events = events;
+    watches[watches_len].handler = handler;
+    watches_len++;
+}
+
+void remove_watch(int fd) {
+    int i;
+    for (i = 0; i < watches_len; i++) {
+        if (watches[i].fd == fd) {
+            watches[i] = watches[--watches_len];
+            return;
+        }
+    }
+}
+
+void set_timer(timer_handler handler, long long delay_ms) {
+    int i;
+    for (i = 0; i < timers_len; i++) {
+        if (timers[i].handler == handler) {
+            break;
+        }
+    }
+    if (i == timers_len) {
+        assert(timers_len < MAXTIMERS);
+        timers_len++;
+    }
+    timers[i].deadline = now_ms() + delay_ms;
+    timers[i].handler = handler;
+}
+
+void cancel_timer(timer_handler handler) {
+    int i;
+    for (i = 0; i < timers_len; i++) {
+        if (timers[i].handler == handler) {
+            timers[i] = timers[--timers_len];
+            return;
+        }
+    }
+}
+
+int poll_timeout(void) {
+    int i;
+    long long timeout = -1;
+    long long now = now_ms();
+    for (i = 0; i < timers_len; i++) {
+        long long remaining = timers[i].deadline - now;
+        if (remaining < 0) {
+            remaining = 0;
+        }
+        if (timeout == -1 || remaining < timeout) {
+            timeout = remaining;
+        }
+    }
+    return timeout > INT_MAX ? INT_MAX : (int) timeout;
+}
+
+void run_timers(void) {
+    int i;
+    long long now = now_ms();
+    for (i = 0; i < timers_len; i++) {
+        if (timers[i].deadline <= now) {
+            timer_handler handler = timers[i].handler;
+            timers[i] = timers[--timers_len];
+            handler();
+            // The handler may have added or removed timers.
+            i = -1;
+            now = now_ms();
+        }
+    }
+}
+
+// Run the event loop until *done becomes true, or forever if done is NULL.
+void run_event_loop(const char *done) {
+    struct pollfd fds[MAXWATCHES];
+    watch_handler handlers[MAXWATCHES];
+    int i, nfds, ready;
+
+    while (done == NULL || !*done) {
+        // Watches may be added or removed by handlers, so take a snapshot.
+        nfds = watches_len;
+        for (i = 0; i < nfds; i++) {
+            fds[i].fd = watches[i].fd;
+            fds[i].events = watches[i].events;
+            fds[i].revents = 0;
+            handlers[i] = watches[i].handler;
+        }
+        PROFILE_WAIT();
+        ready = poll(fds, nfds, poll_timeout());
+        if (ready == -1 && errno != EINTR) {
+            PRINTERR("poll failed (errno=%d %s). Exiting.\n", errno, strerror(errno));
+            exit(1);
+        }
+        for (i = 0; ready > 0 && i < nfds; i++) {
+            if (fds[i].revents) {
+                handlers[i](fds[i].fd, fds[i].revents);
+            }
+        }
+        run_timers();
+    }
+}
+
+void prepare_exec(void) {
+    if (close_fds) {
+        close_inherited_fds();
+    }
+    apply_rlimits();
+}
+
+/*
+ * Process lifecycle tracing.
+ *
+ * With --trace, dumb-init records when each descendant was forked, exec'd
+ * and exited, and writes the timeline as a Chrome trace (JSON) when it exits.
+ * Events come from the kernel's proc connector when it is available (this
+ * needs CAP_NET_ADMIN in the initial network namespace), which sees every
+ * descendant. The processes dumb-init starts and reaps itself are always
+ * recorded, so without the proc connector the trace still covers them. All
+ * timestamps are CLOCK_MONOTONIC, like those of the proc connector.
+ */
+#define MAXTRACE 4096
+
+struct trace_process {
+    pid_t pid;
+    pid_t ppid;
+    long long forked_ns;
+    long long exec_ns;
+    long long exited_ns;
+    int exit_status;
+    char name[128];
+};
+
+struct trace_process trace_processes[MAXTRACE];
+int trace_len = 0;
+int trace_dropped = 0;
+char trace_lost_events = 0;
+int trace_fd = -1;
+pid_t trace_owner = 0;
+long long trace_start_ns = 0;
+
+long long now_ns(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (long long) ts.tv_sec * 1000000000 + ts.tv_nsec;
+}
+
+// The most recent record of a process which hasn't exited yet.
+struct trace_process *find_traced(pid_t pid) {
+    int i;
+    for (i = trace_len - 1; i >= 0; i--) {
+        if (trace_processes[i].pid == pid && trace_processes[i].exited_ns == 0) {
+            return &trace_processes[i];
+        }
+    }
+    return NULL;
+}
+
+struct trace_process *trace_fork(pid_t pid, pid_t ppid, long long ns, const char *name) {
+    struct trace_process *process;
+    if (trace_len >= MAXTRACE) {
+        trace_dropped++;
+        return NULL;
+    }
+    process = &trace_processes[trace_len++];
+    memset(process, 0, sizeof(*process));
+    process->pid = pid;
+    process->ppid = ppid;
+    process->forked_ns = ns;
+    process->exit_status = -1;
+    snprintf(process->name, sizeof(process->name), "%s", name);
+    return process;
+}
+
+// Name a process after its (possibly truncated) command line.
+void trace_exec(struct trace_process *process, long long ns) {
+    char path[64];
+    ssize_t len, i;
+    int fd;
+
+    process->exec_ns = ns;
+    snprintf(path, sizeof(path), "/proc/%d/cmdline", process->pid);
+    if ((fd = open(path, O_RDONLY | O_CLOEXEC)) == -1) {
+        return;
+    }
+    len = read(fd, process->name, sizeof(process->name) - 1);
+    close(fd);
+    if (len <= 0) {
+        return;
+    }
+    // Arguments are NUL-separated (and NUL-terminated).
+    while (len > 0 && process->name[len - 1] == '\0') {
+        len--;
+    }
+    for (i = 0; i < len; i++) {
+        if (process->name[i] == '\0') {
+            process->name[i] = ' ';
+        }
+    }
+    process->name[len] = '\0';
+}
+
+void handle_proc_events(int fd, short revents) {
+    char buf[8192] __attribute__((aligned(NLMSG_ALIGNTO)));
+    ssize_t len;
+
+    while ((len = recv(fd, buf, sizeof(buf), 0)) > 0) {
+        int remaining = len;
+        struct nlmsghdr *hdr;
+        for (hdr = (struct nlmsghdr *) buf; NLMSG_OK(hdr, remaining); hdr = NLMSG_NEXT(hdr, remaining)) {
+            struct cn_msg *msg = NLMSG_DATA(hdr);
+            struct proc_event *event = (struct proc_event *) msg->data;
+            struct trace_process *process;
+
+            if (hdr->nlmsg_type != NLMSG_DONE || msg->id.idx != CN_IDX_PROC) {
+                continue;
+            }
+            if (event->what == PROC_EVENT_FORK) {
+                pid_t ppid = event->event_data.fork.parent_tgid;
+                // Threads are reported too; only new processes are interesting.
+                if (event->event_data.fork.child_pid != event->event_data.fork.child_tgid) {
+                    continue;
+                }
+                process = find_traced(ppid);
+                if (process != NULL || ppid == trace_owner) {
+                    trace_fork(
+                        event->event_data.fork.child_tgid, ppid, event->timestamp_ns,
+                        process != NULL ? process->name : ""
+                    );
+                }
+            } else if (event->what == PROC_EVENT_EXEC) {
+                if ((process = find_traced(event->event_data.exec.process_tgid)) != NULL) {
+                    trace_exec(process, event->timestamp_ns);
+                }
+            } else if (event->what == PROC_EVENT_EXIT) {
+                int status = event->event_data.exit.exit_code;
+                if (event->event_data.exit.process_pid != event->event_data.exit.process_tgid) {
+                    continue;
+                }
+                if ((process = find_traced(event->event_data.exit.process_tgid)) != NULL) {
+                    process->exited_ns = event->timestamp_ns;
+                    process->exit_status = WIFSIGNALED(status) ? 128 + WTERMSIG(status) : WEXITSTATUS(status);
+                }
+            }
+        }
+    }
+    if (len == -1 && errno == ENOBUFS) {
+        DEBUG("Lost process events; the trace will be incomplete.\n");
+        trace_lost_events = 1;
+    }
+}
+
+// Called by dumb-init after it forks a process.
+void trace_spawned(pid_t pid, const char *name) {
+    if (trace_path == NULL || pid <= 0) {
+        return;
+    }
+    // The proc connector may already know about it, with an exact timestamp.
+    if (trace_fd != -1) {
+        handle_proc_events(trace_fd, POLLIN);
+    }
+    if (find_traced(pid) == NULL) {
+        trace_fork(pid, trace_owner, now_ns(), name);
+    }
+}
+
+// Called by dumb-init after it reaps a process.
+void trace_reaped(pid_t pid, int exit_status) {
+    struct trace_process *process;
+    if (trace_path == NULL) {
+        return;
+    }
+    if (trace_fd != -1) {
+        handle_proc_events(trace_fd, POLLIN);
+    }
+    if ((process = find_traced(pid)) != NULL) {
+        process->exited_ns = now_ns();
+        process->exit_status = exit_status;
+    }
+}
+
+void write_trace_string(FILE *f, const char *s) {
+    fputc('"', f);
+    for (; *s != '\0'; s++) {
+        unsigned char c = *s;
+        if (c == '"' || c == '\\') {
+            fprintf(f, "\\%c", c);
+        } else if (c < 0x20 || c >= 0x7f) {
+            // Command lines aren't necessarily valid UTF-8, so escape bytes.
+            fprintf(f, "\\u%04x", c);
+        } else {
+            fputc(c, f);
+        }
+    }
+    fputc('"', f);
+}
+
+double trace_us(long long ns) {
+    return ns > trace_start_ns ? (ns - trace_start_ns) / 1000.0 : 0;
+}
+
+void write_trace(void) {
+    long long end;
+    FILE *f;
+    int i;
+
+    // Processes forked by dumb-init inherit this atexit handler.
+    if (getpid() != trace_owner) {
+        return;
+    }
+    if (trace_fd != -1) {
+        handle_proc_events(trace_fd, POLLIN);
+    }
+    end = now_ns();
+
+    f = fopen(trace_path, "w");
+    if (f == NULL) {
+        PRINTERR("Unable to write trace to %s (errno=%d %s).\n", trace_path, errno, strerror(errno));
+        return;
+    }
+    fprintf(f, "{\"displayTimeUnit\": \"ms\", \"traceEvents\": [\n");
+    fprintf(
+        f,
+        "{\"name\": \"dumb-init\", \"ph\": \"X\", \"pid\": %d, \"tid\": %d, \"ts\": 0, \"dur\": %.3f}",
+        trace_owner, trace_owner, trace_us(end)
+    );
+    for (i = 0; i < trace_len; i++) {
+        struct trace_process *process = &trace_processes[i];
+        long long exited = process->exited_ns ? process->exited_ns : end;
+
+        fprintf(f, ",\n{\"name\": ");
+        write_trace_string(f, process->name[0] != '\0' ? process->name : "?");
+        fprintf(
+            f,
+            ", \"ph\": \"X\", \"pid\": %d, \"tid\": %d, \"ts\": %.3f, \"dur\": %.3f, "
+            "\"args\": {\"pid\": %d, \"ppid\": %d",
+            trace_owner, process->pid, trace_us(process->forked_ns),
+            trace_us(exited) - trace_us(process->forked_ns), process->pid, process->ppid
+        );
+        if (process->exited_ns) {
+            fprintf(f, ", \"exit_status\": %d}}", process->exit_status);
+        } else {
+            fprintf(f, ", \"running\": true}}");
+        }
+        if (process->exec_ns) {
+            fprintf(
+                f,
+                ",\n{\"name\": \"exec\", \"ph\": \"i\", \"s\": \"t\", \"pid\": %d, \"tid\": %d, \"ts\": %.3f}",
+                trace_owner, process->pid, trace_us(process->exec_ns)
+            );
+        }
+    }
+    fprintf(
+        f,
+        "\n], \"otherData\": {\"source\": \"%s\", \"dropped\": %d, \"lost_events\": %s}}\n",
+        trace_fd != -1 ? "proc connector" : "dumb-init", trace_dropped, trace_lost_events ? "true" : "false"
+    );
+    if (fclose(f) == EOF) {
+        PRINTERR("Unable to write trace to %s (errno=%d %s).\n", trace_path, errno, strerror(errno));
+    }
+}
+
+void start_trace(void) {
+    struct sockaddr_nl addr;
+    char buf[NLMSG_SPACE(sizeof(struct cn_msg) + sizeof(enum proc_cn_mcast_op))];
+    struct nlmsghdr *hdr = (struct nlmsghdr *) buf;
+    struct cn_msg *msg;
+    enum proc_cn_mcast_op op = PROC_CN_MCAST_LISTEN;
+    int fd, size = 4 * 1024 * 1024;
+
+    trace_owner = getpid();
+    trace_start_ns = now_ns();
+    atexit(write_trace);
+
+    fd = socket(AF_NETLINK, SOCK_DGRAM | SOCK_NONBLOCK | SOCK_CLOEXEC, NETLINK_CONNECTOR);
+    if (fd == -1) {
+        DEBUG("Unable to open the proc connector (errno=%d %s); only tracing direct children.\n", errno, strerror(errno));
+        return;
+    }
+    // Bursts of forks shouldn't overflow the socket; this needs privileges, so
+    // fall back to the default size.
+    if (setsockopt(fd, SOL_SOCKET, SO_RCVBUFFORCE, &size, sizeof(size)) == -1) {
+        setsockopt(fd, SOL_SOCKET, SO_RCVBUF, &size, sizeof(size));
+    }
+
+    memset(&addr, 0, sizeof(addr));
+    addr.nl_family = AF_NETLINK;
+    addr.nl_groups = CN_IDX_PROC;
+    memset(buf, 0, sizeof(buf));
+    hdr->nlmsg_len = sizeof(buf);
+    hdr->nlmsg_type = NLMSG_DONE;
+    hdr->nlmsg_pid = getpid();
+    msg = NLMSG_DATA(hdr);
+    msg->id.idx = CN_IDX_PROC;
+    msg->id.val = CN_VAL_PROC;
+    msg->len = sizeof(op);
+    memcpy(msg->data, &op, sizeof(op));
+    if (bind(fd, (struct sockaddr *) &addr, sizeof(addr)) == -1 || send(fd, buf, sizeof(buf), 0) == -1) {
+        DEBUG("Unable to open the proc connector (errno=%d %s); only tracing direct children.\n", errno, strerror(errno));
+        close(fd);
+        return;
+    }
+    trace_fd = fd;
+    add_watch(fd, POLLIN, handle_proc_events);
+}
+
+/*
+ * Log relay.
+ *
+ * With --log-relay, each child gets its own pipes for stdout and stderr, and
+ * dumb-init copies whole lines from them to its own stdout and stderr, so the
+ * output of different children never interleaves mid-line. Lines can be
+ * prefixed and timestamped. When the output keeps up, lines are written
+ * straight from the buffer they were read into; otherwise they are queued,
+ * and once the queue is full the overflow policy applies:
+ *
+ *   block     Stop reading from the children until the output drains, so
+ *             they block writing to their pipes (as they would without the
+ *             relay).
+ *   drop      Drop lines, and report how many were dropped.
+ *   buffer:N  Queue up to N MB, then block.
+ *
+ * Output is written without blocking, so a slow log consumer never holds up
+ * signal handling.
+ */
+#define LOG_LINE_MAX 16384
+#define LOG_DRAIN_TIMEOUT_MS 5000
+// Lines written with a single writev(2).
+#define LOG_BATCH 256
+
+struct log_source {
+    int fd;
+    int stream;
+    char prefix[256];
+    size_t prefix_len;
+    char *buf;
+    size_t len;
+};
+
+struct log_output {
+    int fd;
+    char is_socket;
+    char *buf;
+    size_t len;
+    size_t size;
+    char watching;
+    char failed;
+    long long dropped;
+};
+
+const char *log_stream_names[] = {"stdout", "stderr"};
+struct log_source log_sources[MAXLOGSOURCES];
+int log_sources_len = 0;
+struct log_output log_outputs[2];
+char log_paused = 0;
+pid_t log_owner = 0;
+
+void handle_log_source(int fd, short revents);
+void handle_log_output(int fd, short revents);
+
+void pause_log_sources(char paused) {
+    int i;
+    if (paused == log_paused) {
+        return;
+    }
+    log_paused = paused;
+    for (i = 0; i < log_sources_len; i++) {
+        if (paused) {
+            remove_watch(log_sources[i].fd);
+        } else {
+            add_watch(log_sources[i].fd, POLLIN, handle_log_source);
+        }
+    }
+}
+
+void queue_log_output(struct log_output *out, const char *data, size_t len) {
+    if (out->len + len > out->size) {
+        size_t size = out->size ? out->size : 4096;
+        char *buf;
+        while (size < out->len + len) {
+            size *= 2;
+        }
+        if ((buf = realloc(out->buf, size)) == NULL) {
+            out->dropped++;
+            return;
+        }
+        out->buf = buf;
+        out->size = size;
+    }
+    memcpy(out->buf + out->len, data, len);
+    out->len += len;
+    if (!out->watching) {
+        add_watch(out->fd, POLLOUT, handle_log_output);
+        out->watching = 1;
+    }
+}
+
+/*
+ * Sockets can't be reopened to get a non-blocking file description of our
+ * own (see open_log_output()), so they are written with MSG_DONTWAIT.
+ */
+ssize_t write_log_output(struct log_output *out, struct iovec *iov, int iovcnt) {
+    if (out->is_socket) {
+        struct msghdr msg;
+        memset(&msg, 0, sizeof(msg));
+        msg.msg_iov = iov;
+        msg.msg_iovlen = iovcnt;
+        return sendmsg(out->fd, &msg, MSG_DONTWAIT | MSG_NOSIGNAL);
+    }
+    return writev(out->fd, iov, iovcnt);
+}
+
+void flush_log_output(struct log_output *out) {
+    size_t written = 0;
+    while (written < out->len) {
+        struct iovec iov = {out->buf + written, out->len - written};
+        ssize_t n = write_log_output(out, &iov, 1);
+        if (n > 0) {
+            written += n;
+        } else if (n == -1 && errno == EINTR) {
+            continue;
+        } else {
+            if (n == -1 && errno != EAGAIN) {
+                // Nobody is reading our output anymore; discard it from now on.
+                out->failed = 1;
+                written = out->len;
+            }
+            break;
+        }
+    }
+    out->len -= written;
+    memmove(out->buf, out->buf + written, out->len);
+
+    if (out->len == 0 && out->dropped > 0 && !out->failed) {
+        char notice[64];
+        int len = snprintf(notice, sizeof(notice), "[dumb-init] Dropped %lld lines.\n", out->dropped);
+        out->dropped = 0;
+        queue_log_output(out, notice, len);
+        return;
+    }
+    if (out->len == 0 && out->watching) {
+        remove_watch(out->fd);
+        out->watching = 0;
+    }
+    if (log_paused &&
+            log_outputs[0].len <= log_buffer_max / 2 &&
+            log_outputs[1].len <= log_buffer_max / 2) {
+        pause_log_sources(0);
+    }
+}
+
+void handle_log_output(int fd, short revents) {
+    flush_log_output(fd == log_outputs[0].fd ? &log_outputs[0] : &log_outputs[1]);
+}
+
+size_t format_log_timestamp(char *buf, size_t size) {
+    struct timespec ts;
+    struct tm tm;
+    size_t len;
+    clock_gettime(CLOCK_REALTIME, &ts);
+    gmtime_r(&ts.tv_sec, &tm);
+    len = strftime(buf, size, "%Y-%m-%dT%H:%M:%S", &tm);
+    return len + snprintf(buf + len, size - len, ".%03ldZ ", ts.tv_nsec / 1000000);
+}
+
+// Write lines (each ending with a newline) with their prefix in one go, and
+// queue whatever couldn't be written.
+void log_lines(struct log_source *source, struct iovec *lines, int count) {
+    struct log_output *out = &log_outputs[source->stream];
+    struct iovec iov[3 * LOG_BATCH];
+    char stamp[32];
+    size_t stamp_len = 0, written = 0;
+    int i, iovcnt = 0, per_line;
+
+    if (out->failed || count == 0) {
+        return;
+    }
+    if (log_timestamps) {
+        stamp_len = format_log_timestamp(stamp, sizeof(stamp));
+    }
+    for (i = 0; i < count; i++) {
+        if (stamp_len > 0) {
+            iov[iovcnt].iov_base = stamp;
+            iov[iovcnt++].iov_len = stamp_len;
+        }
+        if (source->prefix_len > 0) {
+            iov[iovcnt].iov_base = source->prefix;
+            iov[iovcnt++].iov_len = source->prefix_len;
+        }
+        iov[iovcnt++] = lines[i];
+    }
+    per_line = iovcnt / count;
+
+    if (out->len == 0) {
+        ssize_t n = write_log_output(out, iov, iovcnt);
+        if (n > 0) {
+            written = n;
+        } else if (n == -1 && errno != EAGAIN && errno != EINTR) {
+            out->failed = 1;
+            return;
+        }
+    }
+    for (i = 0; i < iovcnt; i++) {
+        if (written >= iov[i].iov_len) {
+            written -= iov[i].iov_len;
+        } else if (written == 0 && i % per_line == 0 && log_overflow == LOG_DROP && out->len >= log_buffer_max) {
+            out->dropped++;
+            i += per_line - 1;
+        } else {
+            // Once part of a line is written, the rest has to be queued.
+            queue_log_output(out, (char *) iov[i].iov_base + written, iov[i].iov_len - written);
+            written = 0;
+        }
+    }
+    if (log_overflow != LOG_DROP && out->len >= log_buffer_max) {
+        pause_log_sources(1);
+    }
+}
+
+// Relay the complete lines in the source's buffer (or everything, at EOF).
+void relay_log_lines(struct log_source *source, char eof) {
+    char *start = source->buf, *end = source->buf + source->len, *newline;
+    struct iovec lines[LOG_BATCH];
+    int count = 0;
+
+    while ((newline = memchr(start, '\n', end - start)) != NULL) {
+        lines[count].iov_base = start;
+        lines[count++].iov_len = newline + 1 - start;
+        start = newline + 1;
+        if (count == LOG_BATCH) {
+            log_lines(source, lines, count);
+            count = 0;
+        }
+    }
+    // Lines which don't fit in the buffer are split.
+    if (start < end && (eof || (start == source->buf && source->len == LOG_LINE_MAX))) {
+        source->buf[source->len] = '\n';
+        lines[count].iov_base = start;
+        lines[count++].iov_len = end + 1 - start;
+        start = end;
+    }
+    log_lines(source, lines, count);
+    source->len = end - start;
+    memmove(source->buf, start, source->len);
+}
+
+void close_log_source(struct log_source *source) {
+    relay_log_lines(source, 1);
+    if (!log_paused) {
+        remove_watch(source->fd);
+    }
+    close(source->fd);
+    free(source->buf);
+    *source = log_sources[--log_sources_len];
+}
+
+// Returns 0 once the source is closed.
+int read_log_source(struct log_source *source) {
+    ssize_t n = read(source->fd, source->buf + source->len, LOG_LINE_MAX - source->len);
+    if (n > 0) {
+        source->len += n;
+        relay_log_lines(source, 0);
+        return 1;
+    } else if (n == -1 && (errno == EAGAIN || errno == EINTR)) {
+        return 1;
+    }
+    close_log_source(source);
+    return 0;
+}
+
+void handle_log_source(int fd, short revents) {
+    int i;
+    for (i = 0; i < log_sources_len; i++) {
+        if (log_sources[i].fd == fd) {
+            read_log_source(&log_sources[i]);
+            return;
+        }
+    }
+}
+
+void add_log_source(int fd, int stream, pid_t pid, const char *name) {
+    struct log_source *source;
+    const char *base = strrchr(name, '/') ? strrchr(name, '/') + 1 : name;
+    const char *c;
+    size_t len = 0;
+    // Room for splitting long lines with a newline.
+    char *buf = malloc(LOG_LINE_MAX + 1);
+
+    if (buf == NULL) {
+        PRINTERR("Unable to allocate a log relay buffer. Exiting.\n");
+        exit(1);
+    }
+    source = &log_sources[log_sources_len++];
+    memset(source, 0, sizeof(*source));
+    source->fd = fd;
+    source->stream = stream;
+    source->buf = buf;
+    for (c = log_prefix; *c != '\0' && len < sizeof(source->prefix) - 1; c++) {
+        char *p = source->prefix + len;
+        size_t left = sizeof(source->prefix) - len;
+        int n = 1;
+        if (c[0] != '%' || c[1] == '\0') {
+            *p = *c;
+        } else if (*++c == 'p') {
+            n = snprintf(p, left, "%d", pid);
+        } else if (*c == 'n') {
+            n = snprintf(p, left, "%s", base);
+        } else if (*c == 's') {
+            n = snprintf(p, left, "%s", log_stream_names[stream]);
+        } else {
+            *p = *c;
+        }
+        len = (size_t) n < left ? len + n : sizeof(source->prefix) - 1;
+    }
+    source->prefix_len = len;
+    fcntl(fd, F_SETFL, fcntl(fd, F_GETFL) | O_NONBLOCK);
+    if (!log_paused) {
+        add_watch(fd, POLLIN, handle_log_source);
+    }
+}
+
+/*
+ * Create the pipes for a new child. Returns 0 if there's no room for more
+ * sources, in which case the child just inherits our stdout and stderr.
+ */
+int open_log_pipes(int pipes[2][2]) {
+    if (!log_relay || log_sources_len + 2 > MAXLOGSOURCES) {
+        return 0;
+    }
+    if (pipe2(pipes[0], O_CLOEXEC) == -1) {
+        return 0;
+    }
+    if (pipe2(pipes[1], O_CLOEXEC) == -1) {
+        close(pipes[0][0]);
+        close(pipes[0][1]);
+        return 0;
+    }
+    return 1;
+}
+
+// Write whatever the children have left in their pipes before exiting.
+void drain_log_relay(void) {
+    long long deadline;
+    int i;
+
+    // Processes forked by dumb-init inherit this atexit handler.
+    if (getpid() != log_owner) {
+        return;
+    }
+    for (i = log_sources_len - 1; i >= 0; i--) {
+        struct log_source *source = &log_sources[i];
+        int left = 0;
+        // Descendants may keep the pipe open and keep writing, so only take
+        // what is already in it rather than waiting for EOF.
+        ioctl(source->fd, FIONREAD, &left);
+        while (left > 0) {
+            ssize_t n = read(source->fd, source->buf + source->len, LOG_LINE_MAX - source->len);
+            if (n <= 0) {
+                break;
+            }
+            source->len += n;
+            left -= n;
+            relay_log_lines(source, 0);
+        }
+        close_log_source(source);
+    }
+    // If nobody is reading our output, give up on it after a while.
+    deadline = now_ms() + LOG_DRAIN_TIMEOUT_MS;
+    for (i = 0; i < 2; i++) {
+        struct log_output *out = &log_outputs[i];
+        struct pollfd pfd = {out->fd, POLLOUT, 0};
+        while (out->len > 0 && !out->failed && now_ms() < deadline) {
+            poll(&pfd, 1, deadline - now_ms());
+            flush_log_output(out);
+        }
+    }
+}
+
+void open_log_output(struct log_output *out, int fd) {
+    struct stat st;
+    char path[32];
+
+    out->fd = -1;
+    /*
+     * Pipes and terminals are reopened to get a file description of our own
+     * which can be made non-blocking without affecting anyone sharing the
+     * original one. Regular files don't block, and sockets can't be reopened,
+     * so they are written without blocking instead.
+     */
+    if (fstat(fd, &st) == 0) {
+        if (S_ISFIFO(st.st_mode) || S_ISCHR(st.st_mode)) {
+            snprintf(path, sizeof(path), "/proc/self/fd/%d", fd);
+            out->fd = open(path, O_WRONLY | O_NONBLOCK | O_CLOEXEC);
+        }
+        out->is_socket = S_ISSOCK(st.st_mode);
+    }
+    if (out->fd == -1) {
+        out->fd = fcntl(fd, F_DUPFD_CLOEXEC, 3);
+    }
+    if (out->fd == -1) {
+        PRINTERR("Unable to set up the log relay (errno=%d %s). Exiting.\n", errno, strerror(errno));
+        exit(1);
+    }
+}
+
+void start_log_relay(void) {
+    open_log_output(&log_outputs[0], STDOUT_FILENO);
+    open_log_output(&log_outputs[1], STDERR_FILENO);
+    log_owner = getpid();
+    atexit(drain_log_relay);
+}
+
+/*
+ * Socket activation.
+ *
+ * Listening sockets are bound by dumb-init itself and handed to the child
+ * using the LISTEN_FDS/LISTEN_PID convention from sd_listen_fds(3): they are
+ * placed at file descriptors 3, 4, ... and LISTEN_PID is set to the child's
+ * PID. dumb-init keeps its own copies open, so connections queue up in the
+ * kernel backlog while the child is (re)starting instead of being refused.
+ */
+int bind_listener(struct listener *listener) {
+    char *address = listener->address;
+    int fd;
+
+    if (strncmp(address, "unix:", 5) == 0) {
+        struct sockaddr_un addr;
+        struct stat st;
+        char *path = address + 5;
+
+        memset(&addr, 0, sizeof(addr));
+        addr.sun_family = AF_UNIX;
+        if (*path == '\0' || strlen(path) >= sizeof(addr.sun_path)) {
+            errno = ENAMETOOLONG;
+            return -1;
+        }
+        strcpy(addr.sun_path, path);
+        // Remove a stale socket left behind by a previous run.
+        if (stat(path, &st) == 0 && S_ISSOCK(st.st_mode)) {
+            unlink(path);
+        }
+        fd = socket(AF_UNIX, SOCK_STREAM | SOCK_CLOEXEC, 0);
+        if (fd == -1 || bind(fd, (struct sockaddr *) &addr, sizeof(addr)) == -1) {
+            return -1;
+        }
+    } else if (strncmp(address, "tcp:", 4) == 0) {
+        struct sockaddr_in6 addr6;
+        struct sockaddr_in addr4;
+        struct sockaddr *addr;
+        socklen_t addr_len;
+        char host[INET6_ADDRSTRLEN + 1] = "0.0.0.0";
+        char *port_str = strrchr(address + 4, ':');
+        char *end;
+        long port;
+        int one = 1;
+
+        if (port_str == NULL) {
+            port_str = address + 4;
+        } else {
+            size_t host_len = port_str - (address + 4);
+            char *host_str = address + 4;
+            port_str++;
+            if (host_len >= 2 && host_str[0] == '[' && host_str[host_len - 1] == ']') {
+                host_str++;
+                host_len -= 2;
+            }
+            if (host_len >= sizeof(host)) {
+                errno = EINVAL;
+                return -1;
+            }
+            memcpy(host, host_str, host_len);
+            host[host_len] = '\0';
+        }
+        port = strtol(port_str, &end, 10);
+        if (*port_str == '\0' || *end != '\0' || port < 0 || port > 65535) {
+            errno = EINVAL;
+            return -1;
+        }
+
+        memset(&addr4, 0, sizeof(addr4));
+        memset(&addr6, 0, sizeof(addr6));
+        if (inet_pton(AF_INET, host, &addr4.sin_addr) == 1) {
+            addr4.sin_family = AF_INET;
+            addr4.sin_port = htons(port);
+            addr = (struct sockaddr *) &addr4;
+            addr_len = sizeof(addr4);
+        } else if (inet_pton(AF_INET6, host, &addr6.sin6_addr) == 1) {
+            addr6.sin6_family = AF_INET6;
+            addr6.sin6_port = htons(port);
+            addr = (struct sockaddr *) &addr6;
+            addr_len = sizeof(addr6);
+        } else {
+            errno = EINVAL;
+            return -1;
+        }
+        fd = socket(addr->sa_family, SOCK_STREAM | SOCK_CLOEXEC, 0);
+        if (fd == -1) {
+            return -1;
+        }
+        setsockopt(fd, SOL_SOCKET, SO_REUSEADDR, &one, sizeof(one));
+        if (bind(fd, addr, addr_len) == -1) {
+            return -1;
+        }
+    } else {
+        errno = EINVAL;
+        return -1;
+    }
+
+    if (listen(fd, listen_backlog) == -1) {
+        return -1;
+    }
+    listener->fd = fd;
+    return 0;
+}
+
+void bind_listeners(void) {
+    int i;
+    for (i = 0; i < listeners_len; i++) {
+        if (bind_listener(&listeners[i]) == -1) {
+            PRINTERR(
+                "Unable to listen on %s (errno=%d %s). Exiting.\n",
+                listeners[i].address, errno, strerror(errno)
+            );
+            exit(1);
+        }
+        DEBUG("Listening on %s (fd %d).\n", listeners[i].address, listeners[i].fd);
+    }
+}
+
+/*
+ * In the child, move the listening sockets to fds 3, 4, ... and set
+ * LISTEN_FDS and LISTEN_PID.
+ */
+void pass_listeners(void) {
+    char value[32];
+    int i;
+
+    if (listeners_len == 0) {
+        return;
+    }
+    // First move everything out of the way so that dup2 can't clobber a
+    // socket we still need to move.
+    for (i = 0; i < listeners_len; i++) {
+        listeners[i].fd = fcntl(listeners[i].fd, F_DUPFD_CLOEXEC, 3 + listeners_len);
+    }
+    for (i = 0; i < listeners_len; i++) {
+        if (listeners[i].fd == -1 || dup2(listeners[i].fd, 3 + i) == -1) {
+            PRINTERR("Unable to pass listening sockets (errno=%d %s). Exiting.\n", errno, strerror(errno));
+            exit(1);
+        }
+        close(listeners[i].fd);
+        keep_fds[keep_fds_len++] = 3 + i;
+    }
+    snprintf(value, sizeof(value), "%d", listeners_len);
+    setenv("LISTEN_FDS", value, 1);
+    snprintf(value, sizeof(value), "%d", getpid());
+    setenv("LISTEN_PID", value, 1);
+}
+
+/*
+ * With --lazy-spawn, wait until a connection arrives on one of the listening
+ * sockets before starting the child.
+ */
+char connection_pending = 0;
+
+void handle_first_connection(int fd, short revents) {
+    DEBUG("Connection pending on fd %d, starting the child.\n", fd);
+    connection_pending = 1;
+}
+
+void wait_for_first_connection(void) {
+    int i;
+    for (i = 0; i < listeners_len; i++) {
+        add_watch(listeners[i].fd, POLLIN, handle_first_connection);
+    }
+    DEBUG("Waiting for the first connection before starting the child.\n");
+    waiting_for_connection = 1;
+    run_event_loop(&connection_pending);
+    waiting_for_connection = 0;
+    for (i = 0; i < listeners_len; i++) {
+        remove_watch(listeners[i].fd);
+    }
+}
+
+/*
+ * Readiness and watchdog notifications.
+ *
+ * With --notify-socket, dumb-init binds a datagram socket and passes it to
+ * the child as NOTIFY_SOCKET, so apps using sd_notify(3) can report
+ * READY=1, STATUS=... and WATCHDOG=1. Readiness is exposed by creating
+ * --ready-file and running --ready-command, and also completes a pending
+ * reload. If --watchdog-sec is set and pings stop, the watchdog signal is
+ * forwarded to the children.
+ */
+void pass_notify_socket(void) {
+    char value[32];
+    if (notify_socket_path == NULL) {
+        return;
+    }
+    setenv("NOTIFY_SOCKET", notify_socket_path, 1);
+    if (watchdog_ms) {
+        snprintf(value, sizeof(value), "%lld", (long long) watchdog_ms * 1000);
+        setenv("WATCHDOG_USEC", value, 1);
+        snprintf(value, sizeof(value), "%d", getpid());
+        setenv("WATCHDOG_PID", value, 1);
+    }
+}
+
+void bind_notify_socket(void) {
+    struct sockaddr_un addr;
+    socklen_t addr_len;
+    size_t path_len = strlen(notify_socket_path);
+    int one = 1;
+
+    memset(&addr, 0, sizeof(addr));
+    addr.sun_family = AF_UNIX;
+    if (path_len == 0 || path_len >= sizeof(addr.sun_path)) {
+        errno = ENAMETOOLONG;
+        goto error;
+    }
+    memcpy(addr.sun_path, notify_socket_path, path_len);
+    if (addr.sun_path[0] == '@') {
+        // abstract namespace
+        addr.sun_path[0] = '\0';
+    } else {
+        unlink(notify_socket_path);
+    }
+    addr_len = offsetof(struct sockaddr_un, sun_path) + path_len;
+
+    notify_fd = socket(AF_UNIX, SOCK_DGRAM | SOCK_CLOEXEC | SOCK_NONBLOCK, 0);
+    if (notify_fd == -1 ||
+            bind(notify_fd, (struct sockaddr *) &addr, addr_len) == -1 ||
+            setsockopt(notify_fd, SOL_SOCKET, SO_PASSCRED, &one, sizeof(one)) == -1) {
+        goto error;
+    }
+    if (ready_file != NULL) {
+        unlink(ready_file);
+    }
+    return;
+
+error:
+    PRINTERR(
+        "Unable to bind notify socket %s (errno=%d %s). Exiting.\n",
+        notify_socket_path, errno, strerror(errno)
+    );
+    exit(1);
+}
+
+void watchdog_expired(void) {
+    PRINTERR("Watchdog timeout, no ping received for %ld ms.\n", watchdog_ms);
+    forward_signal(watchdog_signal);
+    set_timer(watchdog_expired, watchdog_ms);
+}
+
+// Whether pid is the process pid_of_generation or (in setsid mode) one of
+// its descendants in the same session.
+int is_in_generation(pid_t pid, pid_t pid_of_generation) {
+    return pid_of_generation > 0 && (
+        pid == pid_of_generation || (use_setsid && getsid(pid) == pid_of_generation)
+    );
+}
+
+void mark_ready(void) {
+    int fd;
+    if (child_ready) {
+        return;
+    }
+    child_ready = 1;
+    DEBUG("Child is ready after %lld ms.\n", now_ms() - start_time);
+    if (ready_file != NULL) {
+        fd = open(ready_file, O_WRONLY | O_CREAT | O_TRUNC | O_CLOEXEC, 0644);
+        if (fd == -1) {
+            PRINTERR("Unable to create %s (errno=%d %s).\n", ready_file, errno, strerror(errno));
+        } else {
+            close(fd);
+        }
+    }
+    if (ready_command != NULL) {
+        pid_t pid = fork();
+        if (pid == 0) {
+            sigset_t all_signals;
+            sigfillset(&all_signals);
+            sigprocmask(SIG_UNBLOCK, &all_signals, NULL);
+            if (child_cwd != NULL && chdir(child_cwd) == -1) {
+                PRINTERR("Unable to chdir to %s (errno=%d %s).\n", child_cwd, errno, strerror(errno));
+                exit(2);
+            }
+            execl("/bin/sh", "sh", "-c", ready_command, (char *) NULL);
+            PRINTERR("/bin/sh: %s\n", strerror(errno));
+            exit(2);
+        } else if (pid < 0) {
+            PRINTERR("Unable to fork for the ready command.\n");
+        }
+        trace_spawned(pid, ready_command);
+    }
+}
+
+void handle_notify_message(pid_t sender, char *message) {
+    char *line, *next;
+    for (line = message; line != NULL && *line != '\0'; line = next) {
+        next = strchr(line, '\n');
+        if (next != NULL) {
+            *next++ = '\0';
+        }
+        if (strcmp(line, "READY=1") == 0) {
+            if (is_in_generation(sender, pending_pid)) {
+                finish_reload();
+            } else {
+                mark_ready();
+            }
+        } else if (strncmp(line, "STATUS=", 7) == 0) {
+            DEBUG("Child status: %s\n", line + 7);
+        } else if (strcmp(line, "WATCHDOG=1") == 0) {
+            if (watchdog_ms) {
+                set_timer(watchdog_expired, watchdog_ms);
+            }
+        } else if (strcmp(line, "WATCHDOG=trigger") == 0) {
+            if (watchdog_ms) {
+                watchdog_expired();
+            }
+        }
+    }
+}
+
+void handle_notify(int fd, short revents) {
+    char buf[4096];
+    char control[CMSG_SPACE(sizeof(struct ucred))];
+    struct iovec iov = {buf, sizeof(buf) - 1};
+    struct msghdr msg;
+    struct cmsghdr *cmsg;
+    ssize_t n;
+
+    for (;;) {
+        pid_t sender = 0;
+        memset(&msg, 0, sizeof(msg));
+        msg.msg_iov = &iov;
+        msg.msg_iovlen = 1;
+        msg.msg_control = control;
+        msg.msg_controllen = sizeof(control);
+        n = recvmsg(fd, &msg, MSG_DONTWAIT);
+        if (n < 0) {
+            return;
+        }
+        buf[n] = '\0';
+        for (cmsg = CMSG_FIRSTHDR(&msg); cmsg != NULL; cmsg = CMSG_NXTHDR(&msg, cmsg)) {
+            if (cmsg->cmsg_level == SOL_SOCKET && cmsg->cmsg_type == SCM_CREDENTIALS) {
+                struct ucred cred;
+                memcpy(&cred, CMSG_DATA(cmsg), sizeof(cred));
+                sender = cred.pid;
+            }
+        }
+        handle_notify_message(sender, buf);
+    }
+}
+
+void start_notify_socket(void) {
+    if (notify_socket_path == NULL) {
+        return;
+    }
+    bind_notify_socket();
+    add_watch(notify_fd, POLLIN, handle_notify);
+    if (watchdog_ms) {
+        set_timer(watchdog_expired, watchdog_ms);
+    }
+    DEBUG("Listening for notifications on %s.\n", notify_socket_path);
+}
+
+/*
+ * Fork and exec cmd as a child. worker is the worker pool slot the child
+ * fills, exported to it as DUMB_INIT_WORKER, or -1 for any other child.
+ */
+pid_t spawn_child(char **cmd, int worker) {
+    int log_pipes[2][2];
+    int relay = open_log_pipes(log_pipes);
+    PROFILE_START(fork_start);
+    pid_t pid = fork();
+    if (pid == 0) {
+        /* child */
+        PROFILE_START(child_start);
+        sigset_t all_signals;
+        sigfillset(&all_signals);
+        sigprocmask(SIG_UNBLOCK, &all_signals, NULL);
+        // Before pass_listeners(), which may reuse the descriptor numbers.
+        if (relay && (dup2(log_pipes[0][1], STDOUT_FILENO) == -1 || dup2(log_pipes[1][1], STDERR_FILENO) == -1)) {
+            PRINTERR("Unable to redirect output (errno=%d %s). Exiting.\n", errno, strerror(errno));
+            exit(1);
+        }
+        if (use_setsid) {
+            PROFILE_START(tty_attach);
+            if (setsid() == -1) {
+                PRINTERR(
+                    "Unable to setsid (errno=%d %s). Exiting.\n",
+                    errno,
+                    strerror(errno)
+                );
+                exit(1);
+            }
+
+            if (ioctl(STDIN_FILENO, TIOCSCTTY, 0) == -1) {
+                DEBUG(
+                    "Unable to attach to controlling tty (errno=%d %s).\n",
+                    errno,
+                    strerror(errno)
+                );
+            }
+            DEBUG("setsid complete.\n");
+            PROFILE_PHASE(PROFILE_TTY_ATTACH, tty_attach);
+        }
+        if (child_cwd != NULL && chdir(child_cwd) == -1) {
+            PRINTERR("Unable to chdir to %s (errno=%d %s). Exiting.\n", child_cwd, errno, strerror(errno));
+            exit(1);
+        }
+        if (worker >= 0) {
+            char index[16];
+            snprintf(index, sizeof(index), "%d", worker);
+            setenv("DUMB_INIT_WORKER", index, 1);
+        }
+        join_freezer_cgroup();
+        pass_listeners();
+        pass_notify_socket();
+        prepare_exec();
+        PROFILE_PHASE(PROFILE_BEFORE_EXEC, child_start);
+        execvp(cmd[0], &cmd[0]);
+
+        // if this point is reached, exec failed, so we should exit nonzero
+        PRINTERR("%s: %s\n", cmd[0], strerror(errno));
+        exit(2);
+    }
+    PROFILE_PHASE(PROFILE_FORK, fork_start);
+    trace_spawned(pid, cmd[0]);
+    if (relay) {
+        int stream;
+        for (stream = 0; stream < 2; stream++) {
+            close(log_pipes[stream][1]);
+            if (pid > 0) {
+                add_log_source(log_pipes[stream][0], stream, pid, cmd[0]);
+            } else {
+                close(log_pipes[stream][0]);
+            }
+        }
+    }
+    return pid;
+}
+
+/*
+ * Graceful reloads.
+ *
+ * When the reload signal is received, a new generation of the command is
+ * started next to the current one. Once it signals readiness (by creating
+ * the ready file), it becomes the current generation and the previous one is
+ * sent the stop signal. If the new generation exits or doesn't become ready
+ * in time, it is discarded and the current generation keeps running.
+ */
+long long reload_started = 0;
+
+void finish_reload(void) {
+    pid_t old_pid = child_pid;
+    child_pid = pending_pid;
+    pending_pid = -1;
+    generation++;
+    DEBUG(
+        "Generation %d (PID %d) is ready after %lld ms, stopping PID %d with signal %d.\n",
+        generation, child_pid, now_ms() - reload_started, old_pid, reload_stop_signal
+    );
+    // start_reload() made sure there is room.
+    retiring_pids[retiring_len++] = old_pid;
+    signal_pid(old_pid, reload_stop_signal);
+}
+
+void check_reload_ready(void) {
+    if (pending_pid <= 0) {
+        return;
+    }
+    if (reload_ready_file != NULL && access(reload_ready_file, F_OK) == 0) {
+        finish_reload();
+    } else if (now_ms() - reload_started >= reload_timeout_ms) {
+        PRINTERR(
+            "New instance (PID %d) did not become ready within %ld ms, keeping the current one.\n",
+            pending_pid, reload_timeout_ms
+        );
+        signal_pid(pending_pid, SIGKILL);
+    } else {
+        set_timer(check_reload_ready, 100);
+    }
+}
+
+void start_reload(void) {
+    if (pending_pid > 0) {
+        DEBUG("Reload already in progress, ignoring reload signal.\n");
+        return;
+    }
+    if (retiring_len == MAXRETIRING) {
+        PRINTERR("%d previous instances are still stopping, not reloading.\n", MAXRETIRING);
+        return;
+    }
+    if (reload_ready_file != NULL && unlink(reload_ready_file) == -1 && errno != ENOENT) {
+        PRINTERR(
+            "Unable to remove %s (errno=%d %s), not reloading.\n",
+            reload_ready_file, errno, strerror(errno)
+        );
+        return;
+    }
+    reload_started = now_ms();
+    pending_pid = spawn_child(child_command, -1);
+    if (pending_pid < 0) {
+        PRINTERR("Unable to fork, not reloading.\n");
+        pending_pid = -1;
+        return;
+    }
+    DEBUG("Reloading: started new instance with PID %d.\n", pending_pid);
+    set_timer(check_reload_ready, 100);
+}
+
+// Handle the exit of a reload generation. Returns whether pid was one.
+int generation_exited(pid_t pid, int exit_status) {
+    int i;
+    if (pid == pending_pid) {
+        PRINTERR(
+            "New instance (PID %d) exited with status %d before becoming ready, keeping the current one.\n",
+            pid, exit_status
+        );
+        pending_pid = -1;
+        cancel_timer(check_reload_ready);
+        return 1;
+    }
+    for (i = 0; i < retiring_len; i++) {
+        if (retiring_pids[i] == pid) {
+            DEBUG("Previous instance (PID %d) exited with status %d.\n", pid, exit_status);
+            retiring_pids[i] = retiring_pids[--retiring_len];
+            return 1;
+        }
+    }
+    return 0;
+}
+
+/*
+ * Page cache prewarming.
+ *
+ * The files matching the --prewarm globs are split between --prewarm-jobs
+ * processes. Each one goes through its files chunk by chunk, stopping once the
+ * time budget is used up: it asks the kernel to read the chunk ahead
+ * (POSIX_FADV_WILLNEED, which queues the I/O asynchronously), then waits for
+ * it by faulting in a mapping of it. mincore() before and after tells how
+ * many of those bytes were not cached yet. With --prewarm-async this all
+ * happens in a helper process while the child starts.
+ */
+#define PREWARM_CHUNK (8 * 1024 * 1024)
+
+struct prewarm_result {
+    long long bytes;  // covered by the prewarmed chunks
+    long long read;   // of which were not in the page cache yet
+    int files;
+};
+
+// Return how many bytes of the mapping are in the page cache.
+long long cached_bytes(void *addr, size_t len, long page_size) {
+    // pages are at least 4 KiB
+    static unsigned char vec[PREWARM_CHUNK / 4096];
+    long long cached = 0;
+    size_t i;
+    if (mincore(addr, len, vec) == -1) {
+        return 0;
+    }
+    for (i = 0; i * page_size < len; i++) {
+        if (vec[i] & 1) {
+            cached += len - i * page_size < (size_t) page_size ? len - i * page_size : page_size;
+        }
+    }
+    return cached;
+}
+
+void prewarm_file(const char *path, long long deadline, struct prewarm_result *result) {
+    struct stat st;
+    off_t offset;
+    long page_size = sysconf(_SC_PAGESIZE);
+    int fd = open(path, O_RDONLY | O_CLOEXEC);
+
+    if (fd == -1) {
+        return;
+    }
+    if (fstat(fd, &st) == -1 || !S_ISREG(st.st_mode) || st.st_size == 0) {
+        close(fd);
+        return;
+    }
+    for (offset = 0; offset < st.st_size; offset += PREWARM_CHUNK) {
+        size_t len = st.st_size - offset < PREWARM_CHUNK ? st.st_size - offset : PREWARM_CHUNK;
+        void *addr, *populated;
+        long long cached;
+        if (deadline && now_ms() >= deadline) {
+            break;
+        }
+        // this mapping is only used to check which pages are cached
+        addr = mmap(NULL, len, PROT_READ, MAP_SHARED, fd, offset);
+        if (addr == MAP_FAILED) {
+            break;
+        }
+        cached = cached_bytes(addr, len, page_size);
+        posix_fadvise(fd, offset, len, POSIX_FADV_WILLNEED);
+        populated = mmap(NULL, len, PROT_READ, MAP_SHARED | MAP_POPULATE, fd, offset);
+        if (populated == MAP_FAILED) {
+            munmap(addr, len);
+            break;
+        }
+        munmap(populated, len);
+        result->read += cached_bytes(addr, len, page_size) - cached;
+        munmap(addr, len);
+        result->bytes += len;
+    }
+    result->files++;
+    close(fd);
+}
+
+void prewarm(void) {
+    glob_t paths;
+    struct prewarm_result total = {0, 0, 0};
+    long long started = now_ms();
+    long long deadline = prewarm_budget_ms ? started + prewarm_budget_ms : 0;
+    pid_t pids[MAXPREWARM];
+    int fds[MAXPREWARM];
+    int i, job, jobs = 0;
+
+    memset(&paths, 0, sizeof(paths));
+    for (i = 0; i < prewarm_patterns_len; i++) {
+        if (glob(prewarm_patterns[i], i > 0 ? GLOB_APPEND : 0, NULL, &paths) == GLOB_NOMATCH) {
+            DEBUG("Prewarm pattern %s matched no files.\n", prewarm_patterns[i]);
+        }
+    }
+
+    for (job = 0; job < prewarm_jobs && (size_t) job < paths.gl_pathc; job++) {
+        int pipefds[2];
+        if (pipe2(pipefds, O_CLOEXEC) == -1) {
+            break;
+        }
+        pids[jobs] = fork();
+        if (pids[jobs] == 0) {
+            struct prewarm_result result = {0, 0, 0};
+            size_t n;
+            for (n = job; n < paths.gl_pathc; n += prewarm_jobs) {
+                prewarm_file(paths.gl_pathv[n], deadline, &result);
+            }
+            if (write(pipefds[1], &result, sizeof(result)) == -1) {
+                _exit(1);
+            }
+            _exit(0);
+        }
+        close(pipefds[1]);
+        if (pids[jobs] < 0) {
+            close(pipefds[0]);
+            break;
+        }
+        fds[jobs++] = pipefds[0];
+    }
+
+    for (job = 0; job < jobs; job++) {
+        struct prewarm_result result;
+        if (read(fds[job], &result, sizeof(result)) == sizeof(result)) {
+            total.bytes += result.bytes;
+            total.read += result.read;
+            total.files += result.files;
+        }
+        close(fds[job]);
+        waitpid(pids[job], NULL, 0);
+    }
+    globfree(&paths);
+
+    PRINTERR(
+        "Prewarmed %lld bytes in %d files (%lld bytes not cached before) in %lld ms%s.\n",
+        total.bytes, total.files, total.read, now_ms() - started,
+        deadline && now_ms() >= deadline ? " (time budget exhausted)" : ""
+    );
+}
+
+void start_prewarm(void) {
+    pid_t pid;
+    if (prewarm_patterns_len == 0) {
+        return;
+    }
+    if (!prewarm_async) {
+        prewarm();
+        return;
+    }
+    // The helper is reaped by the SIGCHLD handler like any other process.
+    pid = fork();
+    if (pid == 0) {
+        prewarm();
+        _exit(0);
+    } else if (pid < 0) {
+        PRINTERR("Unable to fork for prewarming.\n");
+    } else {
+        DEBUG("Prewarming in the background with PID %d.\n", pid);
+        trace_spawned(pid, "prewarm");
+    }
+}
+
+/*
+ * Pre-start hooks.
+ *
+ * Each hook is a shell command which is started as soon as all hooks it
+ * depends on have exited successfully. Hooks are supervised like the main
+ * child: received signals are forwarded to them, and they are reaped by the
+ * SIGCHLD handler. If any hook fails or times out, the remaining hooks are
+ * terminated and dumb-init exits without starting the main command.
+ */
+int find_hook(const char *name, size_t len) {
+    int i;
+    for (i = 0; i < hooks_len; i++) {
+        if (strlen(hooks[i].name) == len && strncmp(hooks[i].name, name, len) == 0) {
+            return i;
+        }
+    }
+    return -1;
+}
+
+void resolve_hook_dependencies(void) {
+    int i, resolved, progress;
+    char done[MAXHOOKS] = {0};
+
+    for (i = 0; i < hooks_len; i++) {
+        char *dep = hooks[i].deps;
+        while (dep != NULL && *dep != '\0') {
+            size_t len = strcspn(dep, ",");
+            int index = find_hook(dep, len);
+            if (index == -1) {
+                PRINTERR("Pre-start hook \"%s\" depends on unknown hook \"%.*s\". Exiting.\n",
+                         hooks[i].name, (int) len, dep);
+                exit(1);
+            }
+            hooks[i].dep_indices[hooks[i].deps_len++] = index;
+            dep += len + (dep[len] == ',');
+        }
+    }
+
+    // Make sure every hook can eventually run.
+    resolved = 0;
+    do {
+        progress = 0;
+        for (i = 0; i < hooks_len; i++) {
+            int j, ready = !done[i];
+            for (j = 0; ready && j < hooks[i].deps_len; j++) {
+                ready = done[hooks[i].dep_indices[j]];
+            }
+            if (ready) {
+                done[i] = 1;
+                resolved++;
+                progress = 1;
+            }
+        }
+    } while (progress);
+    if (resolved < hooks_len) {
+        PRINTERR("Pre-start hooks have a dependency cycle. Exiting.\n");
+        exit(1);
+    }
+}
+
+void signal_pre_start_hooks(int signum) {
+    int i;
+    for (i = 0; i < hooks_len; i++) {
+        if (hooks[i].state == HOOK_RUNNING) {
+            signal_pid(hooks[i].pid, signum);
+        }
+    }
+}
+
+void fail_pre_start_hooks(int exit_status) {
+    signal_pre_start_hooks(SIGTERM);
+    DEBUG("Not starting the main command. Goodbye.\n");
+    exit(exit_status);
+}
+
+void pre_start_hook_timeout(void) {
+    int i;
+    long long now = now_ms();
+    long long next = -1;
+    for (i = 0; i < hooks_len; i++) {
+        if (hooks[i].state != HOOK_RUNNING || hooks[i].timeout_ms == 0) {
+            continue;
+        }
+        long long deadline = hooks[i].started + hooks[i].timeout_ms;
+        if (deadline <= now) {
+            PRINTERR("Pre-start hook \"%s\" timed out after %ld ms.\n", hooks[i].name, hooks[i].timeout_ms);
+            signal_pid(hooks[i].pid, SIGKILL);
+            hooks[i].state = HOOK_DONE;
+            fail_pre_start_hooks(1);
+        } else if (next == -1 || deadline < next) {
+            next = deadline;
+        }
+    }
+    if (next != -1) {
+        set_timer(pre_start_hook_timeout, next - now);
+    }
+}
+
+void start_pre_start_hook(struct hook *hook) {
+    hook->started = now_ms();
+    hook->pid = fork();
+    if (hook->pid < 0) {
+        PRINTERR("Unable to fork. Exiting.\n");
+        exit(1);
+    } else if (hook->pid == 0) {
+        sigset_t all_signals;
+        sigfillset(&all_signals);
+        sigprocmask(SIG_UNBLOCK, &all_signals, NULL);
+        if (use_setsid && setsid() == -1) {
+            PRINTERR("Unable to setsid (errno=%d %s). Exiting.\n", errno, strerror(errno));
+            exit(1);
+        }
+        prepare_exec();
+        execl("/bin/sh", "sh", "-c", hook->command, (char *) NULL);
+        PRINTERR("/bin/sh: %s\n", strerror(errno));
+        exit(2);
+    }
+    hook->state = HOOK_RUNNING;
+    trace_spawned(hook->pid, hook->command);
+    DEBUG("Pre-start hook \"%s\" spawned with PID %d.\n", hook->name, hook->pid);
+}
+
+// Start every pending hook whose dependencies have all finished.
+void start_ready_pre_start_hooks(void) {
+    int i, j, ready, running = 0;
+    for (i = 0; i < hooks_len; i++) {
+        if (hooks[i].state == HOOK_PENDING) {
+            ready = 1;
+            for (j = 0; ready && j < hooks[i].deps_len; j++) {
+                ready = hooks[hooks[i].dep_indices[j]].state == HOOK_DONE;
+            }
+            if (ready) {
+                start_pre_start_hook(&hooks[i]);
+            }
+        }
+        running += hooks[i].state != HOOK_DONE;
+    }
+    if (running == 0) {
+        PRINTERR("Pre-start hooks finished in %lld ms.\n", now_ms() - start_time);
+        hooks_done = 1;
+    } else {
+        pre_start_hook_timeout();
+    }
+}
+
+void pre_start_hook_exited(pid_t pid, int exit_status) {
+    int i;
+    for (i = 0; i < hooks_len; i++) {
+        if (hooks[i].state == HOOK_RUNNING && hooks[i].pid == pid) {
+            long long now = now_ms();
+            hooks[i].state = HOOK_DONE;
+            PRINTERR(
+                "Pre-start hook \"%s\" exited with status %d after %lld ms (started at +%lld ms).\n",
+                hooks[i].name, exit_status, now - hooks[i].started, hooks[i].started - start_time
+            );
+            if (exit_status != 0) {
+                fail_pre_start_hooks(exit_status);
+            }
+            start_ready_pre_start_hooks();
+            return;
+        }
+    }
+}
+
+void run_pre_start_hooks(void) {
+    if (hooks_len == 0) {
+        return;
+    }
+    resolve_hook_dependencies();
+    start_ready_pre_start_hooks();
+    run_event_loop(&hooks_done);
+    cancel_timer(pre_start_hook_timeout);
+}
+
+/*
+ * Resolve the directory of our own cgroup in the unified (v2) hierarchy from
+ * /proc/self/cgroup, unless one was given with --cgroup.
+ */
+void resolve_cgroup_dir(void) {
+    char line[PATH_MAX - 16];
+    FILE *f;
+
+    if (cgroup_dir[0] != '\0') {
+        return;
+    }
+    strcpy(cgroup_dir, "/sys/fs/cgroup");
+    f = fopen("/proc/self/cgroup", "r");
+    if (f == NULL) {
+        return;
+    }
+    while (fgets(line, sizeof(line), f) != NULL) {
+        if (strncmp(line, "0::", 3) == 0) {
+            line[strcspn(line, "\n")] = '\0';
+            if (strcmp(line + 3, "/") != 0) {
+                snprintf(cgroup_dir, sizeof(cgroup_dir), "/sys/fs/cgroup%s", line + 3);
+            }
+            break;
+        }
+    }
+    fclose(f);
+    DEBUG("Using cgroup directory %s.\n", cgroup_dir);
+}
+
+int open_cgroup_file(const char *name, int flags) {
+    char path[PATH_MAX + 64];
+    snprintf(path, sizeof(path), "%s/%s", cgroup_dir, name);
+    return open(path, flags | O_CLOEXEC);
+}
+
+/*
+ * Read a pressure stall ("PSI") file and return the avg10 value, in percent,
+ * for the given kind ("some" or "full"). Returns -1 on failure.
+ */
+double read_pressure_avg10(int fd, const char *kind) {
+    char buf[256];
+    char *line;
+    double avg10;
+    ssize_t n = pread(fd, buf, sizeof(buf) - 1, 0);
+    if (n <= 0) {
+        return -1;
+    }
+    buf[n] = '\0';
+    for (line = buf; line != NULL; line = strchr(line, '\n')) {
+        if (*line == '\n') {
+            line++;
+        }
+        if (strncmp(line, kind, strlen(kind)) == 0 &&
+                sscanf(line + strlen(kind), " avg10=%lf", &avg10) == 1) {
+            return avg10;
+        }
+    }
+    return -1;
+}
+
+/*
+ * Memory pressure monitoring.
+ *
+ * We register a PSI trigger on the cgroup's memory.pressure and also watch
+ * the "high" and "max" counters in memory.events. Either one firing sends the
+ * configured signal to our children so they can drop caches before the OOM
+ * killer gets involved.
+ *
+ * Once the signal has been sent we disarm until the avg10 pressure has fallen
+ * below half of the trigger threshold (hysteresis), and never send it more
+ * often than once per --memory-pressure-interval (rate limit).
+ */
+int memory_pressure_fd = -1;
+int memory_events_fd = -1;
+char memory_pressure_armed = 1;
+long long memory_pressure_last_sent = 0;
+unsigned long long memory_events_high = 0;
+unsigned long long memory_events_max = 0;
+
+int read_memory_events(unsigned long long *high, unsigned long long *max) {
+    char buf[512];
+    char *line;
+    ssize_t n = pread(memory_events_fd, buf, sizeof(buf) - 1, 0);
+    if (n <= 0) {
+        return 0;
+    }
+    buf[n] = '\0';
+    for (line = buf; line != NULL; line = strchr(line, '\n')) {
+        if (*line == '\n') {
+            line++;
+        }
+        sscanf(line, "high %llu", high);
+        sscanf(line, "max %llu", max);
+    }
+    return 1;
+}
+
+void memory_pressure_rearm_check(void) {
+    double clear = 50.0 * memory_pressure_stall_ms / memory_pressure_window_ms;
+    double avg10 = read_pressure_avg10(memory_pressure_fd, memory_pressure_kind);
+    if (avg10 >= 0 && avg10 < clear) {
+        DEBUG("Memory pressure cleared (avg10=%.2f), re-arming.\n", avg10);
+        memory_pressure_armed = 1;
+    } else {
+        set_timer(memory_pressure_rearm_check, 1000);
+    }
+}
+
+void memory_pressure_crossed(const char *source) {
+    long long now = now_ms();
+    if (!memory_pressure_armed) {
+        return;
+    }
+    if (memory_pressure_last_sent != 0 && now - memory_pressure_last_sent < memory_pressure_interval_ms) {
+        DEBUG("Memory pressure (%s), but signal %d was sent recently.\n", source, memory_pressure_signal);
+        return;
+    }
+    DEBUG("Memory pressure (%s), sending signal %d to children.\n", source, memory_pressure_signal);
+    forward_signal(memory_pressure_signal);
+    memory_pressure_last_sent = now;
+    memory_pressure_armed = 0;
+    set_timer(memory_pressure_rearm_check, 1000);
+}
+
+void handle_memory_pressure(int fd, short revents) {
+    if (revents & POLLERR) {
+        DEBUG("memory.pressure is gone, no longer monitoring it.\n");
+        remove_watch(fd);
+        return;
+    }
+    memory_pressure_crossed("memory.pressure");
+}
+
+void handle_memory_events(int fd, short revents) {
+    unsigned long long high = memory_events_high, max = memory_events_max;
+    if (!read_memory_events(&high, &max)) {
+        remove_watch(fd);
+        return;
+    }
+    if (high > memory_events_high || max > memory_events_max) {
+        memory_events_high = high;
+        memory_events_max = max;
+        memory_pressure_crossed("memory.events");
+    }
+}
+
+void start_memory_pressure_monitor(void) {
+    char trigger[64];
+
+    resolve_cgroup_dir();
+    memory_pressure_fd = open_cgroup_file("memory.pressure", O_RDWR | O_NONBLOCK);
+    if (memory_pressure_fd == -1) {
+        PRINTERR(
+            "Unable to open %s/memory.pressure (errno=%d %s). Exiting.\n",
+            cgroup_dir, errno, strerror(errno)
+        );
+        exit(1);
+    }
+    snprintf(
+        trigger, sizeof(trigger), "%s %ld %ld",
+        memory_pressure_kind,
+        memory_pressure_stall_ms * 1000,
+        memory_pressure_window_ms * 1000
+    );
+    if (write(memory_pressure_fd, trigger, strlen(trigger) + 1) == -1) {
+        PRINTERR(
+            "Unable to set memory pressure trigger \"%s\" (errno=%d %s). Exiting.\n",
+            trigger, errno, strerror(errno)
+        );
+        exit(1);
+    }
+    add_watch(memory_pressure_fd, POLLPRI, handle_memory_pressure);
+
+    // memory.events does not exist in the root cgroup, so it is optional.
+    memory_events_fd = open_cgroup_file("memory.events", O_RDONLY);
+    if (memory_events_fd != -1 && read_memory_events(&memory_events_high, &memory_events_max)) {
+        add_watch(memory_events_fd, POLLPRI, handle_memory_events);
+    }
+    DEBUG("Monitoring memory pressure (trigger \"%s\").\n", trigger);
+}
+
+/*
+ * Idle freezing.
+ *
+ * With --freeze-after, the children are started in a "supervised" child of
+ * the cgroup, which is frozen with the cgroup v2 freezer once nothing has
+ * happened for that many seconds. dumb-init itself stays in the parent
+ * cgroup, so it keeps running: a connection on a --listen socket or any
+ * signal other than SIGCHLD thaws the children, and signals are forwarded
+ * only once they are thawed.
+ *
+ * While the children run, they accept the connections themselves, so
+ * dumb-init only watches the listening sockets until it sees the first
+ * connection of each idle period.
+ */
+char freezer_dir[PATH_MAX + 16] = "";
+int freezer_fd = -1;
+int freezer_procs_fd = -1;
+pid_t freezer_owner = 0;
+char frozen = 0;
+char watching_listeners = 0;
+long long last_activity = 0;
+
+void check_idle(void);
+
+void handle_listener_activity(int fd, short revents) {
+    int i;
+    for (i = 0; i < listeners_len; i++) {
+        remove_watch(listeners[i].fd);
+    }
+    watching_listeners = 0;
+    note_activity();
+}
+
+void watch_listeners(void) {
+    int i;
+    if (watching_listeners) {
+        return;
+    }
+    for (i = 0; i < listeners_len; i++) {
+        add_watch(listeners[i].fd, POLLIN, handle_listener_activity);
+    }
+    watching_listeners = 1;
+}
+
+int write_freezer(const char *value) {
+    if (pwrite(freezer_fd, value, 1, 0) == -1) {
+        PRINTERR(
+            "Unable to write %s to %s/cgroup.freeze (errno=%d %s).\n",
+            value, freezer_dir, errno, strerror(errno)
+        );
+        return 0;
+    }
+    return 1;
+}
+
+void freeze_children(void) {
+    if (!write_freezer("1")) {
+        set_timer(check_idle, freeze_after_ms);
+        return;
+    }
+    frozen = 1;
+    // A frozen child can't ping the watchdog.
+    cancel_timer(watchdog_expired);
+    DEBUG("Froze the children after %lld ms without activity.\n", now_ms() - last_activity);
+}
+
+void thaw_children(void) {
+    if (!frozen) {
+        return;
+    }
+    write_freezer("0");
+    frozen = 0;
+    last_activity = now_ms();
+    if (watchdog_ms) {
+        set_timer(watchdog_expired, watchdog_ms);
+    }
+    set_timer(check_idle, freeze_after_ms);
+    DEBUG("Thawed the children.\n");
+}
+
+void note_activity(void) {
+    if (freezer_fd == -1) {
+        return;
+    }
+    last_activity = now_ms();
+    thaw_children();
+}
+
+void check_idle(void) {
+    long long idle = now_ms() - last_activity;
+    // Connections are only noticed while the listeners are watched, so the
+    // children count as idle only for a whole period of watching them.
+    if (!watching_listeners || pending_pid > 0) {
+        watch_listeners();
+        set_timer(check_idle, freeze_after_ms);
+    } else if (idle < freeze_after_ms) {
+        set_timer(check_idle, freeze_after_ms - idle);
+    } else {
+        freeze_children();
+    }
+}
+
+// Called in the child, before exec.
+void join_freezer_cgroup(void) {
+    if (freezer_procs_fd == -1) {
+        return;
+    }
+    if (write(freezer_procs_fd, "0", 1) == -1) {
+        PRINTERR(
+            "Unable to join cgroup %s (errno=%d %s). Exiting.\n",
+            freezer_dir, errno, strerror(errno)
+        );
+        exit(1);
+    }
+    close(freezer_procs_fd);
+}
+
+// Remove the cgroup once the children are gone, rather than leave it behind.
+void remove_freezer_cgroup(void) {
+    // Processes forked by dumb-init inherit this atexit handler.
+    if (getpid() != freezer_owner) {
+        return;
+    }
+    // Descendants still in it must not stay frozen after we're gone.
+    if (frozen && write_freezer("0")) {
+        frozen = 0;
+    }
+    if (rmdir(freezer_dir) == -1) {
+        DEBUG("Unable to remove %s (errno=%d %s).\n", freezer_dir, errno, strerror(errno));
+    } else {
+        DEBUG("Removed %s.\n", freezer_dir);
+    }
+}
+
+void start_freezer(void) {
+    char path[PATH_MAX + 32];
+
+    resolve_cgroup_dir();
+    snprintf(freezer_dir, sizeof(freezer_dir), "%s/supervised", cgroup_dir);
+    if (mkdir(freezer_dir, 0755) == -1 && errno != EEXIST) {
+        goto error;
+    }
+    freezer_owner = getpid();
+    atexit(remove_freezer_cgroup);
+    snprintf(path, sizeof(path), "%s/cgroup.freeze", freezer_dir);
+    freezer_fd = open(path, O_WRONLY | O_CLOEXEC);
+    if (freezer_fd == -1) {
+        goto error;
+    }
+    snprintf(path, sizeof(path), "%s/cgroup.procs", freezer_dir);
+    freezer_procs_fd = open(path, O_WRONLY | O_CLOEXEC);
+    if (freezer_procs_fd == -1) {
+        goto error;
+    }
+    // The cgroup may be left over (and frozen) from an earlier run.
+    if (!write_freezer("0")) {
+        exit(1);
+    }
+    last_activity = now_ms();
+    watch_listeners();
+    set_timer(check_idle, freeze_after_ms);
+    DEBUG("Freezing the children in %s after %ld ms idle.\n", freezer_dir, freeze_after_ms);
+    return;
+
+error:
+    PRINTERR(
+        "Unable to set up the cgroup freezer in %s (errno=%d %s). Exiting.\n",
+        freezer_dir, errno, strerror(errno)
+    );
+    exit(1);
+}
+
+/*
+ * Worker pool.
+ *
+ * Each worker occupies a slot; slots below workers_target are kept filled.
+ * Workers which exit are replaced (with a one second delay if they exited
+ * quickly, to avoid a tight crash loop) until a stop signal has been
+ * forwarded, at which point dumb-init exits once the last worker is gone.
+ *
+ * With --scale-cpu-pressure, the cgroup's CPU pressure is sampled every
+ * --scale-interval: above the high mark a worker is added (up to
+ * workers_max), and below the low mark the highest slot is retired (down to
+ * workers_min).
+ */
+void start_workers(void) {
+    long long now = now_ms();
+    long long next = -1;
+    int i;
+
+    for (i = 0; i < workers_target; i++) {
+        if (workers[i].pid > 0) {
+            continue;
+        }
+        if (workers[i].restart_at > now) {
+            if (next == -1 || workers[i].restart_at < next) {
+                next = workers[i].restart_at;
+            }
+            continue;
+        }
+        workers[i].pid = spawn_child(child_command, i);
+        if (workers[i].pid < 0) {
+            PRINTERR("Unable to fork worker %d, retrying.\n", i);
+            workers[i].pid = -1;
+            workers[i].restart_at = now + 1000;
+            if (next == -1 || workers[i].restart_at < next) {
+                next = workers[i].restart_at;
+            }
+            continue;
+        }
+        workers[i].started = now;
+        DEBUG("Worker %d spawned with PID %d.\n", i, workers[i].pid);
+    }
+    if (next != -1) {
+        set_timer(start_workers, next - now);
+    }
+}
+
+int worker_exited(pid_t pid, int exit_status) {
+    int i, remaining = 0;
+    for (i = 0; i < workers_max; i++) {
+        if (workers[i].pid == pid) {
+            break;
+        }
+    }
+    if (i == workers_max) {
+        return 0;
+    }
+
+    workers[i].pid = -1;
+    if (!workers_stopping && i < workers_target) {
+        long long uptime = now_ms() - workers[i].started;
+        PRINTERR("Worker %d (PID %d) exited with status %d, replacing it.\n", i, pid, exit_status);
+        workers[i].restart_at = uptime < 1000 ? now_ms() + 1000 : 0;
+        start_workers();
+    } else {
+        DEBUG("Worker %d (PID %d) exited with status %d.\n", i, pid, exit_status);
+    }
+
+    for (i = 0; i < workers_max; i++) {
+        remaining += workers[i].pid > 0;
+    }
+    if (workers_stopping && remaining == 0) {
+        DEBUG("All workers exited. Goodbye.\n");
+        exit(exit_status);
+    }
+    return 1;
+}
+
+void scale_workers(void) {
+    double avg10;
+    int fd = open_cgroup_file("cpu.pressure", O_RDONLY);
+
+    set_timer(scale_workers, scale_interval_ms);
+    if (fd == -1) {
+        return;
+    }
+    avg10 = read_pressure_avg10(fd, "some");
+    close(fd);
+    if (avg10 < 0 || workers_stopping) {
+        return;
+    }
+
+    if (avg10 > scale_cpu_high && workers_target < workers_max && workers[workers_target].pid <= 0) {
+        DEBUG("CPU pressure is %.2f, adding worker %d.\n", avg10, workers_target);
+        workers[workers_target].restart_at = 0;
+        workers_target++;
+        start_workers();
+    } else if (avg10 < scale_cpu_low && workers_target > workers_min) {
+        workers_target--;
+        DEBUG("CPU pressure is %.2f, retiring worker %d.\n", avg10, workers_target);
+        if (workers[workers_target].pid > 0) {
+            signal_pid(workers[workers_target].pid, SIGTERM);
+        }
+    }
+}
+
+void start_worker_pool(void) {
+    int i;
+    for (i = 0; i < MAXWORKERS; i++) {
+        workers[i].pid = -1;
+        workers[i].restart_at = 0;
+    }
+    workers_target = workers_min;
+    start_workers();
+    if (scale_cpu_high > 0) {
+        set_timer(scale_workers, scale_interval_ms);
+    }
+}
+
+void check_cpu_pressure(void) {
+    int fd;
+    resolve_cgroup_dir();
+    fd = open_cgroup_file("cpu.pressure", O_RDONLY);
+    if (fd == -1) {
+        PRINTERR(
+            "Unable to open %s/cpu.pressure (errno=%d %s). Exiting.\n",
+            cgroup_dir, errno, strerror(errno)
+        );
+        exit(1);
+    }
+    close(fd);
+}
+
+void handle_signalfd(int fd, short revents) {
+    struct signalfd_siginfo info[16];
+    ssize_t i, n = read(fd, info, sizeof(info));
+    for (i = 0; i < n / (ssize_t) sizeof(info[0]); i++) {
+        PROFILE_START(start);
+        handle_signal(info[i].ssi_signo);
+        PROFILE_SIGNAL(info[i].ssi_signo, start, n / sizeof(info[0]));
+    }
+}
+
+void print_help(char *argv[]) {
+    fprintf(stderr,
+        "dumb-init v%.*s"
+        "Usage: %s [option] command [[arg] ...]\n"
+        "\n"
+        "dumb-init is a simple process supervisor that forwards signals to children.\n"
+        "It is designed to run as PID1 in minimal container environments.\n"
+        "\n"
+        "Optional arguments:\n"
+        "   -c, --single-child   Run in single-child mode.\n"
+        "                        In this mode, signals are only proxied to the\n"
+        "                        direct child and not any of its descendants.\n"
+        "   -r, --rewrite s:r    Rewrite received signal s to new signal r before proxying.\n"
+        "                        To ignore (not proxy) a signal, rewrite it to 0.\n"
+        "                        This option can be specified multiple times.\n"
+        "   --route s:target     Deliver signal s to the direct child only (child),\n"
+        "                        its process group (group) or all of its\n"
+        "                        descendants (tree). This option can be specified\n"
+        "                        multiple times.\n"
+        "   --close-fds          Close all inherited file descriptors other than\n"
+        "                        stdin, stdout and stderr before starting the child.\n"
+        "   --keep-fd fd         Leave fd open when using --close-fds.\n"
+        "                        This option can be specified multiple times.\n"
+        "   --rlimit name=soft[:hard]\n"
+        "                        Set a resource limit for the child, where name is\n"
+        "                        one of as, core, cpu, data, fsize, memlock, nofile,\n"
+        "                        nproc or stack. Limits may be \"unlimited\".\n"
+        "                        This option can be specified multiple times.\n"
+        "   --cgroup dir         Use this cgroup v2 directory instead of the one\n"
+        "                        dumb-init runs in.\n"
+        "   --memory-pressure-signal s\n"
+        "                        Send signal s to the children when the cgroup is\n"
+        "                        under memory pressure or hits memory.high/max.\n"
+        "   --memory-pressure-trigger some|full:stall:window\n"
+        "                        PSI trigger for --memory-pressure-signal, in\n"
+        "                        milliseconds (default: some:200:2000).\n"
+        "   --memory-pressure-interval secs\n"
+        "                        Send the memory pressure signal at most once per\n"
+        "                        this many seconds (default: 10).\n"
+        "   --pre-start name[:deps][/timeout]=command\n"
+        "                        Run command with /bin/sh before starting the main\n"
+        "                        command, after the comma-separated hooks in deps\n"
+        "                        have succeeded. Hooks run in parallel, and the main\n"
+        "                        command only starts if they all succeed.\n"
+        "                        This option can be specified multiple times.\n"
+        "   --listen address     Listen on address and pass the socket to the child\n"
+        "                        using LISTEN_FDS. address is tcp:[host:]port or\n"
+        "                        unix:path. This option can be specified multiple times.\n"
+        "   --listen-backlog n   Listen backlog for --listen sockets.\n"
+        "   --lazy-spawn         Wait for a connection on a --listen socket before\n"
+        "                        starting the child.\n"
+        "   --reload-signal s    On signal s, start a new instance of the command and\n"
+        "                        stop the current one once the new one is ready.\n"
+        "   --reload-ready-file path\n"
+        "                        File created by a new instance once it is ready.\n"
+        "   --reload-stop-signal s\n"
+        "                        Signal used to stop the old instance (default: 15).\n"
+        "   --reload-timeout secs\n"
+        "                        Give up on a new instance which isn't ready after\n"
+        "                        this many seconds (default: 60).\n"
+        "   --notify-socket path Receive sd_notify messages from the child on a\n"
+        "                        datagram socket at path (@name for an abstract one).\n"
+        "   --ready-file path    Create path once the child sends READY=1.\n"
+        "   --ready-command cmd  Run cmd with /bin/sh once the child sends READY=1.\n"
+        "   --watchdog-sec secs  Expect WATCHDOG=1 from the child at least this often.\n"
+        "   --watchdog-signal s  Signal to forward on a watchdog timeout (default: 6).\n"
+        "   --workers n          Run n copies of the command, replacing any that exit\n"
+        "                        until a stop signal is received.\n"
+        "   --workers-max n      Allow scaling up to n workers.\n"
+        "   --scale-cpu-pressure high[:low]\n"
+        "                        Add a worker while the cgroup CPU pressure (avg10,\n"
+        "                        in percent) is above high, and retire one while it\n"
+        "                        is below low (default: high / 2).\n"
+        "   --scale-interval secs\n"
+        "                        How often to check CPU pressure (default: 10).\n"
+        "   --prewarm glob       Read files matching glob into the page cache before\n"
+        "                        starting the child. This option can be specified\n"
+        "                        multiple times.\n"
+        "   --prewarm-budget ms  Stop prewarming after this many milliseconds.\n"
+        "   --prewarm-jobs n     Number of files to prewarm in parallel (default: 4).\n"
+        "   --prewarm-async      Prewarm in the background while the child starts.\n"
+        "   --trace path         Record when descendant processes start, exec and\n"
+        "                        exit, and write a Chrome trace (JSON) to path when\n"
+        "                        dumb-init exits.\n"
+        "   --log-relay          Relay the output of the child through dumb-init,\n"
+        "                        one whole line at a time.\n"
+        "   --log-prefix fmt     Prefix relayed lines with fmt, where %%n is the\n"
+        "                        command name, %%p its PID and %%s the stream.\n"
+        "   --log-timestamps     Prefix relayed lines with the time (UTC).\n"
+        "   --log-overflow block|drop|buffer:MB\n"
+        "                        What to do when output is relayed faster than it\n"
+        "                        is consumed (default: block).\n"
+        "   --freeze-after secs  Freeze the children (with the cgroup v2 freezer)\n"
+        "                        after this many seconds without a connection or\n"
+        "                        signal, and thaw them when one arrives.\n"
+        "   -v, --verbose        Print debugging information to stderr.\n"
+        "   -h, --help           Print this help message and exit.\n"
+        "   -V, --version        Print the current version and exit.\n"
+        "\n"
+        "Full help is available online at https://github.com/Yelp/dumb-init\n",
+        VERSION_len, VERSION,
+        argv[0]
+    );
+}
+
+void print_rewrite_signum_help() {
+    fprintf(
+        stderr,
+        "Usage: -r option takes <signum>:<signum>, where <signum> "
+        "is between 1 and %d.\n"
+        "This option can be specified multiple times.\n"
+        "Use --help for full usage.\n",
+        MAXSIG
+    );
+    exit(1);
+}
+
+void parse_rewrite_signum(char *arg) {
+    int signum, replacement;
+    if (
+        sscanf(arg, "%d:%d", &signum, &replacement) == 2 &&
+        (signum >= 1 && signum <= MAXSIG) &&
+        (replacement >= 0 && replacement <= MAXSIG)
+    ) {
+        signal_rewrite[signum] = replacement;
+    } else {
+        print_rewrite_signum_help();
+    }
+}
+
+void parse_keep_fd(char *arg) {
+    char *end;
+    long fd = strtol(arg, &end, 10);
+    if (*arg == '\0' || *end != '\0' || fd < 0 || fd > 0x7fffffff || keep_fds_len >= MAXKEEPFDS) {
+        fprintf(
+            stderr,
+            "Usage: --keep-fd option takes a non-negative file descriptor number.\n"
+            "This option can be specified up to %d times.\n"
+            "Use --help for full usage.\n",
+            MAXKEEPFDS
+        );
+        exit(1);
+    }
+    keep_fds[keep_fds_len++] = fd;
+}
+
+int parse_rlimit_value(char *arg, rlim_t *value) {
+    char *end;
+    if (strcmp(arg, "unlimited") == 0) {
+        *value = RLIM_INFINITY;
+        return 1;
+    }
+    if (*arg < '0' || *arg > '9') {
+        return 0;
+    }
+    errno = 0;
+    *value = strtoull(arg, &end, 10);
+    return errno == 0 && *end == '\0';
+}
+
+void print_rlimit_help() {
+    fprintf(
+        stderr,
+        "Usage: --rlimit option takes <name>=<soft>[:<hard>], where <name> is one of\n"
+        "as, core, cpu, data, fsize, memlock, nofile, nproc or stack, and limits are\n"
+        "numbers or \"unlimited\".\n"
+        "This option can be specified multiple times.\n"
+        "Use --help for full usage.\n"
+    );
+    exit(1);
+}
+
+void parse_rlimit(char *arg) {
+    int i;
+    char *name = arg;
+    char *soft = strchr(arg, '=');
+    char *hard;
+    struct rlimit_setting setting;
+
+    if (soft == NULL || rlimits_len >= MAXRLIMITS) {
+        print_rlimit_help();
+    }
+    *soft++ = '\0';
+    hard = strchr(soft, ':');
+    if (hard != NULL) {
+        *hard++ = '\0';
+    }
+
+    for (i = 0; rlimit_names[i].name != NULL; i++) {
+        if (strcmp(rlimit_names[i].name, name) == 0) {
+            break;
+        }
+    }
+    if (rlimit_names[i].name == NULL) {
+        print_rlimit_help();
+    }
+    setting.resource = rlimit_names[i].resource;
+
+    if (!parse_rlimit_value(soft, &setting.limit.rlim_cur)) {
+        print_rlimit_help();
+    }
+    if (hard != NULL) {
+        if (!parse_rlimit_value(hard, &setting.limit.rlim_max)) {
+            print_rlimit_help();
+        }
+        if (setting.limit.rlim_max != RLIM_INFINITY &&
+                (setting.limit.rlim_cur == RLIM_INFINITY || setting.limit.rlim_cur > setting.limit.rlim_max)) {
+            print_rlimit_help();
+        }
+    } else {
+        // Only the soft limit was given, so keep the current hard limit
+        // unless the new soft limit needs it raised.
+        struct rlimit current;
+        setting.limit.rlim_max = setting.limit.rlim_cur;
+        if (getrlimit(setting.resource, &current) == 0 && (
+                current.rlim_max == RLIM_INFINITY ||
+                (setting.limit.rlim_cur != RLIM_INFINITY && setting.limit.rlim_cur <= current.rlim_max))) {
+            setting.limit.rlim_max = current.rlim_max;
+        }
+    }
+    rlimits[rlimits_len++] = setting;
+}
+
+void print_memory_pressure_help() {
+    fprintf(
+        stderr,
+        "Usage: --memory-pressure-signal takes <signum> between 1 and %d,\n"
+        "--memory-pressure-trigger takes some|full:<stall ms>:<window ms>, where\n"
+        "<window ms> is between 500 and 10000 and <stall ms> is below it, and\n"
+        "--memory-pressure-interval takes a number of seconds.\n"
+        "Use --help for full usage.\n",
+        MAXSIG
+    );
+    exit(1);
+}
+
+void parse_memory_pressure_signal(char *arg) {
+    int signum;
+    char extra;
+    if (sscanf(arg, "%d%c", &signum, &extra) != 1 || signum < 1 || signum > MAXSIG) {
+        print_memory_pressure_help();
+    }
+    memory_pressure_signal = signum;
+}
+
+void parse_memory_pressure_trigger(char *arg) {
+    char kind[5];
+    long stall_ms, window_ms;
+    char extra;
+    if (
+        sscanf(arg, "%4[a-z]:%ld:%ld%c", kind, &stall_ms, &window_ms, &extra) != 3 ||
+        (strcmp(kind, "some") != 0 && strcmp(kind, "full") != 0) ||
+        // The kernel only accepts PSI windows from 500 ms to 10 s.
+        stall_ms <= 0 || window_ms < 500 || window_ms > 10000 || stall_ms >= window_ms
+    ) {
+        print_memory_pressure_help();
+    }
+    strcpy(memory_pressure_kind, kind);
+    memory_pressure_stall_ms = stall_ms;
+    memory_pressure_window_ms = window_ms;
+}
+
+void parse_memory_pressure_interval(char *arg) {
+    long seconds;
+    char extra;
+    if (sscanf(arg, "%ld%c", &seconds, &extra) != 1 || seconds < 0) {
+        print_memory_pressure_help();
+    }
+    memory_pressure_interval_ms = seconds * 1000;
+}
+
+void print_pre_start_help() {
+    fprintf(
+        stderr,
+        "Usage: --pre-start option takes <name>[:<dep>[,<dep>...]][/<timeout>]=<command>,\n"
+        "where <name> is unique and <timeout> is a number of seconds.\n"
+        "This option can be specified up to %d times.\n"
+        "Use --help for full usage.\n",
+        MAXHOOKS
+    );
+    exit(1);
+}
+
+void parse_pre_start(char *arg) {
+    struct hook *hook = &hooks[hooks_len];
+    char *command = strchr(arg, '=');
+    char *timeout;
+    char extra;
+    long seconds;
+
+    if (command == NULL || hooks_len >= MAXHOOKS) {
+        print_pre_start_help();
+    }
+    *command++ = '\0';
+    memset(hook, 0, sizeof(*hook));
+    hook->name = arg;
+    hook->command = command;
+
+    timeout = strchr(arg, '/');
+    if (timeout != NULL) {
+        *timeout++ = '\0';
+        if (sscanf(timeout, "%ld%c", &seconds, &extra) != 1 || seconds <= 0) {
+            print_pre_start_help();
+        }
+        hook->timeout_ms = seconds * 1000;
+    }
+    hook->deps = strchr(arg, ':');
+    if (hook->deps != NULL) {
+        *hook->deps++ = '\0';
+    }
+    if (*hook->name == '\0' || *hook->command == '\0' || find_hook(hook->name, strlen(hook->name)) != -1) {
+        print_pre_start_help();
+    }
+    hooks_len++;
+}
+
+void parse_listen(char *arg) {
+    if (listeners_len >= MAXLISTENERS) {
+        fprintf(
+            stderr,
+            "Usage: --listen option can be specified up to %d times.\n"
+            "Use --help for full usage.\n",
+            MAXLISTENERS
+        );
+        exit(1);
+    }
+    listeners[listeners_len].address = arg;
+    listeners[listeners_len].fd = -1;
+    listeners_len++;
+}
+
+void parse_listen_backlog(char *arg) {
+    char extra;
+    if (sscanf(arg, "%d%c", &listen_backlog, &extra) != 1 || listen_backlog <= 0) {
+        fprintf(
+            stderr,
+            "Usage: --listen-backlog option takes a positive number.\n"
+            "Use --help for full usage.\n"
+        );
+        exit(1);
+    }
+}
+
+// Parse a signal number between 1 and MAXSIG, returning -1 if invalid.
+int parse_signal_number(const char *arg) {
+    int signum;
+    char extra;
+    if (sscanf(arg, "%d%c", &signum, &extra) != 1 || signum < 1 || signum > MAXSIG) {
+        return -1;
+    }
+    return signum;
+}
+
+// dumb-init moves to / once the child is started, so paths given relative to
+// the original working directory are made absolute while parsing.
+char *absolute_path(char *path) {
+    char *cwd, *absolute;
+    if (path[0] == '/' || (cwd = getcwd(NULL, 0)) == NULL) {
+        return path;
+    }
+    absolute = malloc(strlen(cwd) + strlen(path) + 2);
+    if (absolute == NULL) {
+        free(cwd);
+        return path;
+    }
+    sprintf(absolute, "%s/%s", cwd, path);
+    free(cwd);
+    return absolute;
+}
+
+void print_reload_help() {
+    fprintf(
+        stderr,
+        "Usage: --reload-signal and --reload-stop-signal take <signum> between 1 and %d,\n"
+        "and --reload-timeout takes a positive number of seconds.\n"
+        "--reload-signal requires --reload-ready-file or --notify-socket.\n"
+        "Use --help for full usage.\n",
+        MAXSIG
+    );
+    exit(1);
+}
+
+void parse_reload_timeout(char *arg) {
+    long seconds;
+    char extra;
+    if (sscanf(arg, "%ld%c", &seconds, &extra) != 1 || seconds <= 0) {
+        print_reload_help();
+    }
+    reload_timeout_ms = seconds * 1000;
+}
 
-#define DEBUG(...) do { \
-    if (debug) { \
-        PRINTERR(__VA_ARGS__); \
-    } \
-} while (0)
+void print_notify_help() {
+    fprintf(
+        stderr,
+        "Usage: --watchdog-sec takes a positive number of seconds and\n"
+        "--watchdog-signal takes <signum> between 1 and %d.\n"
+        "--ready-file, --ready-command and --watchdog-sec require --notify-socket.\n"
+        "Use --help for full usage.\n",
+        MAXSIG
+    );
+    exit(1);
+}
 
-// Signals we care about are numbered from 1 to 31, inclusive.
-// (32 and above are real-time signals.)
-// TODO: this is likely not portable outside of Linux, or on strange architectures
-#define MAXSIG 31
+void parse_watchdog_sec(char *arg) {
+    long seconds;
+    char extra;
+    if (sscanf(arg, "%ld%c", &seconds, &extra) != 1 || seconds <= 0) {
+        print_notify_help();
+    }
+    watchdog_ms = seconds * 1000;
+}
 
-// Indices are one-indexed (signal 1 is at index 1). Index zero is unused.
-// User-specified signal rewriting.
-int signal_rewrite[MAXSIG + 1] = {[0 ... MAXSIG] = -1};
-// One-time ignores due to TTY quirks. 0 = no skip, 1 = skip the next-received signal.
-char signal_temporary_ignores[MAXSIG + 1] = {[0 ... MAXSIG] = 0};
+void print_workers_help() {
+    fprintf(
+        stderr,
+        "Usage: --workers takes a number between 1 and %d, --workers-max takes a\n"
+        "number at least --workers, --scale-cpu-pressure takes <high>[:<low>]\n"
+        "percentages with <low> below <high>, and --scale-interval takes a\n"
+        "positive number of seconds.\n"
+        "--workers-max and --scale-cpu-pressure require --workers, and --workers\n"
+        "can't be combined with --reload-signal.\n"
+        "Use --help for full usage.\n",
+        MAXWORKERS
+    );
+    exit(1);
+}
 
-pid_t child_pid = -1;
-char debug = 0;
-char use_setsid = 1;
+void parse_workers(char *arg, int *value) {
+    char extra;
+    if (sscanf(arg, "%d%c", value, &extra) != 1 || *value < 1 || *value > MAXWORKERS) {
+        print_workers_help();
+    }
+}
 
-int translate_signal(int signum) {
-    if (signum <= 0 || signum > MAXSIG) {
-        return signum;
-    } else {
-        int translated = signal_rewrite[signum];
-        if (translated == -1) {
-            return signum;
-        } else {
-            DEBUG("Translating signal %d to %d.\n", signum, translated);
-            return translated;
-        }
+void parse_scale_cpu_pressure(char *arg) {
+    char extra;
+    int n = sscanf(arg, "%lf:%lf%c", &scale_cpu_high, &scale_cpu_low, &extra);
+    if (n == 1) {
+        scale_cpu_low = scale_cpu_high / 2;
+    } else if (n != 2) {
+        print_workers_help();
+    }
+    if (scale_cpu_high <= 0 || scale_cpu_high > 100 || scale_cpu_low < 0 || scale_cpu_low >= scale_cpu_high) {
+        print_workers_help();
     }
 }
 
-void forward_signal(int signum) {
-    signum = translate_signal(signum);
-    if (signum != 0) {
-        kill(use_setsid ? -child_pid : child_pid, signum);
-        DEBUG("Forwarded signal %d to children.\n", signum);
-    } else {
-        DEBUG("Not forwarding signal %d to children (ignored).\n", signum);
+void parse_scale_interval(char *arg) {
+    long seconds;
+    char extra;
+    if (sscanf(arg, "%ld%c", &seconds, &extra) != 1 || seconds <= 0) {
+        print_workers_help();
     }
+    scale_interval_ms = seconds * 1000;
 }
 
-/*
- * The dumb-init signal handler.
- *
- * The main job of this signal handler is to forward signals along to our child
- * process(es). In setsid mode, this means signaling the entire process group
- * rooted at our child. In non-setsid mode, this is just signaling the primary
- * child.
- *
- * In most cases, simply proxying the received signal is sufficient. If we
- * receive a job control signal, however, we should not only forward it, but
- * also sleep dumb-init itself.
- *
- * This allows users to run foreground processes using dumb-init and to
- * control them using normal shell job control features (e.g. Ctrl-Z to
- * generate a SIGTSTP and suspend the process).
- *
- * The libc manual is useful:
- * https://www.gnu.org/software/libc/manual/html_node/Job-Control-Signals.html
- *
-*/
-void handle_signal(int signum) {
-    DEBUG("Received signal %d.\n", signum);
+void print_prewarm_help() {
+    fprintf(
+        stderr,
+        "Usage: --prewarm option can be specified up to %d times,\n"
+        "--prewarm-budget takes a positive number of milliseconds and\n"
+        "--prewarm-jobs takes a number between 1 and %d.\n"
+        "Use --help for full usage.\n",
+        MAXPREWARM, MAXPREWARM
+    );
+    exit(1);
+}
 
-    if (signal_temporary_ignores[signum] == 1) {
-        DEBUG("Ignoring tty hand-off signal %d.\n", signum);
-        signal_temporary_ignores[signum] = 0;
-    } else if (signum == SIGCHLD) {
-        int status, exit_status;
-        pid_t killed_pid;
-        while ((killed_pid = waitpid(-1, &status, WNOHANG)) > 0) {
-            if (WIFEXITED(status)) {
-                exit_status = WEXITSTATUS(status);
-                DEBUG("A child with PID %d exited with exit status %d.\n", killed_pid, exit_status);
-            } else {
-                assert(WIFSIGNALED(status));
-                exit_status = 128 + WTERMSIG(status);
-                DEBUG("A child with PID %d was terminated by signal %d.\n", killed_pid, exit_status - 128);
-            }
+void parse_prewarm_number(char *arg, long *value, long max) {
+    char extra;
+    if (sscanf(arg, "%ld%c", value, &extra) != 1 || *value <= 0 || *value > max) {
+        print_prewarm_help();
+    }
+}
 
-            if (killed_pid == child_pid) {
-                forward_signal(SIGTERM);  // send SIGTERM to any remaining children
-                DEBUG("Child exited with status %d. Goodbye.\n", exit_status);
-                exit(exit_status);
-            }
+void print_log_overflow_help() {
+    fprintf(
+        stderr,
+        "Usage: --log-overflow takes block, drop or buffer:<MB>, where <MB> is\n"
+        "between 1 and 1024.\n"
+        "Use --help for full usage.\n"
+    );
+    exit(1);
+}
+
+void parse_log_overflow(char *arg) {
+    char *end;
+    long mb;
+    if (strcmp(arg, "block") == 0) {
+        log_overflow = LOG_BLOCK;
+    } else if (strcmp(arg, "drop") == 0) {
+        log_overflow = LOG_DROP;
+    } else if (strncmp(arg, "buffer:", 7) == 0) {
+        mb = strtol(arg + 7, &end, 10);
+        if (arg[7] == '\0' || *end != '\0' || mb < 1 || mb > 1024) {
+            print_log_overflow_help();
         }
+        log_overflow = LOG_BUFFER;
+        log_buffer_max = (size_t) mb * 1024 * 1024;
     } else {
-        forward_signal(signum);
-        if (signum == SIGTSTP || signum == SIGTTOU || signum == SIGTTIN) {
-            DEBUG("Suspending self due to TTY signal.\n");
-            kill(getpid(), SIGSTOP);
-        }
+        print_log_overflow_help();
     }
 }
 
-void print_help(char *argv[]) {
-    fprintf(stderr,
-        "dumb-init v%.*s"
-        "Usage: %s [option] command [[arg] ...]\n"
-        "\n"
-        "dumb-init is a simple process supervisor that forwards signals to children.\n"
-        "It is designed to run as PID1 in minimal container environments.\n"
-        "\n"
-        "Optional arguments:\n"
-        "   -c, --single-child   Run in single-child mode.\n"
-        "                        In this mode, signals are only proxied to the\n"
-        "                        direct child and not any of its descendants.\n"
-        "   -r, --rewrite s:r    Rewrite received signal s to new signal r before proxying.\n"
-        "                        To ignore (not proxy) a signal, rewrite it to 0.\n"
-        "                        This option can be specified multiple times.\n"
-        "   -v, --verbose        Print debugging information to stderr.\n"
-        "   -h, --help           Print this help message and exit.\n"
-        "   -V, --version        Print the current version and exit.\n"
-        "\n"
-        "Full help is available online at https://github.com/Yelp/dumb-init\n",
-        VERSION_len, VERSION,
-        argv[0]
+void print_freeze_help() {
+    fprintf(
+        stderr,
+        "Usage: --freeze-after takes a positive number of seconds.\n"
+        "Use --help for full usage.\n"
     );
+    exit(1);
 }
 
-void print_rewrite_signum_help() {
+void parse_freeze_after(char *arg) {
+    long seconds;
+    char extra;
+    if (sscanf(arg, "%ld%c", &seconds, &extra) != 1 || seconds <= 0) {
+        print_freeze_help();
+    }
+    freeze_after_ms = seconds * 1000;
+}
+
+void print_route_help() {
     fprintf(
         stderr,
-        "Usage: -r option takes <signum>:<signum>, where <signum> "
+        "Usage: --route option takes <signum>:child|group|tree, where <signum> "
         "is between 1 and %d.\n"
+        "group can't be used in single-child mode.\n"
         "This option can be specified multiple times.\n"
         "Use --help for full usage.\n",
         MAXSIG
@@ -161,16 +3560,21 @@ void print_rewrite_signum_help() {
     exit(1);
 }
 
-void parse_rewrite_signum(char *arg) {
-    int signum, replacement;
-    if (
-        sscanf(arg, "%d:%d", &signum, &replacement) == 2 &&
-        (signum >= 1 && signum <= MAXSIG) &&
-        (replacement >= 0 && replacement <= MAXSIG)
-    ) {
-        signal_rewrite[signum] = replacement;
+void parse_route(char *arg) {
+    int signum;
+    char route[8];
+    char extra;
+    if (sscanf(arg, "%d:%7[a-z]%c", &signum, route, &extra) != 2 || signum < 1 || signum > MAXSIG) {
+        print_route_help();
+    }
+    if (strcmp(route, "child") == 0) {
+        signal_route[signum] = ROUTE_CHILD;
+    } else if (strcmp(route, "group") == 0) {
+        signal_route[signum] = ROUTE_GROUP;
+    } else if (strcmp(route, "tree") == 0) {
+        signal_route[signum] = ROUTE_TREE;
     } else {
-        print_rewrite_signum_help();
+        print_route_help();
     }
 }
 
@@ -180,14 +3584,88 @@ void set_rewrite_to_sigstop_if_not_defined(int signum) {
     }
 }
 
+// Long options without a short equivalent.
+enum {
+    OPT_CLOSE_FDS = 256,
+    OPT_KEEP_FD,
+    OPT_RLIMIT,
+    OPT_CGROUP,
+    OPT_MEMORY_PRESSURE_SIGNAL,
+    OPT_MEMORY_PRESSURE_TRIGGER,
+    OPT_MEMORY_PRESSURE_INTERVAL,
+    OPT_PRE_START,
+    OPT_LISTEN,
+    OPT_LISTEN_BACKLOG,
+    OPT_LAZY_SPAWN,
+    OPT_RELOAD_SIGNAL,
+    OPT_RELOAD_STOP_SIGNAL,
+    OPT_RELOAD_READY_FILE,
+    OPT_RELOAD_TIMEOUT,
+    OPT_NOTIFY_SOCKET,
+    OPT_READY_FILE,
+    OPT_READY_COMMAND,
+    OPT_WATCHDOG_SEC,
+    OPT_WATCHDOG_SIGNAL,
+    OPT_WORKERS,
+    OPT_WORKERS_MAX,
+    OPT_SCALE_CPU_PRESSURE,
+    OPT_SCALE_INTERVAL,
+    OPT_PREWARM,
+    OPT_PREWARM_BUDGET,
+    OPT_PREWARM_JOBS,
+    OPT_PREWARM_ASYNC,
+    OPT_ROUTE,
+    OPT_TRACE,
+    OPT_LOG_RELAY,
+    OPT_LOG_PREFIX,
+    OPT_LOG_TIMESTAMPS,
+    OPT_LOG_OVERFLOW,
+    OPT_FREEZE_AFTER,
+};
+
 char **parse_command(int argc, char *argv[]) {
     int opt;
     struct option long_options[] = {
         {"help",         no_argument,       NULL, 'h'},
         {"single-child", no_argument,       NULL, 'c'},
         {"rewrite",      required_argument, NULL, 'r'},
+        {"route",        required_argument, NULL, OPT_ROUTE},
         {"verbose",      no_argument,       NULL, 'v'},
         {"version",      no_argument,       NULL, 'V'},
+        {"close-fds",    no_argument,       NULL, OPT_CLOSE_FDS},
+        {"keep-fd",      required_argument, NULL, OPT_KEEP_FD},
+        {"rlimit",       required_argument, NULL, OPT_RLIMIT},
+        {"cgroup",       required_argument, NULL, OPT_CGROUP},
+        {"memory-pressure-signal",   required_argument, NULL, OPT_MEMORY_PRESSURE_SIGNAL},
+        {"memory-pressure-trigger",  required_argument, NULL, OPT_MEMORY_PRESSURE_TRIGGER},
+        {"memory-pressure-interval", required_argument, NULL, OPT_MEMORY_PRESSURE_INTERVAL},
+        {"pre-start",    required_argument, NULL, OPT_PRE_START},
+        {"listen",       required_argument, NULL, OPT_LISTEN},
+        {"listen-backlog", required_argument, NULL, OPT_LISTEN_BACKLOG},
+        {"lazy-spawn",   no_argument,       NULL, OPT_LAZY_SPAWN},
+        {"reload-signal",      required_argument, NULL, OPT_RELOAD_SIGNAL},
+        {"reload-stop-signal", required_argument, NULL, OPT_RELOAD_STOP_SIGNAL},
+        {"reload-ready-file",  required_argument, NULL, OPT_RELOAD_READY_FILE},
+        {"reload-timeout",     required_argument, NULL, OPT_RELOAD_TIMEOUT},
+        {"notify-socket",   required_argument, NULL, OPT_NOTIFY_SOCKET},
+        {"ready-file",      required_argument, NULL, OPT_READY_FILE},
+        {"ready-command",   required_argument, NULL, OPT_READY_COMMAND},
+        {"watchdog-sec",    required_argument, NULL, OPT_WATCHDOG_SEC},
+        {"watchdog-signal", required_argument, NULL, OPT_WATCHDOG_SIGNAL},
+        {"workers",            required_argument, NULL, OPT_WORKERS},
+        {"workers-max",        required_argument, NULL, OPT_WORKERS_MAX},
+        {"scale-cpu-pressure", required_argument, NULL, OPT_SCALE_CPU_PRESSURE},
+        {"scale-interval",     required_argument, NULL, OPT_SCALE_INTERVAL},
+        {"prewarm",        required_argument, NULL, OPT_PREWARM},
+        {"prewarm-budget", required_argument, NULL, OPT_PREWARM_BUDGET},
+        {"prewarm-jobs",   required_argument, NULL, OPT_PREWARM_JOBS},
+        {"prewarm-async",  no_argument,       NULL, OPT_PREWARM_ASYNC},
+        {"trace",          required_argument, NULL, OPT_TRACE},
+        {"log-relay",      no_argument,       NULL, OPT_LOG_RELAY},
+        {"log-prefix",     required_argument, NULL, OPT_LOG_PREFIX},
+        {"log-timestamps", no_argument,       NULL, OPT_LOG_TIMESTAMPS},
+        {"log-overflow",   required_argument, NULL, OPT_LOG_OVERFLOW},
+        {"freeze-after",   required_argument, NULL, OPT_FREEZE_AFTER},
         {NULL,                     0,       NULL,   0},
     };
     while ((opt = getopt_long(argc, argv, "+hvVcr:", long_options, NULL)) != -1) {
@@ -207,11 +3685,156 @@ char **parse_command(int argc, char *argv[]) {
             case 'r':
                 parse_rewrite_signum(optarg);
                 break;
+            case OPT_ROUTE:
+                parse_route(optarg);
+                break;
+            case OPT_CLOSE_FDS:
+                close_fds = 1;
+                break;
+            case OPT_KEEP_FD:
+                parse_keep_fd(optarg);
+                break;
+            case OPT_RLIMIT:
+                parse_rlimit(optarg);
+                break;
+            case OPT_CGROUP:
+                snprintf(cgroup_dir, sizeof(cgroup_dir), "%s", optarg);
+                break;
+            case OPT_MEMORY_PRESSURE_SIGNAL:
+                parse_memory_pressure_signal(optarg);
+                break;
+            case OPT_MEMORY_PRESSURE_TRIGGER:
+                parse_memory_pressure_trigger(optarg);
+                break;
+            case OPT_MEMORY_PRESSURE_INTERVAL:
+                parse_memory_pressure_interval(optarg);
+                break;
+            case OPT_PRE_START:
+                parse_pre_start(optarg);
+                break;
+            case OPT_LISTEN:
+                parse_listen(optarg);
+                break;
+            case OPT_LISTEN_BACKLOG:
+                parse_listen_backlog(optarg);
+                break;
+            case OPT_LAZY_SPAWN:
+                lazy_spawn = 1;
+                break;
+            case OPT_RELOAD_SIGNAL:
+                if ((reload_signal = parse_signal_number(optarg)) == -1) {
+                    print_reload_help();
+                }
+                break;
+            case OPT_RELOAD_STOP_SIGNAL:
+                if ((reload_stop_signal = parse_signal_number(optarg)) == -1) {
+                    print_reload_help();
+                }
+                break;
+            case OPT_RELOAD_READY_FILE:
+                reload_ready_file = absolute_path(optarg);
+                break;
+            case OPT_RELOAD_TIMEOUT:
+                parse_reload_timeout(optarg);
+                break;
+            case OPT_NOTIFY_SOCKET:
+                notify_socket_path = optarg;
+                break;
+            case OPT_READY_FILE:
+                ready_file = absolute_path(optarg);
+                break;
+            case OPT_READY_COMMAND:
+                ready_command = optarg;
+                break;
+            case OPT_WATCHDOG_SEC:
+                parse_watchdog_sec(optarg);
+                break;
+            case OPT_WATCHDOG_SIGNAL:
+                if ((watchdog_signal = parse_signal_number(optarg)) == -1) {
+                    print_notify_help();
+                }
+                break;
+            case OPT_WORKERS:
+                parse_workers(optarg, &workers_min);
+                break;
+            case OPT_WORKERS_MAX:
+                parse_workers(optarg, &workers_max);
+                break;
+            case OPT_SCALE_CPU_PRESSURE:
+                parse_scale_cpu_pressure(optarg);
+                break;
+            case OPT_SCALE_INTERVAL:
+                parse_scale_interval(optarg);
+                break;
+            case OPT_PREWARM:
+                if (prewarm_patterns_len >= MAXPREWARM) {
+                    print_prewarm_help();
+                }
+                prewarm_patterns[prewarm_patterns_len++] = optarg;
+                break;
+            case OPT_PREWARM_BUDGET:
+                parse_prewarm_number(optarg, &prewarm_budget_ms, LONG_MAX);
+                break;
+            case OPT_PREWARM_JOBS: {
+                long jobs;
+                parse_prewarm_number(optarg, &jobs, MAXPREWARM);
+                prewarm_jobs = jobs;
+                break;
+            }
+            case OPT_PREWARM_ASYNC:
+                prewarm_async = 1;
+                break;
+            case OPT_TRACE:
+                trace_path = absolute_path(optarg);
+                break;
+            case OPT_LOG_RELAY:
+                log_relay = 1;
+                break;
+            case OPT_LOG_PREFIX:
+                log_relay = 1;
+                log_prefix = optarg;
+                break;
+            case OPT_LOG_TIMESTAMPS:
+                log_relay = 1;
+                log_timestamps = 1;
+                break;
+            case OPT_LOG_OVERFLOW:
+                parse_log_overflow(optarg);
+                break;
+            case OPT_FREEZE_AFTER:
+                parse_freeze_after(optarg);
+                break;
             default:
                 exit(1);
         }
     }
 
+    if (reload_signal && reload_ready_file == NULL && notify_socket_path == NULL) {
+        print_reload_help();
+    }
+
+    if ((ready_file || ready_command || watchdog_ms) && notify_socket_path == NULL) {
+        print_notify_help();
+    }
+
+    if (workers_max == 0) {
+        workers_max = workers_min;
+    }
+    if (workers_max < workers_min ||
+            ((workers_max > workers_min || scale_cpu_high > 0) && workers_min == 0) ||
+            (workers_min && reload_signal)) {
+        print_workers_help();
+    }
+
+    if (lazy_spawn && listeners_len == 0) {
+        fprintf(
+            stderr,
+            "Usage: --lazy-spawn requires at least one --listen socket.\n"
+            "Use --help for full usage.\n"
+        );
+        exit(1);
+    }
+
     if (optind >= argc) {
         fprintf(
             stderr,
@@ -234,6 +3857,15 @@ char **parse_command(int argc, char *argv[]) {
         DEBUG("Not running in setsid mode.\n");
     }
 
+    if (!use_setsid) {
+        int i;
+        for (i = 1; i <= MAXSIG; i++) {
+            if (signal_route[i] == ROUTE_GROUP) {
+                print_route_help();
+            }
+        }
+    }
+
     if (use_setsid) {
         set_rewrite_to_sigstop_if_not_defined(SIGTSTP);
         set_rewrite_to_sigstop_if_not_defined(SIGTTOU);
@@ -250,7 +3882,11 @@ char **parse_command(int argc, char *argv[]) {
 void dummy(int signum) {}
 
 int main(int argc, char *argv[]) {
+    PROFILE_INIT();
+    PROFILE_START(startup);
+    start_time = now_ms();
     char **cmd = parse_command(argc, argv);
+    PROFILE_PHASE(PROFILE_PARSE, startup);
     sigset_t all_signals;
     sigfillset(&all_signals);
     sigprocmask(SIG_BLOCK, &all_signals, NULL);
@@ -260,6 +3896,28 @@ int main(int argc, char *argv[]) {
         signal(i, dummy);
     }
 
+    int signal_fd = signalfd(-1, &all_signals, SFD_NONBLOCK | SFD_CLOEXEC);
+    if (signal_fd == -1) {
+        PRINTERR("Unable to create signalfd (errno=%d %s). Exiting.\n", errno, strerror(errno));
+        return 1;
+    }
+    add_watch(signal_fd, POLLIN, handle_signalfd);
+
+    if (trace_path) {
+        start_trace();
+    }
+    if (log_relay) {
+        start_log_relay();
+    }
+
+    if (memory_pressure_signal) {
+        start_memory_pressure_monitor();
+    }
+    if (scale_cpu_high > 0) {
+        check_cpu_pressure();
+    }
+    bind_listeners();
+
     /*
      * Detach dumb-init from controlling tty, so that the child's session can
      * attach to it instead.
@@ -268,6 +3926,7 @@ int main(int argc, char *argv[]) {
      * it can do normal job control.
      */
     if (use_setsid) {
+        PROFILE_START(tty_detach);
         if (ioctl(STDIN_FILENO, TIOCNOTTY) == -1) {
             DEBUG(
                 "Unable to detach from controlling tty (errno=%d %s).\n",
@@ -290,51 +3949,39 @@ int main(int argc, char *argv[]) {
                 DEBUG("Detached from controlling tty, but was not session leader.\n");
             }
         }
+        PROFILE_PHASE(PROFILE_TTY_DETACH, tty_detach);
     }
 
-    child_pid = fork();
-    if (child_pid < 0) {
-        PRINTERR("Unable to fork. Exiting.\n");
-        return 1;
-    } else if (child_pid == 0) {
-        /* child */
-        sigprocmask(SIG_UNBLOCK, &all_signals, NULL);
-        if (use_setsid) {
-            if (setsid() == -1) {
-                PRINTERR(
-                    "Unable to setsid (errno=%d %s). Exiting.\n",
-                    errno,
-                    strerror(errno)
-                );
-                exit(1);
-            }
-
-            if (ioctl(STDIN_FILENO, TIOCSCTTY, 0) == -1) {
-                DEBUG(
-                    "Unable to attach to controlling tty (errno=%d %s).\n",
-                    errno,
-                    strerror(errno)
-                );
-            }
-            DEBUG("setsid complete.\n");
-        }
-        execvp(cmd[0], &cmd[0]);
+    run_pre_start_hooks();
+    start_prewarm();
+    if (lazy_spawn) {
+        wait_for_first_connection();
+    }
+    if (freeze_after_ms) {
+        start_freezer();
+    }
 
-        // if this point is reached, exec failed, so we should exit nonzero
-        PRINTERR("%s: %s\n", cmd[0], strerror(errno));
-        return 2;
+    start_notify_socket();
+    child_command = cmd;
+    child_cwd = getcwd(NULL, 0);
+    PROFILE_PHASE(PROFILE_BEFORE_FORK, startup);
+    if (workers_min) {
+        start_worker_pool();
     } else {
-        /* parent */
-        DEBUG("Child spawned with PID %d.\n", child_pid);
-        if (chdir("/") == -1) {
-             DEBUG("Unable to chdir(\"/\") (errno=%d %s)\n",
-                   errno,
-                   strerror(errno));
-        }
-        for (;;) {
-            int signum;
-            sigwait(&all_signals, &signum);
-            handle_signal(signum);
+        child_pid = spawn_child(cmd, -1);
+        if (child_pid < 0) {
+            PRINTERR("Unable to fork. Exiting.\n");
+            return 1;
         }
+        DEBUG("Child spawned with PID %d.\n", child_pid);
+    }
+
+    /* parent */
+    if (chdir("/") == -1) {
+         DEBUG("Unable to chdir(\"/\") (errno=%d %s)\n",
+               errno,
+               strerror(errno));
     }
+    PROFILE_TRACE_SYSCALLS();
+    run_event_loop(NULL);
 }
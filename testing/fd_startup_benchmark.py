@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Measure how inherited file descriptors slow down process spawning.
+
+Leaks a configurable number of file descriptors into dumb-init and times a
+child which spawns many short-lived subprocesses, with and without
+`--close-fds`.
+
+Usage: python -m testing.fd_startup_benchmark [leaked fds] [spawns]
+"""
+import os
+import resource
+import sys
+import time
+from subprocess import check_call
+
+
+SPAWN_LOOP = 'i=0; while [ $i -lt {spawns} ]; do /bin/true; i=$((i + 1)); done'
+
+
+def leak_fds(count):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY:
+        count = min(count, hard - 64)
+    needed = count + 64
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    return [os.open(os.devnull, os.O_RDONLY) for _ in range(count)]
+
+
+def run(args, fds, spawns, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.monotonic()
+        check_call(
+            ('dumb-init',) + args + ('sh', '-c', SPAWN_LOOP.format(spawns=spawns)),
+            pass_fds=fds,
+        )
+        elapsed = time.monotonic() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10000
+    spawns = int(argv[2]) if len(argv) > 2 else 500
+    fds = leak_fds(count)
+
+    default = run((), fds, spawns)
+    closed = run(('--close-fds',), fds, spawns)
+
+    print('{} leaked fds, {} spawns (best of 5)'.format(len(fds), spawns))
+    print('  inherited:   {:8.1f} ms'.format(default * 1000))
+    print('  --close-fds: {:8.1f} ms'.format(closed * 1000))
+    print('  speedup:     {:8.2f}x'.format(default / closed))
+
+
+if __name__ == '__main__':
+    exit(main(sys.argv))
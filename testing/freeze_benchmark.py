@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""Measure how much thawing frozen children delays the first request.
+
+Runs a small server under dumb-init with `--listen` and `--freeze-after 1`,
+and times a request (connect, then read the reply) while the server is
+running, and as the first request after the children were frozen, which
+includes dumb-init noticing the connection and thawing the cgroup.
+
+Needs a writable cgroup v2 hierarchy with the freezer (usually root).
+
+Usage: python -m testing.freeze_benchmark [requests]
+"""
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from subprocess import PIPE
+from subprocess import Popen
+
+from testing import sleep_until
+
+
+SERVER = '''
+import socket
+sock = socket.socket(fileno=3)
+print("ready", flush=True)
+while True:
+    conn, _ = sock.accept()
+    conn.sendall(b"hello")
+    conn.close()
+'''
+
+
+def make_cgroup(name):
+    for root in ('/sys/fs/cgroup', '/sys/fs/cgroup/unified'):
+        path = os.path.join(root, name)
+        try:
+            os.mkdir(path)
+        except OSError:
+            continue
+        if os.path.exists(os.path.join(path, 'cgroup.freeze')):
+            return path
+        os.rmdir(path)
+    raise SystemExit('no writable cgroup v2 with freezer support')
+
+
+def frozen(cgroup):
+    with open(os.path.join(cgroup, 'supervised', 'cgroup.events')) as f:
+        return 'frozen 1\n' in f.read()
+
+
+def request(path):
+    """Return the time (in ns) a request takes."""
+    start = time.monotonic_ns()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    assert sock.recv(5) == b'hello'
+    elapsed = time.monotonic_ns() - start
+    sock.close()
+    return elapsed
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'server.sock')
+    cgroup = make_cgroup('freeze-benchmark-{}'.format(os.getpid()))
+    proc = Popen(
+        (
+            'dumb-init',
+            '--cgroup', cgroup,
+            '--freeze-after', '1',
+            '--listen', 'unix:' + path,
+            sys.executable, '-c', SERVER,
+        ),
+        stdout=PIPE,
+    )
+    try:
+        assert proc.stdout.readline() == b'ready\n'
+
+        running = []
+        for _ in range(count):
+            running.append(request(path))
+            time.sleep(0.05)
+
+        thawing = []
+        for _ in range(count):
+            def assert_frozen():
+                assert frozen(cgroup)
+            sleep_until(assert_frozen, timeout=5)
+            thawing.append(request(path))
+    finally:
+        proc.terminate()
+        proc.wait()
+        supervised = os.path.join(cgroup, 'supervised')
+        sleep_until(lambda: os.rmdir(supervised))
+        os.rmdir(cgroup)
+        shutil.rmtree(tmpdir)
+
+    print('{} requests each'.format(count))
+    for name, values in (('running:', running), ('after freeze:', thawing)):
+        print(
+            '  {:14} median {:8.0f} us, max {:8.0f} us'.format(
+                name, median(values) / 1000, max(values) / 1000,
+            ),
+        )
+    print('  thaw delay:    median {:8.0f} us'.format((median(thawing) - median(running)) / 1000))
+
+
+if __name__ == '__main__':
+    exit(main(sys.argv))
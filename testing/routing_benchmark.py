@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Measure the wakeups saved by routing a signal to the direct child only.
+
+Starts a wide process tree under dumb-init in which every process handles
+SIGWINCH, sends a burst of SIGWINCH to dumb-init, and counts the context
+switches of the whole tree, first with the default (whole group) route and
+then with `--route 28:child`.
+
+Usage: python -m testing.routing_benchmark [processes] [signals]
+"""
+import os
+import signal
+import sys
+import time
+from subprocess import Popen
+
+from testing import kill_if_alive
+from testing import sleep_until
+
+
+WIDE_TREE = (
+    'trap : WINCH; '
+    'i=0; while [ $i -lt {width} ]; do '
+    '(trap : WINCH; while :; do sleep 3600; done) & i=$((i + 1)); '
+    'done; '
+    'while :; do sleep 3600; done'
+)
+
+
+def descendants(root):
+    """Like pid_tree, but reads /proc only once, which matters for wide trees."""
+    children = {}
+    for p in os.listdir('/proc'):
+        if not p.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(p)) as f:
+                ppid = int(f.read().rpartition(')')[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(p))
+    pids, todo = set(), [root]
+    while todo:
+        for child in children.get(todo.pop(), ()):
+            pids.add(child)
+            todo.append(child)
+    return pids
+
+
+def context_switches(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open('/proc/{}/status'.format(pid)) as f:
+                for line in f:
+                    if 'ctxt_switches' in line:
+                        total += int(line.split()[-1])
+        except OSError:
+            pass
+    return total
+
+
+def run(args, width, count):
+    proc = Popen(
+        ('dumb-init',) + args + ('sh', '-c', WIDE_TREE.format(width=width)),
+    )
+    try:
+        # each subshell is accompanied by its sleep
+        def assert_started():
+            assert len(descendants(proc.pid)) >= 2 * width + 2
+        sleep_until(assert_started, timeout=30)
+        pids = descendants(proc.pid)
+
+        before = context_switches(pids)
+        start = time.monotonic()
+        for _ in range(count):
+            proc.send_signal(signal.SIGWINCH)
+            time.sleep(0.001)
+        # let the tree settle before sampling again
+        time.sleep(0.5)
+        elapsed = time.monotonic() - start
+        return context_switches(pids) - before, elapsed
+    finally:
+        for pid in descendants(proc.pid):
+            kill_if_alive(pid)
+        proc.wait()
+
+
+def main(argv):
+    width = int(argv[1]) if len(argv) > 1 else 200
+    count = int(argv[2]) if len(argv) > 2 else 100
+    os.environ['DUMB_INIT_SETSID'] = '1'
+
+    group, group_time = run((), width, count)
+    child, child_time = run(('--route', '{}:child'.format(signal.SIGWINCH)), width, count)
+
+    print('{} processes, {} signals'.format(width, count))
+    print('  group route: {:8d} context switches ({:.1f} s)'.format(group, group_time))
+    print('  child route: {:8d} context switches ({:.1f} s)'.format(child, child_time))
+    print('  saved:       {:8d}'.format(group - child))
+
+
+if __name__ == '__main__':
+    exit(main(sys.argv))
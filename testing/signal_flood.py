@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""Flood dumb-init with signals while its children are being spawned and reaped.
+
+Sends a randomized, bursty mix of signals to dumb-init at a high rate, while a
+spawner in the child's tree creates and orphans short-lived processes as fast
+as it can. When dumb-init runs as PID 1 of a new PID namespace (this needs
+root and unshare(1)), the orphans are reparented to it, so it has to reap them
+in the same loop that forwards the signals.
+
+Standard signals coalesce: a signal sent while the same one is still pending
+is merged with it. So a signal only counts as lost if the child never receives
+it again at or after the time it was sent. The forwarding latency of a signal
+is the time from sending it to that receipt.
+
+Usage: python -m testing.signal_flood [seconds] [signals per second] [seed]
+"""
+import os
+import random
+import shutil
+import signal
+import sys
+import threading
+import time
+from collections import namedtuple
+from subprocess import PIPE
+from subprocess import Popen
+
+from testing import child_pids
+from testing import kill_if_alive
+from testing import NORMAL_SIGNALS
+from testing import pid_tree
+from testing import process_state
+
+
+SIGNALS = sorted(NORMAL_SIGNALS)
+
+# sent and received are lists of (signum, CLOCK_MONOTONIC ns) tuples, spawned
+# is the number of processes spawned, and zombies the number of unreaped
+# children dumb-init had after the flood.
+FloodResult = namedtuple('FloodResult', ('sent', 'received', 'spawned', 'zombies'))
+
+# Each iteration orphans a `true` and counts itself.
+SPAWN_LOOP = 'while :; do (true &); echo; done > {}'
+
+
+def child(spawn_count_path):
+    """Print every signal received, with the time it was received at."""
+    signal.pthread_sigmask(signal.SIG_BLOCK, SIGNALS)
+    if spawn_count_path:
+        # in a new session, so that signals forwarded to the group miss it
+        Popen(('sh', '-c', SPAWN_LOOP.format(spawn_count_path)), start_new_session=True)
+
+    out = sys.stdout.buffer
+    out.write(b'ready\n')
+    out.flush()
+    while True:
+        info = signal.sigwaitinfo(SIGNALS)
+        out.write(b'%d %d\n' % (info.si_signo, time.monotonic_ns()))
+        out.flush()
+
+
+def can_use_pid_namespace():
+    return os.geteuid() == 0 and shutil.which('unshare') is not None
+
+
+def flood(tmpdir, args=(), seconds=2.0, rate=5000, seed=None, pid_namespace=False):
+    """Flood dumb-init (started with args) with signals and return a FloodResult."""
+    rng = random.Random(seed)
+    spawn_count_path = os.path.join(str(tmpdir), 'spawned')
+    prefix = ('unshare', '--pid', '--fork', '--kill-child') if pid_namespace else ()
+    proc = Popen(
+        prefix + ('dumb-init',) + tuple(args) + (
+            sys.executable, '-m', 'testing.signal_flood', 'child', spawn_count_path,
+        ),
+        stdout=PIPE,
+    )
+    sent = []
+    output = []
+    # keep reading, so the child never blocks on a full pipe
+    reader = threading.Thread(target=lambda: output.extend(proc.stdout))
+    try:
+        assert proc.stdout.readline() == b'ready\n'
+        reader.start()
+        dumb_init = child_pids(proc.pid).pop() if pid_namespace else proc.pid
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            burst = rng.randint(1, 50)
+            for _ in range(burst):
+                signum = rng.choice(SIGNALS)
+                sent.append((signum, time.monotonic_ns()))
+                os.kill(dumb_init, signum)
+            time.sleep(rng.uniform(0, 2 * burst / rate))
+
+        # let the last signals arrive
+        time.sleep(0.5)
+        zombies = 0
+        for pid in child_pids(dumb_init):
+            try:
+                zombies += process_state(pid) == 'zombie'
+            except OSError:
+                pass
+    finally:
+        for pid in pid_tree(proc.pid):
+            kill_if_alive(pid)
+        kill_if_alive(proc.pid)
+        proc.wait()
+        if reader.is_alive():
+            reader.join()
+
+    received = [tuple(int(field) for field in line.split()) for line in output]
+    try:
+        with open(spawn_count_path) as f:
+            spawned = len(f.read())
+    except OSError:
+        spawned = 0
+    return FloodResult(sent, received, spawned, zombies)
+
+
+def match(sent, received):
+    """Return the latency (in ns) of each sent signal, or None if it was lost."""
+    receipts = {}
+    for signum, ns in received:
+        receipts.setdefault(signum, []).append(ns)
+
+    latencies = []
+    position = dict.fromkeys(receipts, 0)
+    # signals are sent in order, so walk each signal's receipts alongside
+    for signum, ns in sent:
+        times = receipts.get(signum, ())
+        i = position.get(signum, 0)
+        while i < len(times) and times[i] < ns:
+            i += 1
+        position[signum] = i
+        latencies.append(times[i] - ns if i < len(times) else None)
+    return latencies
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main(argv):
+    seconds = float(argv[1]) if len(argv) > 1 else 5
+    rate = int(argv[2]) if len(argv) > 2 else 5000
+    seed = int(argv[3]) if len(argv) > 3 else None
+    pid_namespace = can_use_pid_namespace()
+    tmpdir = os.path.join('/tmp', 'signal-flood-{}'.format(os.getpid()))
+    os.mkdir(tmpdir)
+
+    try:
+        for args in ((), ('--single-child',)):
+            result = flood(tmpdir, args, seconds, rate, seed, pid_namespace)
+            latencies = match(result.sent, result.received)
+            delivered = [latency / 1000 for latency in latencies if latency is not None]
+            print('dumb-init {}'.format(' '.join(args) or '(setsid mode)'))
+            print(
+                '  sent:      {:8d} signals ({} received after coalescing)'.format(
+                    len(result.sent), len(result.received),
+                ),
+            )
+            print('  lost:      {:8d}'.format(latencies.count(None)))
+            if pid_namespace:
+                print('  spawned:   {:8d} processes ({} left unreaped)'.format(result.spawned, result.zombies))
+            else:
+                print(
+                    '  spawned:   {:8d} processes (not reaped by dumb-init: needs root and unshare)'.format(
+                        result.spawned,
+                    ),
+                )
+            for p in (50, 90, 99, 99.9, 100):
+                print('  p{:<5}     {:8.0f} us'.format(p, percentile(delivered, p)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['child']:
+        child(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        exit(main(sys.argv))
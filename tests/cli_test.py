@@ -79,6 +79,86 @@ def test_help_message(flag, current_version):
         b'   -r, --rewrite s:r    Rewrite received signal s to new signal r before proxying.\n'
         b'                        To ignore (not proxy) a signal, rewrite it to 0.\n'
         b'                        This option can be specified multiple times.\n'
+        b'   --route s:target     Deliver signal s to the direct child only (child),\n'
+        b'                        its process group (group) or all of its\n'
+        b'                        descendants (tree). This option can be specified\n'
+        b'                        multiple times.\n'
+        b'   --close-fds          Close all inherited file descriptors other than\n'
+        b'                        stdin, stdout and stderr before starting the child.\n'
+        b'   --keep-fd fd         Leave fd open when using --close-fds.\n'
+        b'                        This option can be specified multiple times.\n'
+        b'   --rlimit name=soft[:hard]\n'
+        b'                        Set a resource limit for the child, where name is\n'
+        b'                        one of as, core, cpu, data, fsize, memlock, nofile,\n'
+        b'                        nproc or stack. Limits may be "unlimited".\n'
+        b'                        This option can be specified multiple times.\n'
+        b'   --cgroup dir         Use this cgroup v2 directory instead of the one\n'
+        b'                        dumb-init runs in.\n'
+        b'   --memory-pressure-signal s\n'
+        b'                        Send signal s to the children when the cgroup is\n'
+        b'                        under memory pressure or hits memory.high/max.\n'
+        b'   --memory-pressure-trigger some|full:stall:window\n'
+        b'                        PSI trigger for --memory-pressure-signal, in\n'
+        b'                        milliseconds (default: some:200:2000).\n'
+        b'   --memory-pressure-interval secs\n'
+        b'                        Send the memory pressure signal at most once per\n'
+        b'                        this many seconds (default: 10).\n'
+        b'   --pre-start name[:deps][/timeout]=command\n'
+        b'                        Run command with /bin/sh before starting the main\n'
+        b'                        command, after the comma-separated hooks in deps\n'
+        b'                        have succeeded. Hooks run in parallel, and the main\n'
+        b'                        command only starts if they all succeed.\n'
+        b'                        This option can be specified multiple times.\n'
+        b'   --listen address     Listen on address and pass the socket to the child\n'
+        b'                        using LISTEN_FDS. address is tcp:[host:]port or\n'
+        b'                        unix:path. This option can be specified multiple times.\n'
+        b'   --listen-backlog n   Listen backlog for --listen sockets.\n'
+        b'   --lazy-spawn         Wait for a connection on a --listen socket before\n'
+        b'                        starting the child.\n'
+        b'   --reload-signal s    On signal s, start a new instance of the command and\n'
+        b'                        stop the current one once the new one is ready.\n'
+        b'   --reload-ready-file path\n'
+        b'                        File created by a new instance once it is ready.\n'
+        b'   --reload-stop-signal s\n'
+        b'                        Signal used to stop the old instance (default: 15).\n'
+        b'   --reload-timeout secs\n'
+        b"                        Give up on a new instance which isn't ready after\n"
+        b'                        this many seconds (default: 60).\n'
+        b'   --notify-socket path Receive sd_notify messages from the child on a\n'
+        b'                        datagram socket at path (@name for an abstract one).\n'
+        b'   --ready-file path    Create path once the child sends READY=1.\n'
+        b'   --ready-command cmd  Run cmd with /bin/sh once the child sends READY=1.\n'
+        b'   --watchdog-sec secs  Expect WATCHDOG=1 from the child at least this often.\n'
+        b'   --watchdog-signal s  Signal to forward on a watchdog timeout (default: 6).\n'
+        b'   --workers n          Run n copies of the command, replacing any that exit\n'
+        b'                        until a stop signal is received.\n'
+        b'   --workers-max n      Allow scaling up to n workers.\n'
+        b'   --scale-cpu-pressure high[:low]\n'
+        b'                        Add a worker while the cgroup CPU pressure (avg10,\n'
+        b'                        in percent) is above high, and retire one while it\n'
+        b'                        is below low (default: high / 2).\n'
+        b'   --scale-interval secs\n'
+        b'                        How often to check CPU pressure (default: 10).\n'
+        b'   --prewarm glob       Read files matching glob into the page cache before\n'
+        b'                        starting the child. This option can be specified\n'
+        b'                        multiple times.\n'
+        b'   --prewarm-budget ms  Stop prewarming after this many milliseconds.\n'
+        b'   --prewarm-jobs n     Number of files to prewarm in parallel (default: 4).\n'
+        b'   --prewarm-async      Prewarm in the background while the child starts.\n'
+        b'   --trace path         Record when descendant processes start, exec and\n'
+        b'                        exit, and write a Chrome trace (JSON) to path when\n'
+        b'                        dumb-init exits.\n'
+        b'   --log-relay          Relay the output of the child through dumb-init,\n'
+        b'                        one whole line at a time.\n'
+        b'   --log-prefix fmt     Prefix relayed lines with fmt, where %n is the\n'
+        b'                        command name, %p its PID and %s the stream.\n'
+        b'   --log-timestamps     Prefix relayed lines with the time (UTC).\n'
+        b'   --log-overflow block|drop|buffer:MB\n'
+        b'                        What to do when output is relayed faster than it\n'
+        b'                        is consumed (default: block).\n'
+        b'   --freeze-after secs  Freeze the children (with the cgroup v2 freezer)\n'
+        b'                        after this many seconds without a connection or\n'
+        b'                        signal, and thaw them when one arrives.\n'
         b'   -v, --verbose        Print debugging information to stderr.\n'
         b'   -h, --help           Print this help message and exit.\n'
         b'   -V, --version        Print the current version and exit.\n'
@@ -0,0 +1,70 @@
+import os
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+
+def open_fds_in_child(args, pass_fds):
+    proc = Popen(
+        ('dumb-init',) + args + ('sh', '-c', 'ls /proc/$$/fd'),
+        stdout=PIPE, pass_fds=pass_fds,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    return {int(fd) for fd in stdout.split()}
+
+
+@pytest.fixture
+def leaked_fds():
+    fds = [os.open(os.devnull, os.O_RDONLY) for _ in range(5)]
+    yield fds
+    for fd in fds:
+        os.close(fd)
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_inherited_fds_are_passed_by_default(leaked_fds):
+    fds = open_fds_in_child((), leaked_fds)
+    assert set(leaked_fds) <= fds
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_close_fds_closes_inherited_fds(leaked_fds):
+    fds = open_fds_in_child(('--close-fds',), leaked_fds)
+    # 3 is the directory `ls` is listing
+    assert fds <= {0, 1, 2, 3}
+    assert not (set(leaked_fds) - {3}) & fds
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_close_fds_keeps_allowlisted_fds(leaked_fds):
+    keep = leaked_fds[1], leaked_fds[3]
+    fds = open_fds_in_child(
+        ('--close-fds', '--keep-fd', str(keep[0]), '--keep-fd', str(keep[1])),
+        leaked_fds,
+    )
+    assert set(keep) <= fds
+    assert not {leaked_fds[0], leaked_fds[2], leaked_fds[4]} & fds
+
+
+@pytest.mark.parametrize(
+    'extra_args', [
+        ('--keep-fd', ''),
+        ('--keep-fd', 'herp'),
+        ('--keep-fd', '-1'),
+        ('--keep-fd', '3x'),
+    ],
+)
+def test_keep_fd_errors(extra_args):
+    proc = Popen(
+        ('dumb-init', '--close-fds') + extra_args + ('true',),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr == (
+        b'Usage: --keep-fd option takes a non-negative file descriptor number.\n'
+        b'This option can be specified up to 64 times.\n'
+        b'Use --help for full usage.\n'
+    )
@@ -0,0 +1,139 @@
+import os
+import signal
+import socket
+import sys
+import time
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import print_signals
+from testing import sleep_until
+
+
+SERVE_FOREVER = '''
+import socket
+sock = socket.socket(fileno=3)
+print("ready", flush=True)
+while True:
+    conn, _ = sock.accept()
+    conn.sendall(b"hello")
+    conn.close()
+'''
+
+
+@pytest.fixture
+def freezer_cgroup():
+    """Yield a new cgroup v2 directory supporting the freezer, or skip."""
+    for root in ('/sys/fs/cgroup', '/sys/fs/cgroup/unified'):
+        path = os.path.join(root, 'dumb-init-test-{}'.format(os.getpid()))
+        try:
+            os.mkdir(path)
+        except OSError:
+            continue
+        if os.path.exists(os.path.join(path, 'cgroup.freeze')):
+            break
+        os.rmdir(path)
+    else:
+        pytest.skip('no writable cgroup v2 with freezer support')
+
+    yield path
+
+    supervised = os.path.join(path, 'supervised')
+    if os.path.exists(supervised):
+        sleep_until(lambda: os.rmdir(supervised))
+    os.rmdir(path)
+
+
+def frozen(cgroup):
+    with open(os.path.join(cgroup, 'supervised', 'cgroup.events')) as f:
+        return 'frozen 1\n' in f.read()
+
+
+def wait_until_frozen(cgroup):
+    def is_frozen():
+        assert frozen(cgroup)
+    sleep_until(is_frozen, timeout=3)
+
+
+def test_signal_thaws_children_before_forwarding(freezer_cgroup):
+    with print_signals(('--cgroup', freezer_cgroup, '--freeze-after', '1')) as (proc, _):
+        wait_until_frozen(freezer_cgroup)
+        proc.send_signal(signal.SIGUSR1)
+        assert proc.stdout.readline() == '{}\n'.format(signal.SIGUSR1).encode('ascii')
+        assert not frozen(freezer_cgroup)
+
+        # and it is frozen again after another idle period
+        wait_until_frozen(freezer_cgroup)
+        proc.send_signal(signal.SIGUSR2)
+        assert proc.stdout.readline() == '{}\n'.format(signal.SIGUSR2).encode('ascii')
+
+
+def test_not_frozen_while_busy(freezer_cgroup):
+    with print_signals(('--cgroup', freezer_cgroup, '--freeze-after', '1')) as (proc, _):
+        for _ in range(5):
+            time.sleep(0.3)
+            proc.send_signal(signal.SIGUSR1)
+            assert proc.stdout.readline() == '{}\n'.format(signal.SIGUSR1).encode('ascii')
+            assert not frozen(freezer_cgroup)
+
+
+def test_connection_thaws_children(freezer_cgroup, tmpdir):
+    path = tmpdir.join('a.sock').strpath
+    proc = Popen(
+        (
+            'dumb-init',
+            '--cgroup', freezer_cgroup,
+            '--freeze-after', '1',
+            '--listen', 'unix:' + path,
+            sys.executable, '-c', SERVE_FOREVER,
+        ),
+        stdout=PIPE,
+    )
+    try:
+        assert proc.stdout.readline() == b'ready\n'
+        wait_until_frozen(freezer_cgroup)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(path)
+        assert sock.recv(5) == b'hello'
+        assert not frozen(freezer_cgroup)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+    assert proc.returncode == 128 + signal.SIGTERM
+
+
+def test_frozen_child_is_still_reaped(freezer_cgroup):
+    with print_signals(('--cgroup', freezer_cgroup, '--freeze-after', '1')) as (proc, pid):
+        wait_until_frozen(freezer_cgroup)
+        # SIGKILL is delivered even to frozen processes
+        os.kill(int(pid), signal.SIGKILL)
+        assert proc.wait(timeout=5) == 128 + signal.SIGKILL
+    # the cgroup is thawed and removed once it is empty
+    assert not os.path.exists(os.path.join(freezer_cgroup, 'supervised'))
+
+
+def test_missing_cgroup_is_fatal():
+    proc = Popen(
+        ('dumb-init', '--cgroup', '/doesnotexist', '--freeze-after', '1', 'true'),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(
+        b'[dumb-init] Unable to set up the cgroup freezer in /doesnotexist/supervised '
+        b'(errno=2 No such file or directory). Exiting.\n',
+    )
+
+
+@pytest.mark.parametrize('value', ['0', '-1', '1.5', 'herp'])
+def test_freeze_after_errors(value):
+    proc = Popen(('dumb-init', '--freeze-after', value, 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr == (
+        b'Usage: --freeze-after takes a positive number of seconds.\n'
+        b'Use --help for full usage.\n'
+    )
@@ -0,0 +1,142 @@
+import os
+import signal
+import socket
+import sys
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import child_pids
+from testing import sleep_until
+
+
+SERVE_ONE = '''
+import os, socket
+n = int(os.environ["LISTEN_FDS"])
+assert int(os.environ["LISTEN_PID"]) == os.getpid()
+print("fds", n, flush=True)
+conn, _ = socket.socket(fileno=3).accept()
+conn.sendall(b"hello")
+'''
+
+
+def wait_for_socket(path):
+    def socket_exists():
+        assert os.path.exists(path)
+    sleep_until(socket_exists)
+
+
+def connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    return sock
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_listen_passes_sockets(tmpdir):
+    proc = Popen(
+        (
+            'dumb-init',
+            '--listen', 'unix:' + tmpdir.join('a.sock').strpath,
+            '--listen', 'tcp:127.0.0.1:0',
+            sys.executable, '-c',
+            'import os, socket; '
+            'print(os.environ["LISTEN_FDS"], os.environ["LISTEN_PID"] == str(os.getpid()), '
+            'socket.socket(fileno=3).family.name, socket.socket(fileno=4).family.name)',
+        ),
+        stdout=PIPE,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == b'2 True AF_UNIX AF_INET\n'
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_listen_sockets_survive_close_fds(tmpdir):
+    proc = Popen(
+        (
+            'dumb-init', '--close-fds',
+            '--listen', 'unix:' + tmpdir.join('a.sock').strpath,
+            'sh', '-c', 'echo $LISTEN_FDS; ls /proc/$$/fd',
+        ),
+        stdout=PIPE,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    lines = stdout.split()
+    assert lines[0] == b'1'
+    assert b'3' in lines[1:]
+
+
+def test_connections_queue_before_child_accepts(tmpdir):
+    path = tmpdir.join('a.sock').strpath
+    proc = Popen(
+        (
+            'dumb-init', '--listen', 'unix:' + path,
+            'sh', '-c', 'sleep 0.5; exec {} -c \'{}\''.format(sys.executable, SERVE_ONE),
+        ),
+        stdout=PIPE,
+    )
+    wait_for_socket(path)
+    # the child is still sleeping, but the connection is accepted by the kernel
+    sock = connect(path)
+    assert sock.recv(5) == b'hello'
+    proc.communicate()
+    assert proc.returncode == 0
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_lazy_spawn_waits_for_connection(tmpdir):
+    path = tmpdir.join('a.sock').strpath
+    proc = Popen(
+        (
+            'dumb-init', '--lazy-spawn', '--listen', 'unix:' + path,
+            sys.executable, '-c', SERVE_ONE,
+        ),
+        stdout=PIPE,
+    )
+    wait_for_socket(path)
+    assert child_pids(proc.pid) == set()
+    sock = connect(path)
+    assert proc.stdout.readline() == b'fds 1\n'
+    assert sock.recv(5) == b'hello'
+    proc.communicate()
+    assert proc.returncode == 0
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_lazy_spawn_exits_on_sigterm(tmpdir):
+    path = tmpdir.join('a.sock').strpath
+    proc = Popen(
+        ('dumb-init', '--lazy-spawn', '--listen', 'unix:' + path, 'true'),
+    )
+    wait_for_socket(path)
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait() == 128 + signal.SIGTERM
+
+
+@pytest.mark.parametrize(
+    'address', [
+        'herp',
+        'tcp:',
+        'tcp:herp',
+        'tcp:127.0.0.1:65536',
+        'tcp:localhost:80',
+        'unix:',
+    ],
+)
+def test_listen_errors(address):
+    proc = Popen(('dumb-init', '--listen', address, 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(
+        '[dumb-init] Unable to listen on {}'.format(address).encode('ascii'),
+    )
+
+
+def test_lazy_spawn_requires_listen():
+    proc = Popen(('dumb-init', '--lazy-spawn', 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --lazy-spawn requires at least one --listen socket.\n')
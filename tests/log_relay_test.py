@@ -0,0 +1,133 @@
+import re
+import signal
+import socket
+import time
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import child_pids
+from testing import kill_if_alive
+from testing import pid_tree
+from testing import sleep_until
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_prefix_and_timestamps():
+    proc = Popen(
+        (
+            'dumb-init', '--log-prefix', '[%n %p %s %%] ', '--log-timestamps',
+            'sh', '-c', 'echo out; echo err >&2; printf partial; exit 3',
+        ),
+        stdout=PIPE, stderr=PIPE,
+    )
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 3
+
+    stamp = b'[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}\\.[0-9]{3}Z '
+    m = re.match(stamp + b'\\[sh ([0-9]+) stdout %\\] out\n' + stamp + b'\\[sh \\1 stdout %\\] partial\n$', stdout)
+    assert m, stdout
+    assert re.match(stamp + b'\\[sh ' + m.group(1) + b' stderr %\\] err\n$', stderr), stderr
+
+
+def test_lines_stay_whole():
+    # lines longer than PIPE_BUF from several children would interleave
+    proc = Popen(
+        (
+            'dumb-init', '--workers', '4', '--log-relay',
+            'sh', '-c', 'for i in $(seq 20); do printf "%010000d\\n" $$; done; exec sleep 10',
+        ),
+        stdout=PIPE,
+    )
+    lines = [proc.stdout.readline() for _ in range(80)]
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait() == 128 + signal.SIGTERM
+
+    assert all(len(line) == 10001 and line.endswith(b'\n') for line in lines)
+    # each line is zero-padded PID of one of the workers
+    pids = {line.lstrip(b'0') for line in lines}
+    assert len(pids) == 4
+    assert all(lines.count(b'0' * (10001 - len(pid)) + pid) == 20 for pid in pids)
+
+
+@pytest.mark.parametrize(
+    'policy, complete', [
+        ('block', True),
+        ('buffer:1', True),
+        ('drop', False),
+    ],
+)
+def test_overflow_policy(policy, complete):
+    proc = Popen(
+        (
+            'dumb-init', '--log-overflow', policy, '--log-relay',
+            'sh', '-c', 'yes | head -n 1000000',
+        ),
+        stdout=PIPE,
+    )
+    # let the output back up
+    time.sleep(0.5)
+    lines = proc.stdout.read().splitlines()
+    assert proc.wait() == 0
+    if complete:
+        assert lines == [b'y'] * 1000000
+    else:
+        assert 0 < lines.count(b'y') < 1000000
+        assert lines[-1] == b'[dumb-init] Dropped %d lines.' % (1000000 - lines.count(b'y'))
+
+
+def test_signals_are_forwarded_while_output_is_blocked():
+    proc = Popen(
+        (
+            'dumb-init', '--log-relay',
+            'sh', '-c', 'trap "echo stopped; exit 0" TERM; while :; do echo running; done',
+        ),
+        stdout=PIPE,
+    )
+    # nothing is read, so the output backs up and the child blocks
+    time.sleep(0.2)
+    proc.send_signal(signal.SIGTERM)
+    time.sleep(0.2)
+    lines = proc.stdout.read().splitlines()
+    assert proc.wait() == 0
+    assert set(lines) == {b'running', b'stopped'}
+    assert lines[-1] == b'stopped'
+
+
+def test_signals_are_forwarded_while_socket_output_is_blocked():
+    ours, theirs = socket.socketpair()
+    proc = Popen(
+        (
+            'dumb-init', '--log-relay',
+            'sh', '-c', 'while :; do echo running; done',
+        ),
+        stdout=theirs,
+    )
+    theirs.close()
+    try:
+        # nothing is read, so the output backs up and the child blocks
+        time.sleep(0.5)
+        proc.send_signal(signal.SIGTERM)
+
+        def child_exited():
+            assert child_pids(proc.pid) == set()
+        sleep_until(child_exited)
+
+        lines = ours.makefile('rb').read().splitlines()
+        assert proc.wait() == 128 + signal.SIGTERM
+        assert set(lines) == {b'running'}
+    finally:
+        for pid in pid_tree(proc.pid):
+            kill_if_alive(pid)
+        kill_if_alive(proc.pid)
+        proc.wait()
+        ours.close()
+
+
+@pytest.mark.parametrize('arg', ['', 'wait', 'buffer', 'buffer:', 'buffer:0', 'buffer:1025', 'buffer:1x'])
+def test_log_overflow_errors(arg):
+    proc = Popen(('dumb-init', '--log-overflow', arg, 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --log-overflow takes block, drop or buffer:<MB>')
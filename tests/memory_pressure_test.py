@@ -0,0 +1,245 @@
+import os
+import signal
+import sys
+import threading
+from contextlib import contextmanager
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import kill_if_alive
+from testing import pid_tree
+from testing import sleep_until
+
+
+def psi_cgroup_dir():
+    """Return a cgroup v2 directory supporting PSI triggers, or skip."""
+    for path in ('/sys/fs/cgroup', '/sys/fs/cgroup/unified'):
+        try:
+            fd = os.open(os.path.join(path, 'memory.pressure'), os.O_RDWR | os.O_NONBLOCK)
+        except OSError:
+            continue
+        try:
+            os.write(fd, b'some 200000 2000000\0')
+        except OSError:
+            continue
+        finally:
+            os.close(fd)
+        return path
+    pytest.skip('no cgroup v2 memory.pressure with trigger support')
+
+
+def new_cgroup(name, required_file):
+    """Create a cgroup v2 directory containing required_file, or skip."""
+    for root in ('/sys/fs/cgroup', '/sys/fs/cgroup/unified'):
+        path = os.path.join(root, '{}-{}'.format(name, os.getpid()))
+        try:
+            os.mkdir(path)
+        except OSError:
+            continue
+        if os.path.exists(os.path.join(path, required_file)):
+            return path
+        os.rmdir(path)
+    pytest.skip('no writable cgroup v2 with {}'.format(required_file))
+
+
+class CPUContention:
+    """Busy loops sharing one CPU in a cgroup, which stalls them half the time."""
+
+    def __init__(self, cgroup):
+        self.cgroup = cgroup
+        self.procs = []
+
+    def start(self):
+        cpu = min(os.sched_getaffinity(0))
+        for _ in range(2):
+            proc = Popen((sys.executable, '-c', 'while True: pass'))
+            os.sched_setaffinity(proc.pid, {cpu})
+            with open(os.path.join(self.cgroup, 'cgroup.procs'), 'w') as f:
+                f.write(str(proc.pid))
+            self.procs.append(proc)
+
+    def stop(self):
+        for proc in self.procs:
+            kill_if_alive(proc.pid)
+            proc.wait()
+        self.procs = []
+
+
+@pytest.fixture
+def cpu_contention(tmpdir):
+    """Yield a CPUContention, and a cgroup directory for --cgroup whose
+    memory.pressure is really the CPU pressure of the contended cgroup.
+
+    Memory pressure can't be created reliably, but both pressure files work
+    the same way, so this drives the monitor with CPU pressure instead.
+    """
+    cgroup = new_cgroup('dumb-init-test', 'cpu.pressure')
+    contention = CPUContention(cgroup)
+    fake = tmpdir.mkdir('cgroup')
+    fake.join('memory.pressure').mksymlinkto(os.path.join(cgroup, 'cpu.pressure'))
+    try:
+        yield contention, fake.strpath
+    finally:
+        contention.stop()
+        os.rmdir(cgroup)
+
+
+@contextmanager
+def monitor(cgroup, trigger, interval):
+    """Start dumb-init -v monitoring cgroup, and yield it and its stderr lines."""
+    proc = Popen(
+        (
+            'dumb-init', '-v',
+            '--cgroup', cgroup,
+            '--memory-pressure-signal', str(signal.SIGUSR1),
+            '--memory-pressure-trigger', trigger,
+            '--memory-pressure-interval', str(interval),
+            sys.executable, '-m', 'testing.print_signals',
+        ),
+        stdout=PIPE, stderr=PIPE,
+    )
+    assert proc.stdout.readline().startswith(b'ready')
+    stderr = []
+    threading.Thread(target=lambda: stderr.extend(proc.stderr), daemon=True).start()
+    try:
+        yield proc, stderr
+    finally:
+        # print_signals does not exit on the forwarded SIGTERM
+        for pid in pid_tree(proc.pid):
+            os.kill(pid, signal.SIGKILL)
+        proc.wait()
+
+
+def wait_for_message(stderr, message, timeout=10):
+    """Return the index of the first line containing message."""
+    def assert_logged():
+        assert any(message in line for line in stderr)
+    # PSI triggers can fire as rarely as every few seconds
+    sleep_until(assert_logged, timeout=timeout)
+    return next(i for i, line in enumerate(stderr) if message in line)
+
+
+def test_signal_is_rate_limited_and_rearmed(cpu_contention):
+    contention, cgroup = cpu_contention
+    # cleared below 25% avg10, which the contention takes several seconds to reach
+    with monitor(cgroup, 'some:1000:2000', 5) as (proc, stderr):
+        contention.start()
+        sent = wait_for_message(stderr, b'sending signal 10 to children')
+        assert proc.stdout.readline() == b'10\n'
+        rearmed = wait_for_message(stderr, b'Memory pressure cleared')
+        limited = wait_for_message(stderr, b'but signal 10 was sent recently')
+        assert sent < rearmed < limited
+
+
+@pytest.mark.parametrize(
+    'extra_args, received', [
+        ((), signal.SIGUSR1),
+        # the signal is forwarded like any other, so --rewrite applies
+        (('--rewrite', '{:d}:{:d}'.format(signal.SIGUSR1, signal.SIGUSR2)), signal.SIGUSR2),
+    ],
+)
+def test_memory_events_send_signal(tmpdir, extra_args, received):
+    cgroup = new_cgroup('dumb-init-test', 'memory.events')
+    try:
+        with open(os.path.join(cgroup, 'memory.high'), 'w') as f:
+            f.write(str(16 << 20))
+        big_file = tmpdir.join('big').strpath
+        proc = Popen(
+            (
+                'sh', '-c', 'echo $$ > {}/cgroup.procs && exec "$@"'.format(cgroup), 'sh',
+                'dumb-init', '-v',
+                '--cgroup', cgroup,
+                '--memory-pressure-signal', str(signal.SIGUSR1),
+                # unlikely to fire, so that the signal comes from memory.events
+                '--memory-pressure-trigger', 'some:9000:10000',
+            ) + extra_args + (
+                sys.executable, '-c',
+                'import signal, time\n'
+                'signal.signal({:d}, lambda *_: (print("pressure", flush=True), exit(0)))\n'
+                'with open({!r}, "wb") as f:\n'
+                '    for _ in range(64):\n'
+                '        f.write(bytes(1 << 20))\n'
+                'time.sleep(5)\n'.format(received, big_file),
+            ),
+            stdout=PIPE, stderr=PIPE,
+        )
+        stdout, stderr = proc.communicate()
+        assert stdout == b'pressure\n'
+        assert b'[dumb-init] Memory pressure (memory.events), sending signal 10 to children.\n' in stderr
+    finally:
+        os.rmdir(cgroup)
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_memory_pressure_monitor_starts():
+    proc = Popen(
+        (
+            'dumb-init', '-v',
+            '--cgroup', psi_cgroup_dir(),
+            '--memory-pressure-signal', '12',
+            'echo', 'oh,', 'hi',
+        ),
+        stdout=PIPE, stderr=PIPE,
+    )
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == b'oh, hi\n'
+    assert b'[dumb-init] Monitoring memory pressure (trigger "some 200000 2000000").\n' in stderr
+
+
+def test_memory_pressure_custom_trigger():
+    proc = Popen(
+        (
+            'dumb-init', '-v',
+            '--cgroup', psi_cgroup_dir(),
+            '--memory-pressure-signal', '12',
+            '--memory-pressure-trigger', 'full:500:4000',
+            'true',
+        ),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert b'(trigger "full 500000 4000000")' in stderr
+
+
+def test_memory_pressure_missing_cgroup_is_fatal():
+    proc = Popen(
+        (
+            'dumb-init',
+            '--cgroup', '/doesnotexist',
+            '--memory-pressure-signal', '12',
+            'sleep', '10',
+        ),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(
+        b'[dumb-init] Unable to open /doesnotexist/memory.pressure '
+        b'(errno=2 No such file or directory). Exiting.\n',
+    )
+
+
+@pytest.mark.parametrize(
+    'extra_args', [
+        ('--memory-pressure-signal', '0'),
+        ('--memory-pressure-signal', '32'),
+        ('--memory-pressure-signal', 'USR2'),
+        ('--memory-pressure-trigger', 'some'),
+        ('--memory-pressure-trigger', 'most:100:1000'),
+        ('--memory-pressure-trigger', 'some:1000:100'),
+        ('--memory-pressure-trigger', 'some:100:499'),
+        ('--memory-pressure-trigger', 'some:100:10001'),
+        ('--memory-pressure-trigger', 'some:100:1000:10'),
+        ('--memory-pressure-interval', '-1'),
+        ('--memory-pressure-interval', 'soon'),
+    ],
+)
+def test_memory_pressure_errors(extra_args):
+    proc = Popen(('dumb-init',) + extra_args + ('true',), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --memory-pressure-signal takes <signum>')
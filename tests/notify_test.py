@@ -0,0 +1,180 @@
+import signal
+import sys
+import time
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import sleep_until
+
+
+NOTIFY = '''
+import os, socket, sys, time
+addr = os.environ["NOTIFY_SOCKET"]
+if addr.startswith("@"):
+    addr = "\\0" + addr[1:]
+sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+def notify(message):
+    sock.sendto(message.encode(), addr)
+'''
+
+
+def notify_child(script):
+    return (sys.executable, '-c', NOTIFY + script)
+
+
+@pytest.fixture
+def notify_socket(tmpdir):
+    return tmpdir.join('notify.sock').strpath
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_ready_file_created_on_ready(tmpdir, notify_socket):
+    ready = tmpdir.join('ready')
+    ready.write('stale')
+    proc = Popen(
+        ('dumb-init', '--notify-socket', notify_socket, '--ready-file', ready.strpath) +
+        notify_child(
+            'print(os.path.exists({!r}), flush=True)\n'
+            'notify("STATUS=starting\\nREADY=1")\n'
+            'time.sleep(10)\n'.format(ready.strpath),
+        ),
+        stdout=PIPE,
+    )
+    # the ready file from a previous run is removed before starting the child
+    assert proc.stdout.readline() == b'False\n'
+
+    def assert_ready():
+        assert ready.check()
+    sleep_until(assert_ready)
+    proc.send_signal(signal.SIGTERM)
+    proc.wait()
+
+
+def test_relative_ready_file(tmpdir, notify_socket):
+    proc = Popen(
+        ('dumb-init', '--notify-socket', notify_socket, '--ready-file', 'ready') +
+        notify_child('notify("READY=1"); time.sleep(10)'),
+        cwd=tmpdir.strpath,
+    )
+
+    # created in the directory dumb-init was started in, not in /
+    def assert_ready():
+        assert tmpdir.join('ready').check()
+    sleep_until(assert_ready)
+    proc.send_signal(signal.SIGTERM)
+    proc.wait()
+
+
+def test_ready_command_runs_on_ready(tmpdir, notify_socket):
+    proc = Popen(
+        ('dumb-init', '--notify-socket', '@' + notify_socket, '--ready-command', 'echo is ready; pwd -P') +
+        notify_child('notify("READY=1"); time.sleep(0.5)'),
+        stdout=PIPE, cwd=tmpdir.strpath,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    # run in the directory dumb-init was started in, not in /
+    assert stdout == b'is ready\n' + tmpdir.realpath().strpath.encode() + b'\n'
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_watchdog_environment(notify_socket):
+    proc = Popen(
+        ('dumb-init', '--notify-socket', notify_socket, '--watchdog-sec', '5') +
+        notify_child(
+            'print(os.environ["WATCHDOG_USEC"], os.environ["WATCHDOG_PID"] == str(os.getpid()))',
+        ),
+        stdout=PIPE,
+    )
+    stdout, _ = proc.communicate()
+    assert stdout == b'5000000 True\n'
+
+
+def test_watchdog_timeout_sends_signal(notify_socket):
+    start = time.monotonic()
+    proc = Popen(
+        ('dumb-init', '--notify-socket', notify_socket, '--watchdog-sec', '1') +
+        notify_child('notify("READY=1"); time.sleep(10)'),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 128 + signal.SIGABRT
+    assert b'[dumb-init] Watchdog timeout, no ping received for 1000 ms.\n' in stderr
+    assert time.monotonic() - start < 5
+
+
+def test_watchdog_pings_keep_child_alive(notify_socket):
+    proc = Popen(
+        (
+            'dumb-init', '--notify-socket', notify_socket,
+            '--watchdog-sec', '1', '--watchdog-signal', str(signal.SIGUSR1),
+        ) +
+        notify_child(
+            'import signal\n'
+            'signal.signal(signal.SIGUSR1, lambda *_: print("watchdog", flush=True))\n'
+            'for _ in range(5):\n'
+            '    notify("WATCHDOG=1")\n'
+            '    time.sleep(0.25)\n'
+            'print("done", flush=True)\n'
+            'time.sleep(1.2)\n',
+        ),
+        stdout=PIPE,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == b'done\nwatchdog\n'
+
+
+def test_reload_waits_for_ready_notification(tmpdir, notify_socket):
+    proc = Popen(
+        (
+            'dumb-init', '--notify-socket', notify_socket,
+            '--reload-signal', str(signal.SIGHUP),
+        ) +
+        notify_child(
+            'import signal\n'
+            'signal.signal(signal.SIGTERM, lambda *_: (print("stop", os.getpid(), flush=True), sys.exit(0)))\n'
+            'print("start", os.getpid(), flush=True)\n'
+            'time.sleep(0.5)\n'
+            'notify("READY=1")\n'
+            'while True: time.sleep(1)\n',
+        ),
+        stdout=PIPE,
+    )
+    event, first = proc.stdout.readline().split()
+    assert event == b'start'
+    proc.send_signal(signal.SIGHUP)
+    event, second = proc.stdout.readline().split()
+    assert event == b'start'
+    assert proc.stdout.readline().split() == [b'stop', first]
+    proc.send_signal(signal.SIGTERM)
+    assert proc.stdout.readline().split() == [b'stop', second]
+    assert proc.wait() == 0
+
+
+@pytest.mark.parametrize(
+    'args', [
+        ('--ready-file', 'ready'),
+        ('--ready-command', 'true'),
+        ('--watchdog-sec', '1'),
+        ('--notify-socket', '@x', '--watchdog-sec', '0'),
+        ('--notify-socket', '@x', '--watchdog-signal', '32'),
+    ],
+)
+def test_notify_errors(args):
+    proc = Popen(('dumb-init',) + args + ('true',), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --watchdog-sec takes a positive number of seconds')
+
+
+def test_notify_socket_bind_error():
+    proc = Popen(('dumb-init', '--notify-socket', '/doesnotexist/notify', 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr == (
+        b'[dumb-init] Unable to bind notify socket /doesnotexist/notify '
+        b'(errno=2 No such file or directory). Exiting.\n'
+    )
@@ -0,0 +1,134 @@
+import re
+import signal
+import time
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+
+def run(args):
+    proc = Popen(('dumb-init',) + args, stdout=PIPE, stderr=PIPE)
+    stdout, stderr = proc.communicate()
+    return proc.returncode, stdout, stderr
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_hooks_run_before_main_command():
+    returncode, stdout, stderr = run((
+        '--pre-start', 'a=echo a',
+        '--pre-start', 'b:a=echo b',
+        'echo', 'main',
+    ))
+    assert returncode == 0
+    assert stdout == b'a\nb\nmain\n'
+    assert re.search(
+        b'\\[dumb-init\\] Pre-start hook "a" exited with status 0 after [0-9]+ ms '
+        b'\\(started at \\+[0-9]+ ms\\)\\.\n',
+        stderr,
+    ), stderr
+    assert re.search(b'\\[dumb-init\\] Pre-start hooks finished in [0-9]+ ms\\.\n', stderr)
+
+
+def test_hooks_run_in_parallel():
+    start = time.monotonic()
+    returncode, stdout, _ = run((
+        '--pre-start', 'a=sleep 0.5; echo a',
+        '--pre-start', 'b=sleep 0.5; echo b',
+        '--pre-start', 'c=sleep 0.5; echo c',
+        'echo', 'main',
+    ))
+    assert returncode == 0
+    assert sorted(stdout.split()) == [b'a', b'b', b'c', b'main']
+    assert stdout.endswith(b'main\n')
+    assert time.monotonic() - start < 1.2
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_hooks_wait_for_dependencies():
+    returncode, stdout, _ = run((
+        '--pre-start', 'slow=sleep 0.3; echo slow',
+        '--pre-start', 'fast=echo fast',
+        '--pre-start', 'last:slow,fast=echo last',
+        'echo', 'main',
+    ))
+    assert returncode == 0
+    assert stdout == b'fast\nslow\nlast\nmain\n'
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_failed_hook_prevents_main_command():
+    returncode, stdout, stderr = run((
+        '--pre-start', 'a=exit 3',
+        '--pre-start', 'b:a=echo b',
+        'echo', 'main',
+    ))
+    assert returncode == 3
+    assert stdout == b''
+    assert b'[dumb-init] Pre-start hook "a" exited with status 3' in stderr
+
+
+def test_hook_timeout():
+    start = time.monotonic()
+    returncode, stdout, stderr = run((
+        '--pre-start', 'a/1=exec sleep 10',
+        'echo', 'main',
+    ))
+    assert returncode == 1
+    assert stdout == b''
+    assert b'[dumb-init] Pre-start hook "a" timed out after 1000 ms.\n' in stderr
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_signals_are_forwarded_to_hooks():
+    proc = Popen(
+        ('dumb-init', '--pre-start', 'a=echo ready; exec sleep 10', 'echo', 'main'),
+        stdout=PIPE, stderr=PIPE,
+    )
+    assert proc.stdout.readline() == b'ready\n'
+    proc.send_signal(signal.SIGTERM)
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 128 + signal.SIGTERM
+    assert stdout == b''
+
+
+@pytest.mark.parametrize(
+    'args, message', [
+        (
+            ('--pre-start', 'a:b=true', '--pre-start', 'b:a=true'),
+            b'[dumb-init] Pre-start hooks have a dependency cycle. Exiting.\n',
+        ),
+        (
+            ('--pre-start', 'a:b=true'),
+            b'[dumb-init] Pre-start hook "a" depends on unknown hook "b". Exiting.\n',
+        ),
+    ],
+)
+def test_dependency_errors(args, message):
+    returncode, stdout, stderr = run(args + ('echo', 'main'))
+    assert returncode == 1
+    assert stdout == b''
+    assert stderr == message
+
+
+@pytest.mark.parametrize(
+    'arg', [
+        '',
+        'a',
+        '=true',
+        'a=',
+        'a/0=true',
+        'a/soon=true',
+    ],
+)
+def test_pre_start_errors(arg):
+    returncode, _, stderr = run(('--pre-start', arg, 'true'))
+    assert returncode == 1
+    assert stderr.startswith(b'Usage: --pre-start option takes')
+
+
+def test_duplicate_hook_names():
+    returncode, _, stderr = run(('--pre-start', 'a=true', '--pre-start', 'a=true', 'true'))
+    assert returncode == 1
+    assert stderr.startswith(b'Usage: --pre-start option takes')
@@ -0,0 +1,109 @@
+import os
+import re
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+
+@pytest.fixture
+def files(tmpdir):
+    for name, size in (('a.jar', 1024 * 1024), ('b.jar', 10 * 1024 * 1024), ('c.txt', 100)):
+        tmpdir.join(name).write(b'x' * size, mode='wb')
+    tmpdir.mkdir('lib.jar')
+    return tmpdir
+
+
+def prewarm_report(stderr):
+    m = re.search(
+        b'\\[dumb-init\\] Prewarmed ([0-9]+) bytes in ([0-9]+) files '
+        b'\\(([0-9]+) bytes not cached before\\) in [0-9]+ ms(.*)\\.\n',
+        stderr,
+    )
+    assert m, stderr
+    return int(m.group(1)), int(m.group(2)), m.group(4)
+
+
+def bytes_not_cached(stderr):
+    return int(re.search(b'\\(([0-9]+) bytes not cached before\\)', stderr).group(1))
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_prewarm_reports_bytes_and_files(files):
+    proc = Popen(
+        (
+            'dumb-init',
+            '--prewarm', files.join('*.jar').strpath,
+            '--prewarm', files.join('*.nothing').strpath,
+            'echo', 'oh,', 'hi',
+        ),
+        stdout=PIPE, stderr=PIPE,
+    )
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == b'oh, hi\n'
+    # directories are skipped
+    assert prewarm_report(stderr) == (11 * 1024 * 1024, 2, b'')
+
+
+@pytest.mark.parametrize('jobs', ['1', '3'])
+def test_prewarm_jobs(files, jobs):
+    proc = Popen(
+        ('dumb-init', '--prewarm-jobs', jobs, '--prewarm', files.join('*').strpath, 'true'),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert prewarm_report(stderr) == (11 * 1024 * 1024 + 100, 3, b'')
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_prewarm_async(files):
+    proc = Popen(
+        (
+            'dumb-init', '--prewarm-async', '--prewarm', files.join('*.jar').strpath,
+            # give the helper time to report before the child exits
+            'sleep', '0.3',
+        ),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert prewarm_report(stderr) == (11 * 1024 * 1024, 2, b'')
+
+
+def test_prewarm_reports_bytes_not_cached_before(files):
+    for path in files.listdir('*.jar'):
+        if path.isfile():
+            with path.open('rb') as f:
+                # written pages have to be on disk before they can be dropped
+                os.fsync(f.fileno())
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+    def prewarm():
+        proc = Popen(('dumb-init', '--prewarm', files.join('*.jar').strpath, 'true'), stderr=PIPE)
+        _, stderr = proc.communicate()
+        assert proc.returncode == 0
+        assert prewarm_report(stderr) == (11 * 1024 * 1024, 2, b'')
+        return bytes_not_cached(stderr)
+
+    read = prewarm()
+    if read == 0:
+        pytest.skip('the page cache of {} can not be dropped'.format(files))
+    assert read == 11 * 1024 * 1024
+    assert prewarm() == 0
+
+
+@pytest.mark.parametrize(
+    'args', [
+        ('--prewarm-budget', '0'),
+        ('--prewarm-budget', 'soon'),
+        ('--prewarm-jobs', '0'),
+        ('--prewarm-jobs', '65'),
+    ],
+)
+def test_prewarm_errors(args):
+    proc = Popen(('dumb-init',) + args + ('true',), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --prewarm option can be specified up to 64 times,\n')
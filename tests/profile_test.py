@@ -0,0 +1,66 @@
+import re
+import shutil
+import signal
+import sys
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+
+pytestmark = pytest.mark.skipif(
+    shutil.which('dumb-init-profile') is None,
+    reason='needs the profiling build (make build-profile) on the PATH',
+)
+
+
+def profile(stderr):
+    return dict(re.findall(b'^\\[dumb-init\\] profile: ([a-z_]+) (.*)$', stderr, re.MULTILINE))
+
+
+def forwarded_signal_syscalls(args=()):
+    """Forward some signals and return the most system calls one of them took."""
+    proc = Popen(
+        ('dumb-init-profile',) + tuple(args) + (sys.executable, '-m', 'testing.print_signals'),
+        stdout=PIPE, stderr=PIPE,
+    )
+    assert proc.stdout.readline().startswith(b'ready')
+    for signum in (signal.SIGUSR1, signal.SIGHUP, signal.SIGWINCH) * 10:
+        proc.send_signal(signum)
+        assert proc.stdout.readline() == b'%d\n' % signum
+    # print_signals exits on the second SIGINT
+    for _ in range(2):
+        proc.send_signal(signal.SIGINT)
+        assert proc.stdout.readline() == b'%d\n' % signal.SIGINT
+    _, stderr = proc.communicate()
+    assert proc.returncode == 0
+
+    stats = profile(stderr)
+    assert stats[b'forwarded_signals'] == b'32'
+    if stats[b'forwarded_signals_syscalls'] == b'unavailable':
+        pytest.skip('system calls can only be counted when ptrace is allowed')
+    return float(re.match(b'[0-9.]+ avg ([0-9.]+) max$', stats[b'forwarded_signals_syscalls']).group(1))
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_forwarding_a_signal_takes_three_syscalls():
+    # poll, reading the signalfd, and kill
+    assert forwarded_signal_syscalls() <= 3
+
+
+def test_all_syscalls_are_counted():
+    # routing to the tree reads /proc, which takes many more system calls
+    assert forwarded_signal_syscalls(('--route', '{}:tree'.format(signal.SIGUSR1))) > 10
+
+
+def test_startup_phases_are_timed():
+    proc = Popen(('dumb-init-profile', 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 0
+
+    stats = profile(stderr)
+    for phase in (
+        b'parse_command', b'tty_detach', b'before_fork', b'fork', b'child_tty_attach', b'child_before_exec',
+    ):
+        assert re.match(b'^[0-9]+\\.[0-9]{3} ms$', stats[phase]), phase
+    assert 0 < float(stats[b'fork'].split()[0]) < 1000
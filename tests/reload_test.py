@@ -0,0 +1,139 @@
+import signal
+import time
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import is_alive
+from testing import sleep_until
+
+
+SERVER = (
+    'trap "echo stop $$; exit 0" TERM; '
+    'touch {ready}; echo start $$; '
+    'while :; do sleep 0.05; done'
+)
+
+
+def start_server(tmpdir, command=SERVER, extra_args=()):
+    ready = tmpdir.join('ready').strpath
+    proc = Popen(
+        (
+            'dumb-init',
+            '--reload-signal', str(signal.SIGHUP),
+            '--reload-ready-file', ready,
+        ) + extra_args + ('sh', '-c', command.format(ready=ready)),
+        stdout=PIPE,
+        cwd=tmpdir.strpath,
+    )
+    return proc
+
+
+def read_event(proc):
+    event, pid = proc.stdout.readline().split()
+    return event, int(pid)
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_reload_replaces_child_after_it_is_ready(tmpdir):
+    proc = start_server(tmpdir)
+    event, first = read_event(proc)
+    assert event == b'start'
+
+    proc.send_signal(signal.SIGHUP)
+    event, second = read_event(proc)
+    assert event == b'start'
+    assert second != first
+    # the old instance is only stopped once the new one is ready
+    assert read_event(proc) == (b'stop', first)
+
+    def assert_old_instance_reaped():
+        assert not is_alive(first)
+    sleep_until(assert_old_instance_reaped)
+
+    # dumb-init keeps running with the new generation
+    assert proc.poll() is None
+    proc.send_signal(signal.SIGTERM)
+    assert read_event(proc) == (b'stop', second)
+    assert proc.wait() == 0
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_reload_with_relative_ready_file(tmpdir):
+    proc = Popen(
+        (
+            'dumb-init',
+            '--reload-signal', str(signal.SIGHUP),
+            '--reload-ready-file', 'ready',
+            'sh', '-c', SERVER.format(ready='ready'),
+        ),
+        stdout=PIPE,
+        cwd=tmpdir.strpath,
+    )
+    _, first = read_event(proc)
+    proc.send_signal(signal.SIGHUP)
+    _, second = read_event(proc)
+    # the ready file is looked up where the new instance creates it
+    assert read_event(proc) == (b'stop', first)
+
+    def assert_old_instance_reaped():
+        assert not is_alive(first)
+    sleep_until(assert_old_instance_reaped)
+
+    proc.send_signal(signal.SIGTERM)
+    assert read_event(proc) == (b'stop', second)
+    assert proc.wait() == 0
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_reload_keeps_old_child_if_new_one_fails(tmpdir):
+    command = '[ -e started ] && exit 3; touch started; ' + SERVER
+    proc = start_server(tmpdir, command)
+    event, first = read_event(proc)
+
+    proc.send_signal(signal.SIGHUP)
+    proc.send_signal(signal.SIGTERM)
+    assert read_event(proc) == (b'stop', first)
+    assert proc.wait() == 0
+
+
+def test_reload_timeout(tmpdir):
+    command = '[ -e started ] && exec sleep 10; touch started; ' + SERVER
+    proc = start_server(tmpdir, command, ('--reload-timeout', '1'))
+    event, first = read_event(proc)
+    proc.send_signal(signal.SIGHUP)
+
+    time.sleep(1.2)
+    assert proc.poll() is None
+
+    proc.send_signal(signal.SIGTERM)
+    assert read_event(proc) == (b'stop', first)
+    assert proc.wait() == 0
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_reloaded_child_runs_in_original_directory(tmpdir):
+    command = 'pwd; ' + SERVER
+    proc = start_server(tmpdir, command)
+    assert proc.stdout.readline() == tmpdir.strpath.encode() + b'\n'
+    read_event(proc)
+    proc.send_signal(signal.SIGHUP)
+    assert proc.stdout.readline() == tmpdir.strpath.encode() + b'\n'
+    proc.send_signal(signal.SIGTERM)
+    proc.communicate()
+
+
+@pytest.mark.parametrize(
+    'args', [
+        ('--reload-signal', '1'),
+        ('--reload-signal', '0', '--reload-ready-file', 'ready'),
+        ('--reload-signal', '1', '--reload-ready-file', 'ready', '--reload-stop-signal', '32'),
+        ('--reload-signal', '1', '--reload-ready-file', 'ready', '--reload-timeout', '0'),
+    ],
+)
+def test_reload_errors(args):
+    proc = Popen(('dumb-init',) + args + ('true',), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --reload-signal and --reload-stop-signal take')
@@ -0,0 +1,73 @@
+import resource
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+
+def child_limits(args, flag):
+    proc = Popen(
+        ('dumb-init',) + args + ('sh', '-c', 'ulimit -S{0}; ulimit -H{0}'.format(flag)),
+        stdout=PIPE,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    return tuple(stdout.decode('ascii').split())
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_rlimit_sets_soft_and_hard_limits():
+    assert child_limits(('--rlimit', 'core=0:0'), 'c') == ('0', '0')
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_rlimit_soft_only_keeps_hard_limit():
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    assert child_limits(('--rlimit', 'nofile=64'), 'n') == (
+        '64', 'unlimited' if hard == resource.RLIM_INFINITY else str(hard),
+    )
+
+
+def test_rlimit_multiple_resources():
+    proc = Popen(
+        (
+            'dumb-init', '--rlimit', 'nofile=128', '--rlimit', 'core=0',
+            'sh', '-c', 'ulimit -Sn; ulimit -Sc',
+        ),
+        stdout=PIPE,
+    )
+    stdout, _ = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == b'128\n0\n'
+
+
+def test_rlimit_failure_is_fatal():
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        pytest.skip('hard limit is already unlimited')
+    proc = Popen(
+        ('dumb-init', '--rlimit', 'nofile=1:1', '--rlimit', 'nofile=unlimited', 'true'),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert b'Unable to set resource limit' in stderr
+
+
+@pytest.mark.parametrize(
+    'arg', [
+        '',
+        'nofile',
+        'nofile=',
+        'herp=1',
+        'nofile=derp',
+        'nofile=-1',
+        'nofile=10:5',
+        'nofile=unlimited:10',
+    ],
+)
+def test_rlimit_errors(arg):
+    proc = Popen(('dumb-init', '--rlimit', arg, 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --rlimit option takes')
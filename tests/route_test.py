@@ -0,0 +1,134 @@
+import signal
+import sys
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import kill_if_alive
+from testing import pid_tree
+from testing import process_state
+from testing import sleep_until
+
+
+def spawn_tree(tmpdir, route):
+    """Start dumb-init with a shell which runs two print_signals processes:
+    one in the shell's process group, and one in a new session.
+
+    Returns the dumb-init process and the output files of both.
+    """
+    group, session = tmpdir.join('group'), tmpdir.join('session')
+    proc = Popen(
+        (
+            'dumb-init', '--route', '{}:{}'.format(signal.SIGURG, route),
+            'sh', '-c',
+            '{python} -m testing.print_signals > {group} & '
+            'setsid {python} -m testing.print_signals > {session} & '
+            'wait'.format(python=sys.executable, group=group, session=session),
+        ),
+    )
+
+    def assert_ready():
+        assert group.read().startswith('ready')
+        assert session.read().startswith('ready')
+    sleep_until(assert_ready)
+    return proc, group, session
+
+
+def received(output):
+    return output.read().splitlines()[1:]
+
+
+def kill_tree(proc):
+    for pid in pid_tree(proc.pid):
+        kill_if_alive(pid)
+    proc.wait()
+
+
+@pytest.mark.parametrize(
+    'route, group_receives, session_receives', [
+        ('child', False, False),
+        ('group', True, False),
+        ('tree', True, True),
+    ],
+)
+def test_route(tmpdir, route, group_receives, session_receives):
+    proc, group, session = spawn_tree(tmpdir, route)
+    try:
+        # Both signals are ignored by the shell. SIGWINCH follows the default
+        # route (the whole group) and is handled after SIGURG, so once it has
+        # arrived any SIGURG would have arrived too.
+        proc.send_signal(signal.SIGURG)
+        proc.send_signal(signal.SIGWINCH)
+
+        def assert_group_received():
+            expected = {signal.SIGWINCH, signal.SIGURG} if group_receives else {signal.SIGWINCH}
+            assert set(received(group)) == {str(s.value) for s in expected}
+        sleep_until(assert_group_received)
+
+        if session_receives:
+            def assert_session_received():
+                assert received(session) == [str(signal.SIGURG.value)]
+            sleep_until(assert_session_received)
+        else:
+            assert received(session) == []
+    finally:
+        kill_tree(proc)
+
+
+def test_tree_route_terminates_every_descendant():
+    proc = Popen(
+        (
+            'dumb-init', '--route', '{}:tree'.format(signal.SIGTERM),
+            'sh', '-c', 'sleep 60 & sleep 60 & setsid sleep 60 & wait',
+        ),
+    )
+
+    def assert_started():
+        assert len(pid_tree(proc.pid)) == 4
+    sleep_until(assert_started)
+    descendants = pid_tree(proc.pid)
+
+    def exited(pid):
+        try:
+            return process_state(pid) == 'zombie'
+        except FileNotFoundError:
+            return True
+
+    try:
+        # The shell is signalled last, so it may also exit because its
+        # children did. Either way, they must all have been found.
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=5)
+
+        def assert_exited():
+            assert all(exited(pid) for pid in descendants)
+        sleep_until(assert_exited)
+    finally:
+        for pid in descendants:
+            kill_if_alive(pid)
+
+
+@pytest.mark.parametrize(
+    'arg', [
+        '',
+        '28',
+        '28:',
+        '28:kids',
+        '0:child',
+        '32:child',
+        '28:child:group',
+    ],
+)
+def test_route_errors(arg):
+    proc = Popen(('dumb-init', '--route', arg, 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --route option takes <signum>:child|group|tree')
+
+
+def test_group_route_requires_setsid():
+    proc = Popen(('dumb-init', '--single-child', '--route', '28:group', 'true'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --route option takes <signum>:child|group|tree')
@@ -0,0 +1,48 @@
+import os
+import signal
+
+import pytest
+
+from testing.signal_flood import can_use_pid_namespace
+from testing.signal_flood import flood
+from testing.signal_flood import match
+
+
+# The full floods take a few seconds each, so they only run when asked for.
+stress = pytest.mark.skipif(
+    os.environ.get('DUMB_INIT_STRESS_TESTS') != '1',
+    reason='set DUMB_INIT_STRESS_TESTS=1 to run the signal floods',
+)
+
+
+def test_match_allows_coalescing():
+    sent = [(signal.SIGUSR1, 10), (signal.SIGUSR1, 11), (signal.SIGUSR2, 12), (signal.SIGUSR1, 20)]
+    received = [(signal.SIGUSR1, 15), (signal.SIGUSR2, 16)]
+    # the last SIGUSR1 was sent after the only one that was received
+    assert match(sent, received) == [5, 4, 4, None]
+    assert match(sent, received + [(signal.SIGUSR1, 25)]) == [5, 4, 4, 5]
+
+
+def test_no_signals_lost_in_a_short_flood(tmpdir):
+    result = flood(tmpdir, seconds=0.3, seed=0)
+    assert len(result.received) > 0
+    assert None not in match(result.sent, result.received)
+
+
+@stress
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_no_signals_lost(tmpdir):
+    result = flood(tmpdir, seconds=1, seed=0)
+    assert len(result.received) > 0
+    assert None not in match(result.sent, result.received)
+
+
+@stress
+@pytest.mark.skipif(not can_use_pid_namespace(), reason='needs root and unshare')
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_no_signals_lost_while_reaping(tmpdir):
+    result = flood(tmpdir, seconds=1, seed=0, pid_namespace=True)
+    assert None not in match(result.sent, result.received)
+    # dumb-init kept up with reaping orphans too
+    assert result.spawned > 100
+    assert result.zombies < 50
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+
+def run_traced(tmpdir, command, prefix=()):
+    trace = tmpdir.join('trace.json')
+    proc = Popen(prefix + ('dumb-init', '--trace', str(trace), 'sh', '-c', command), stderr=PIPE)
+    _, stderr = proc.communicate()
+    return proc.returncode, json.loads(trace.read()), stderr
+
+
+def processes(trace):
+    return [
+        event for event in trace['traceEvents']
+        if event['ph'] == 'X' and 'args' in event
+    ]
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_trace_records_child(tmpdir):
+    returncode, trace, _ = run_traced(tmpdir, 'sleep 0.1; exit 3')
+    assert returncode == 3
+
+    dumb_init, = (event for event in trace['traceEvents'] if event['name'] == 'dumb-init')
+    child, = (process for process in processes(trace) if process['args']['ppid'] == dumb_init['pid'])
+    assert child['name'].startswith('sh')
+    assert child['args']['exit_status'] == 3
+    assert 100000 <= child['dur'] <= dumb_init['dur']
+
+
+def test_trace_relative_path(tmpdir):
+    proc = Popen(('dumb-init', '--trace', 'trace.json', 'true'), cwd=tmpdir.strpath)
+    assert proc.wait() == 0
+    # written in the directory dumb-init was started in, not in /
+    trace = json.loads(tmpdir.join('trace.json').read())
+    assert trace['traceEvents']
+
+
+def test_trace_records_descendants(tmpdir):
+    returncode, trace, _ = run_traced(tmpdir, 'sleep 0.1; (exit 7); true')
+    assert returncode == 0
+    if trace['otherData']['source'] != 'proc connector':
+        pytest.skip('the proc connector is not available')
+
+    dumb_init, = (event for event in trace['traceEvents'] if event['name'] == 'dumb-init')
+    sh, = (process for process in processes(trace) if process['args']['ppid'] == dumb_init['pid'])
+    sleep, = (process for process in processes(trace) if process['name'] == 'sleep 0.1')
+    # forked without exec, so it keeps the name of its parent
+    subshell, = (process for process in processes(trace) if process['args'].get('exit_status') == 7)
+    assert subshell['args']['ppid'] == sh['args']['pid']
+    assert subshell['name'] == sh['name'] == 'sh -c sleep 0.1; (exit 7); true'
+    assert sleep['args']['ppid'] == sh['args']['pid']
+    assert sleep['args']['exit_status'] == 0
+    assert sleep['dur'] >= 100000
+    assert sh['ts'] <= sleep['ts']
+    assert sleep['ts'] + sleep['dur'] <= sh['ts'] + sh['dur']
+
+    exec_events = [event for event in trace['traceEvents'] if event['name'] == 'exec']
+    assert sleep['tid'] in {event['tid'] for event in exec_events}
+
+
+@pytest.mark.skipif(
+    os.geteuid() != 0 or shutil.which('unshare') is None,
+    reason='needs root and unshare to hide the proc connector',
+)
+def test_trace_without_proc_connector(tmpdir):
+    # the proc connector only exists in the initial network namespace
+    returncode, trace, _ = run_traced(tmpdir, 'sleep 0.1; exit 3', prefix=('unshare', '-n'))
+    assert returncode == 3
+    assert trace['otherData']['source'] == 'dumb-init'
+    child, = processes(trace)
+    assert child['name'] == 'sh'
+    assert child['args']['exit_status'] == 3
+
+
+def test_trace_unwritable(tmpdir):
+    trace = tmpdir.join('missing', 'trace.json')
+    proc = Popen(('dumb-init', '--trace', str(trace), 'sh', '-c', 'exit 3'), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 3
+    assert stderr.startswith(b'[dumb-init] Unable to write trace to ' + str(trace).encode())
@@ -0,0 +1,140 @@
+import signal
+import sys
+from subprocess import PIPE
+from subprocess import Popen
+
+import pytest
+
+from testing import pid_tree
+from testing import sleep_until
+
+
+WORKER = (
+    'trap "echo stop $DUMB_INIT_WORKER; exit 0" TERM; '
+    'echo start $DUMB_INIT_WORKER; '
+    'while :; do sleep 0.05; done'
+)
+
+
+def read_events(proc, count):
+    return sorted(proc.stdout.readline().split()[1] for _ in range(count))
+
+
+@pytest.mark.usefixtures('both_debug_modes', 'both_setsid_modes')
+def test_workers_start_and_stop():
+    proc = Popen(('dumb-init', '--workers', '3', 'sh', '-c', WORKER), stdout=PIPE)
+    assert read_events(proc, 3) == [b'0', b'1', b'2']
+    proc.send_signal(signal.SIGTERM)
+    assert read_events(proc, 3) == [b'0', b'1', b'2']
+    assert proc.wait() == 0
+
+
+@pytest.mark.usefixtures('both_setsid_modes')
+def test_crashed_workers_are_replaced():
+    proc = Popen(
+        (
+            'dumb-init', '--workers', '2',
+            'sh', '-c', 'echo start $DUMB_INIT_WORKER; sleep 0.3; exit 1',
+        ),
+        stdout=PIPE, stderr=PIPE,
+    )
+    assert read_events(proc, 2) == [b'0', b'1']
+    # both workers exit after 0.3s and are replaced right away
+    assert read_events(proc, 2) == [b'0', b'1']
+    proc.send_signal(signal.SIGTERM)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 128 + signal.SIGTERM
+    assert b'[dumb-init] Worker 0 (PID ' in stderr
+    assert b') exited with status 1, replacing it.\n' in stderr
+
+
+def test_worker_index_is_only_set_for_workers(tmpdir):
+    worker = (
+        'import os, socket, time\n'
+        'index = os.environ["DUMB_INIT_WORKER"]\n'
+        'os.write(1, b"start " + index.encode() + b"\\n")\n'
+        'if index == "1":\n'
+        '    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)\n'
+        '    sock.sendto(b"READY=1", os.environ["NOTIFY_SOCKET"])\n'
+        'time.sleep(10)\n'
+    )
+    proc = Popen(
+        (
+            'dumb-init', '--workers', '2',
+            '--notify-socket', tmpdir.join('notify.sock').strpath,
+            '--ready-command', 'echo ready ${DUMB_INIT_WORKER-unset}',
+            sys.executable, '-c', worker,
+        ),
+        stdout=PIPE,
+    )
+    # the ready command is forked after the workers, but isn't one of them
+    events = sorted(proc.stdout.readline() for _ in range(3))
+    assert events == [b'ready unset\n', b'start 0\n', b'start 1\n']
+    proc.send_signal(signal.SIGTERM)
+    proc.wait()
+
+
+def test_workers_scale_with_cpu_pressure(tmpdir):
+    pressure = tmpdir.join('cpu.pressure')
+    pressure.write('some avg10=50.00 avg60=0.00 avg300=0.00 total=0\n')
+    proc = Popen(
+        (
+            'dumb-init', '--cgroup', tmpdir.strpath,
+            '--workers', '1', '--workers-max', '2',
+            '--scale-cpu-pressure', '20', '--scale-interval', '1',
+            'sh', '-c', WORKER,
+        ),
+        stdout=PIPE,
+    )
+    assert proc.stdout.readline() == b'start 0\n'
+    assert proc.stdout.readline() == b'start 1\n'
+
+    pressure.write('some avg10=1.00 avg60=0.00 avg300=0.00 total=0\n')
+    assert proc.stdout.readline() == b'stop 1\n'
+
+    def assert_one_worker():
+        # one shell and its sleep
+        assert len(pid_tree(proc.pid)) <= 2
+    sleep_until(assert_one_worker, timeout=3)
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.stdout.readline() == b'stop 0\n'
+    assert proc.wait() == 0
+
+
+def test_scale_cpu_pressure_requires_cgroup():
+    proc = Popen(
+        (
+            'dumb-init', '--cgroup', '/doesnotexist',
+            '--workers', '1', '--workers-max', '2', '--scale-cpu-pressure', '20',
+            'true',
+        ),
+        stderr=PIPE,
+    )
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr == (
+        b'[dumb-init] Unable to open /doesnotexist/cpu.pressure '
+        b'(errno=2 No such file or directory). Exiting.\n'
+    )
+
+
+@pytest.mark.parametrize(
+    'args', [
+        ('--workers', '0'),
+        ('--workers', '257'),
+        ('--workers', 'many'),
+        ('--workers', '3', '--workers-max', '2'),
+        ('--workers-max', '2'),
+        ('--scale-cpu-pressure', '20'),
+        ('--workers', '1', '--scale-cpu-pressure', '0'),
+        ('--workers', '1', '--scale-cpu-pressure', '20:30'),
+        ('--workers', '1', '--scale-interval', '0'),
+        ('--workers', '2', '--reload-signal', '1', '--reload-ready-file', 'ready'),
+    ],
+)
+def test_workers_errors(args):
+    proc = Popen(('dumb-init',) + args + ('true',), stderr=PIPE)
+    _, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stderr.startswith(b'Usage: --workers takes a number between 1 and 256')